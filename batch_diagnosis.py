@@ -0,0 +1,367 @@
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+
+from recorder import read_recording, RAW_EXTENSION
+from catalog import RecordingCatalog, parse_recording_name
+from device_registry import DEFAULT_DEVICE_ID
+from session_history import SessionHistory
+
+
+# ================================= DIAGNOSA ULANG REKAMAN (BATCH / OFFLINE) ===========================================
+# Menilai ulang rekaman lapangan (field_test_*.vibrec / *.csv) tanpa replay lewat /raw_data
+# per batch, mis. setelah model diganti. Per file:
+#
+#   1. seluruh rekaman dimuat sekali (.vibrec: frame biner, CSV: np.loadtxt terstruktur)
+#   2. semua window dibentuk sebagai view stride (window ke-k mulai di k*HOP_SIZE, sama
+#      dengan RingBuffer.pop_windows pada sesi live), tanpa copy per window
+#   3. fitur FFT + PCA + RF lewat server.predict_windows dalam blok besar (BATCH_BLOCK_WINDOWS
+#      window sekaligus), gerbang inferensi & SpectralAverager mengikuti konfigurasi server.
+#      Error prediksi tidak jadi label "Error": rekaman ditandai gagal ({'file', 'error'})
+#   4. EMA skor kerusakan dihitung sekaligus untuk seluruh deret (scipy.signal.lfilter,
+#      rekurens yang sama dengan loop EMA di process_session_chunk)
+#   5. hasil: Laporan_Kondisi_*.csv (format sama dengan sesi live), ringkasan (rata-rata,
+#      puncak, status akhir, histogram label), opsional dicatat ulang ke katalog rekaman
+#
+# Kolom Jam laporan = waktu sampel terakhir window (di sesi live: waktu batch diproses).
+# File yang berbeda dikerjakan paralel di process pool (satu model per proses, .npz di-mmap).
+#
+# Contoh:
+#   python batch_diagnosis.py                                  # semua rekaman di recordings_field
+#   python batch_diagnosis.py rec/field_test_*.vibrec --workers 4 --model MODEL_BARU.npz --catalog
+
+# Window per panggilan predict_windows. Terukur (bench_batch_diagnosis.py --sweep, 100 pohon, 1 CPU):
+# traversal NumPy model .npz ~45-75 us/window di semua ukuran blok, predict_proba sklearn
+# ~24 us/window di 1024 dan 13-18 us/window di 4096 -> blok besar + estimator sklearn (attach_estimator)
+BATCH_BLOCK_WINDOWS = int(os.getenv("BATCH_BLOCK_WINDOWS", 4096))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 0))  # 0 = jumlah CPU
+REPORT_HEADER = ['Jam', 'Persentase_Kerusakan', 'Status_Diagnosa']
+RAW_CSV_DTYPE = np.dtype([('t', 'M8[ms]'), ('x', '<f4'), ('y', '<f4'), ('z', '<f4')])
+
+
+# --- server (model, fitur, konfigurasi pipeline) ---
+
+def load_server(model_path=None):
+    # Import server + load model sekali per proses diagnosa. model_path: .npz / .pkl selain
+    # default (jangan dipakai di proses server live: model aktifnya ikut diganti)
+    import server
+
+    if model_path:
+        if model_path.endswith('.npz'):
+            server.MODEL_COMPILED_PATH = model_path
+        else:
+            server.MODEL_COMPILED_PATH = ""
+            server.MODEL_PATH = model_path
+    if server.model_registry.active is None or model_path:
+        # Shadow model hanya untuk perbandingan live, tidak ikut diagnosa ulang
+        server.MODEL_SHADOW_PATH = None
+        server.load_model()
+    if server.model_registry.active is None:
+        raise RuntimeError(f"Model tidak bisa dimuat: {server.model_registry.last_error}")
+    attach_estimator(server)
+    return server
+
+
+def attach_estimator(server):
+    # Model .npz tidak membawa estimator sklearn, jadi blok besar jalan di traversal NumPy
+    # (lebih lambat dari predict_proba sklearn). Kalau pickle sumbernya ada (nama sama / MODEL_PATH)
+    # dan forest hasil kompilasinya identik dengan .npz aktif, estimator-nya dipasang ke model aktif
+    # (hanya RF yang diganti, Scaler+PCA tetap dari .npz; lihat compiled_model.forest_proba).
+    # Return path pickle yang dipakai / None
+    model = server.model_registry.active
+    if model.kind != 'compiled' or model.model_data['compiled'].estimator is not None:
+        return None
+    engine = model.model_data['compiled']
+    for path in dict.fromkeys((os.path.splitext(model.source)[0] + '.pkl', server.MODEL_PATH)):
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            import joblib
+            from compiled_model import compile_model
+
+            model_data = joblib.load(path, mmap_mode='r')
+            arrays = compile_model(model_data)
+        except Exception as e:
+            print(f"[WARNING] Estimator sklearn dari {path} tidak bisa dimuat: {e}")
+            continue
+        arrays['classes_'] = arrays.pop('classes')
+        if all(np.array_equal(arrays[key], getattr(engine, key))
+               for key in ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes_')):
+            engine.estimator = model_data['model']
+            return path
+    return None
+
+
+# --- baca rekaman ---
+
+def load_raw(path):
+    # -> (timestamp epoch per sampel, data (N, 3) float32)
+    if path.endswith(RAW_EXTENSION):
+        return read_recording(path)
+    # CSV format lama / hasil export: 'YYYY-mm-dd HH:MM:SS.mmm';x;y;z (jam lokal)
+    raw = np.loadtxt(path, delimiter=';', skiprows=1, dtype=RAW_CSV_DTYPE, ndmin=1)
+    if not len(raw):
+        return np.empty(0), np.empty((0, 3), dtype=np.float32)
+    local_ms = raw['t'].astype(np.int64)
+    first = raw['t'][0].astype(datetime)
+    offset = first.timestamp() - local_ms[0] / 1000.0  # jam lokal -> epoch (offset sampel pertama)
+    data = np.column_stack((raw['x'], raw['y'], raw['z']))
+    return local_ms / 1000.0 + offset, data
+
+
+def window_view(data, window, hop):
+    # (N, 3) -> (K, window, 3) read-only, window ke-k = data[k*hop : k*hop + window]
+    data = np.ascontiguousarray(data)
+    if len(data) < window:
+        return np.empty((0, window, data.shape[1]), dtype=data.dtype)
+    k = 1 + (len(data) - window) // hop
+    s0, s1 = data.strides
+    return np.lib.stride_tricks.as_strided(data, shape=(k, window, data.shape[1]),
+                                           strides=(hop * s0, s0, s1), writeable=False)
+
+
+def ema_filter(scores, alpha, initial=0.0):
+    # ema[i] = scores[i] * alpha + ema[i-1] * (1 - alpha), ema[-1] = initial
+    from scipy.signal import lfilter
+
+    scores = np.asarray(scores, dtype=float)
+    if not len(scores):
+        return scores
+    ema, _ = lfilter([alpha], [1.0, -(1.0 - alpha)], scores, zi=[(1.0 - alpha) * initial])
+    return ema
+
+
+# --- diagnosa ---
+
+def diagnose(data, times=None, block_windows=BATCH_BLOCK_WINDOWS, gate=True):
+    # Seluruh rekaman (N, 3) -> (label per window, skor EMA 0-1 per window, waktu akhir window).
+    # load_server() harus sudah dipanggil di proses ini. gate=False: semua window lewat PCA + RF
+    import server
+    from feature_engine import SpectralAverager
+
+    windows = window_view(np.asarray(data, dtype=np.float32), server.WINDOW_SIZE, server.HOP_SIZE)
+    k = len(windows)
+    averager = (SpectralAverager(server.feature_extractor.channels, server.feature_extractor.n_features,
+                                 server.SPECTRAL_AVERAGE) if server.SPECTRAL_AVERAGE > 1 else None)
+    gate = server.inference_gate.new_state() if server.GATE_ENABLED and gate else None
+    labels, scores = [], []
+    for start in range(0, k, block_windows):
+        block_labels, block_scores = server.predict_windows(windows[start:start + block_windows],
+                                                            averager=averager, gate=gate, raise_errors=True)
+        labels.append(block_labels)
+        scores.append(block_scores)
+    labels = np.concatenate(labels) if labels else np.empty(0, dtype=str)
+    ema = ema_filter(np.concatenate(scores) if scores else np.empty(0), server.EMA_ALPHA)
+    ends = None
+    if times is not None:
+        ends = np.asarray(times)[np.arange(k) * server.HOP_SIZE + server.WINDOW_SIZE - 1]
+    return labels, ema, ends
+
+
+def report_name(name):
+    # field_test_<stamp>_dev<id> -> Laporan_Kondisi_<stamp>_dev<id>.csv (nama sama dengan sesi live)
+    if name.startswith('field_test_'):
+        return 'Laporan_Kondisi_' + name[len('field_test_'):] + '.csv'
+    return f'Laporan_Kondisi_{name}.csv'
+
+
+def write_report(path, ends, ema, labels):
+    # Baris sama dengan process_session_chunk: [Jam, "xx.x%", LABEL]
+    seconds, inverse = np.unique(np.floor(ends).astype(np.int64), return_inverse=True)
+    clock = [datetime.fromtimestamp(s).strftime('%H:%M:%S') for s in seconds.tolist()]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(REPORT_HEADER)
+        writer.writerows([clock[i], f"{e * 100:.1f}%", str(label).upper()]
+                         for i, e, label in zip(inverse.tolist(), ema.tolist(), labels))
+
+
+def build_history(ends, scores, labels, start):
+    # SessionHistory (statistik + tier grafik) dari seluruh deret sekaligus, skor 0-100
+    history = SessionHistory()
+    if not len(scores):
+        return history
+    history.count = len(scores)
+    history.total = float(scores.sum())
+    history.peak = float(scores.max())
+    history.last = float(scores[-1])
+    values, counts = np.unique(np.asarray(labels).astype(str), return_counts=True)
+    history.label_counts = dict(zip(values.tolist(), counts.tolist()))
+    history.add_to_tiers((ends - start) / 60.0, scores)
+    return history
+
+
+def diagnose_file(path, out_dir=None, catalog_dir=None, block_windows=BATCH_BLOCK_WINDOWS, gate=True):
+    # Satu rekaman -> ringkasan dict. out_dir: folder Laporan_Kondisi (None = tidak ditulis),
+    # catalog_dir: katalog rekaman yang dicatat ulang dengan skor baru (None = tidak)
+    import server
+
+    t0 = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+    parsed = parse_recording_name(path)
+    device_id = (parsed[1] if parsed is not None else None) or DEFAULT_DEVICE_ID
+
+    times, data = load_raw(path)
+    t_load = time.perf_counter() - t0
+    labels, ema, ends = diagnose(data, times, block_windows, gate)
+    scores = ema * 100
+
+    start = float(times[0]) if len(times) else os.path.getmtime(path)
+    end = float(times[-1]) if len(times) else start
+    history = build_history(ends, scores, labels, start)
+    status_key, status_label = server.final_status(history.mean)
+
+    report_path = None
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+        report_path = os.path.join(out_dir, report_name(name))
+        write_report(report_path, ends, ema, labels)
+    if catalog_dir is not None:
+        session = {'chat_id': None, 'device_id': device_id, 'start_time': start, 'rec_next_t': end,
+                   'rec_samples': len(data), 'rec_path_raw': path, 'csv_path_report': report_path,
+                   'history': history}
+        RecordingCatalog(catalog_dir).add_session(session)
+
+    seconds = time.perf_counter() - t0
+    return {
+        'file': path,
+        'name': name,
+        'device_id': device_id,
+        'samples': len(data),
+        'windows': history.count,
+        'start_time': start,
+        'duration_min': round((end - start) / 60, 3),
+        'mean': round(history.mean, 3),
+        'peak': round(history.peak, 3),
+        'last': round(history.last, 3),
+        'status': status_key,
+        'status_label': status_label,
+        'labels': history.label_counts,
+        'report': report_path,
+        'model': server.model_registry.active.version,
+        'load_s': round(t_load, 3),
+        'seconds': round(seconds, 3),
+        'realtime_factor': round((end - start) / seconds, 1) if seconds else 0.0,
+    }
+
+
+# --- banyak file (process pool) ---
+
+_worker_args = {}
+
+
+def _init_worker(model_path, gate, out_dir, catalog_dir, block_windows):
+    load_server(model_path)
+    _worker_args.update(out_dir=out_dir, catalog_dir=catalog_dir, block_windows=block_windows, gate=gate)
+
+
+def _run_file(path):
+    try:
+        return diagnose_file(path, **_worker_args)
+    except Exception as e:
+        return {'file': path, 'error': str(e)}
+
+
+def diagnose_files(paths, out_dir=None, catalog_dir=None, model_path=None, gate=True,
+                   workers=BATCH_WORKERS, block_windows=BATCH_BLOCK_WINDOWS, progress=None):
+    # Ringkasan per file (urutan sama dengan paths; file gagal -> {'file', 'error'}).
+    # workers: jumlah proses (0 = jumlah CPU, 1 = di proses ini). progress(result) dipanggil
+    # tiap file selesai
+    paths = list(paths)
+    workers = min(workers or os.cpu_count() or 1, len(paths)) or 1
+    args = (model_path, gate, out_dir, catalog_dir, block_windows)
+    results = [None] * len(paths)
+    if workers == 1:
+        _init_worker(*args)
+        for i, path in enumerate(paths):
+            results[i] = _run_file(path)
+            if progress is not None:
+                progress(results[i])
+        return results
+
+    # Satu thread BLAS per proses (paralelisme sudah dari jumlah proses). forkserver / spawn:
+    # proses diagnosa tidak mewarisi thread pemanggil (mis. server yang sedang jalan)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, '1')
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    ctx = multiprocessing.get_context(method)
+    # File terbesar dulu supaya proses selesai hampir bersamaan
+    order = sorted(range(len(paths)), key=lambda i: -os.path.getsize(paths[i]))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=args) as executor:
+        futures = {executor.submit(_run_file, paths[i]): i for i in order}
+        for future, i in futures.items():
+            results[i] = future.result()
+            if progress is not None:
+                progress(results[i])
+    return results
+
+
+def find_recordings(directory):
+    # field_test_* di folder rekaman; kalau .vibrec dan CSV hasil export-nya sama-sama ada,
+    # .vibrec yang dipakai
+    found = {}
+    for path in sorted(glob.glob(os.path.join(directory, "field_test_*"))):
+        stem, ext = os.path.splitext(path)
+        if ext == RAW_EXTENSION or (ext == '.csv' and stem not in found):
+            found[stem] = path
+    return sorted(found.values())
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Diagnosa ulang rekaman getaran (batch, tanpa replay)")
+    parser.add_argument('files', nargs='*', help="field_test_*.vibrec / *.csv (default: semua di RECORDING_DIR)")
+    parser.add_argument('--out', default=None, help="folder Laporan_Kondisi hasil (default: RECORDING_DIR/diagnosa_ulang)")
+    parser.add_argument('--model', default=None, help="model .npz / .pkl (default: model server)")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="jumlah proses (0 = jumlah CPU)")
+    parser.add_argument('--block', type=int, default=BATCH_BLOCK_WINDOWS, help="window per blok inferensi")
+    parser.add_argument('--full', action='store_true', help="tanpa gerbang inferensi (semua window lewat PCA + RF)")
+    parser.add_argument('--catalog', nargs='?', const='', default=None,
+                        help="catat ulang skor ke katalog rekaman (default: CATALOG_DIR server)")
+    parser.add_argument('--json', default=None, help="simpan ringkasan ke file JSON")
+    args = parser.parse_args()
+
+    recording_dir = os.getenv("RECORDING_DIR", "recordings_field")
+    paths = args.files or find_recordings(recording_dir)
+    if not paths:
+        print(f"[ERROR] Tidak ada rekaman di {recording_dir}. Beri path file.")
+        sys.exit(1)
+    out_dir = args.out or os.path.join(recording_dir, "diagnosa_ulang")
+    catalog_dir = args.catalog
+    if catalog_dir == '':
+        catalog_dir = os.getenv("CATALOG_DIR", os.path.join(recording_dir, "catalog"))
+
+    def progress(result):
+        if 'error' in result:
+            print(f"[ERROR DIAGNOSA] {result['file']}: {result['error']}")
+            return
+        print(f"{result['name']}: {result['windows']} window, {result['duration_min']:.1f} menit | "
+              f"rata-rata {result['mean']:.1f}% puncak {result['peak']:.1f}% -> {result['status_label']} "
+              f"({result['seconds']:.2f} s, {result['realtime_factor']:.0f}x real-time)")
+
+    t0 = time.perf_counter()
+    results = diagnose_files(paths, out_dir, catalog_dir, args.model, gate=not args.full,
+                             workers=args.workers, block_windows=args.block, progress=progress)
+    wall = time.perf_counter() - t0
+    done = [r for r in results if 'error' not in r]
+    recorded_min = sum(r['duration_min'] for r in done)
+    print(f"{len(done)}/{len(results)} rekaman, {recorded_min:.1f} menit data dalam {wall:.1f} s "
+          f"({recorded_min * 60 / wall if wall else 0:.0f}x real-time) | laporan di {out_dir}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if len(done) < len(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
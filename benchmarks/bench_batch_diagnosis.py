@@ -0,0 +1,197 @@
+import os
+import sys
+import csv
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import pack_frame, export_csv, RAW_EXTENSION
+from synthetic import synthetic_stream
+
+
+# ================================= DIAGNOSA ULANG BATCH VS REPLAY SESI LIVE ===========================================
+# Beberapa rekaman sintetis (.vibrec, amplitudo naik dari normal ke rusak berat) dinilai ulang:
+#   - live   : satu rekaman diputar per batch 512 sampel lewat create_session +
+#              process_device_chunk (jalur /raw_data, Telegram ke stub lokal)
+#   - batch  : rekaman yang sama lewat batch_diagnosis.diagnose_file (window stride, blok besar)
+#   - pool   : semua rekaman lewat diagnose_files dengan 1 proses vs --workers proses
+#   - gagal  : model dilepas di tengah diagnosa -> rekaman harus ditandai gagal, bukan label "Error"
+# Model .npz ditemani pickle sumbernya (.pkl), jadi diagnosa batch memakai estimator sklearn
+# untuk blok besar (batch_diagnosis.attach_estimator); sesi live tetap traversal NumPy.
+# Dibandingkan: baris Laporan_Kondisi (skor EMA + label, kolom Jam tidak) harus sama persis,
+# plus kecepatan (x real-time) tiap cara dan waktu baca CSV hasil export.
+# --sweep: us/window diagnose() per ukuran blok, traversal NumPy vs estimator sklearn
+# (dasar default BATCH_BLOCK_WINDOWS).
+# Jalankan: python benchmarks/bench_batch_diagnosis.py [--files 8] [--minutes 5] [--workers 4] [--sweep]
+# Gagal (exit 1) kalau laporan batch berbeda dari laporan sesi live atau error tidak menggagalkan rekaman.
+
+SAMPLE_RATE = 1600
+BATCH = 512
+SWEEP_BLOCKS = (128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def write_recording(path, seconds, seed):
+    t0 = time.time() - seconds - 3600
+    n = 0
+    with open(path, 'wb') as f:
+        for seq, chunk in enumerate(synthetic_stream(seconds, BATCH, SAMPLE_RATE, seed=seed)):
+            f.write(pack_frame(seq, t0 + n / SAMPLE_RATE, SAMPLE_RATE, chunk.astype(np.float32)))
+            n += len(chunk)
+
+
+def report_rows(path):
+    # (skor, label) per baris, tanpa kolom Jam
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f, delimiter=';'))
+    return [tuple(row[1:]) for row in rows[1:]]
+
+
+def run_live(server, path, device_id):
+    # Jalur sesi live: decode sudah selesai, langsung ke worker per batch
+    from recorder import iter_frames
+
+    session = server.create_session(990000, 10 ** 6, device_id)
+    t0 = time.perf_counter()
+    for seq, _t0, rate, data in iter_frames(path):
+        job = {'chunk': np.array(data), 'meta': {'seq': seq, 'sample_rate': rate}, 'received_at': time.time()}
+        server.process_device_chunk(device_id, job)
+    elapsed = time.perf_counter() - t0
+    server.recording_writer.close(session['csv_path_report'])
+    server.session_store.remove(990000)
+    return session['csv_path_report'], elapsed
+
+
+def sweep_blocks(server, batch_diagnosis, path, repeat=3):
+    # us/window diagnose() per ukuran blok: traversal NumPy (.npz saja) vs estimator sklearn
+    _times, data = batch_diagnosis.load_raw(path)
+    engine = server.model_registry.active.model_data['compiled']
+    estimator = engine.estimator
+    print(f"  sweep blok (us/window, terbaik dari {repeat}):")
+    modes = [("traversal NumPy", None)] + ([("estimator sklearn", estimator)] if estimator is not None else [])
+    for name, attached in modes:
+        engine.estimator = attached
+        row = []
+        for block in SWEEP_BLOCKS:
+            best = float('inf')
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                labels, _ema, _ends = batch_diagnosis.diagnose(data, block_windows=block, gate=False)
+                best = min(best, time.perf_counter() - t0)
+            row.append(f"{block}:{best * 1e6 / len(labels):.1f}")
+        print(f"    {name:<18} " + " ".join(row))
+    engine.estimator = estimator
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--minutes', type=float, default=5.0, help="durasi tiap rekaman")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--full', action='store_true', help="tanpa gerbang inferensi")
+    parser.add_argument('--sweep', action='store_true', help="ukur us/window per ukuran blok")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_batch_")
+    failed = False
+    try:
+        import joblib
+        from compiled_model import compile_model, save_compiled
+        from synthetic import make_synthetic_model
+        from fake_telegram import FakeTelegramServer
+        import batch_diagnosis
+
+        model_path = os.path.join(tmp, "MODEL_SINTETIS.npz")
+        model_data = make_synthetic_model()
+        save_compiled(compile_model(model_data), model_path)
+        joblib.dump(model_data, os.path.join(tmp, "MODEL_SINTETIS.pkl"))
+        seconds = args.minutes * 60
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"field_test_20250101_{i:06d}_devbench{i}{RAW_EXTENSION}")
+            write_recording(path, seconds, seed=i)
+            paths.append(path)
+        print(f"{args.files} rekaman x {args.minutes:g} menit ({seconds * SAMPLE_RATE:,.0f} sampel/rekaman), "
+              f"gerbang inferensi: {'mati' if args.full else 'ikut server'}")
+
+        server = batch_diagnosis.load_server(model_path)
+        estimator = server.model_registry.active.model_data['compiled'].estimator
+        print(f"  estimator sklearn untuk batch: {'terpasang' if estimator is not None else 'TIDAK ADA'}")
+        failed |= estimator is None
+        server.RECORDING_DIR = os.path.join(tmp, "live")
+        os.makedirs(server.RECORDING_DIR)
+        gate_enabled = server.GATE_ENABLED
+        server.GATE_ENABLED = gate_enabled and not args.full
+
+        with FakeTelegramServer() as stub:
+            server.notifier.api_url = stub.url
+            server.notifier.token = "bench"
+            # Sesi live tanpa estimator (seperti server dengan model .npz)
+            server.model_registry.active.model_data['compiled'].estimator = None
+            live_report, t_live = run_live(server, paths[0], "bench0")
+            server.model_registry.active.model_data['compiled'].estimator = estimator
+            server.notifier.join()
+
+        batch_diagnosis.ema_filter([0.0], server.EMA_ALPHA)  # import scipy.signal tidak ikut terukur
+        out_dir = os.path.join(tmp, "diagnosa_ulang")
+        t0 = time.perf_counter()
+        result = batch_diagnosis.diagnose_file(paths[0], out_dir, gate=not args.full)
+        t_batch = time.perf_counter() - t0
+        server.GATE_ENABLED = gate_enabled
+
+        live_rows, batch_rows = report_rows(live_report), report_rows(result['report'])
+        same = live_rows == batch_rows
+        mismatch = sum(a != b for a, b in zip(live_rows, batch_rows)) + abs(len(live_rows) - len(batch_rows))
+        print(f"  live (per batch {BATCH})   {t_live:7.2f} s  ({seconds / t_live:6.0f}x real-time)")
+        print(f"  batch 1 rekaman      {t_batch:7.2f} s  ({seconds / t_batch:6.0f}x real-time, "
+              f"baca file {result['load_s']:.2f} s) -> x{t_live / t_batch:.1f}")
+        print(f"  laporan sama: {'OK' if same else 'BEDA'} ({len(batch_rows)} baris, {mismatch} berbeda) | "
+              f"rata-rata {result['mean']:.1f}% -> {result['status_label']}")
+        failed |= not same
+
+        # Error prediksi harus menggagalkan rekaman (bukan laporan berisi label "Error" skor 0)
+        active, server.model_registry.active = server.model_registry.active, None
+        try:
+            batch_diagnosis._worker_args.update(out_dir=None, catalog_dir=None,
+                                                block_windows=batch_diagnosis.BATCH_BLOCK_WINDOWS, gate=False)
+            broken = batch_diagnosis._run_file(paths[0])
+        finally:
+            server.model_registry.active = active
+        loud = 'error' in broken
+        print(f"  tanpa model: {'rekaman gagal (' + broken['error'] + ')' if loud else 'TIDAK GAGAL'}")
+        failed |= not loud
+
+        if args.sweep:
+            sweep_blocks(server, batch_diagnosis, paths[0])
+
+        csv_path = os.path.join(tmp, "field_test_20250101_999999_devcsv.csv")
+        export_csv(paths[0], csv_path)
+        t0 = time.perf_counter()
+        batch_diagnosis.load_raw(csv_path)
+        t_csv = time.perf_counter() - t0
+        print(f"  baca CSV export {os.path.getsize(csv_path) / 1e6:.0f} MB: {t_csv:.2f} s")
+
+        for workers in sorted({1, args.workers}):
+            t0 = time.perf_counter()
+            results = batch_diagnosis.diagnose_files(paths, os.path.join(tmp, f"pool{workers}"), model_path=model_path,
+                                                     gate=not args.full, workers=workers)
+            wall = time.perf_counter() - t0
+            errors = [r for r in results if 'error' in r]
+            print(f"  pool {workers:>2} proses, {args.files} rekaman: {wall:7.2f} s "
+                  f"({seconds * args.files / wall:6.0f}x real-time)" + (f", {len(errors)} gagal" if errors else ""))
+            failed |= bool(errors)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if failed:
+        print("[GAGAL] Laporan batch berbeda dari sesi live, estimator tidak terpasang, "
+              "atau error prediksi tidak menggagalkan rekaman")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import os
+import sys
+import csv
+import time
+import shutil
+import tempfile
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import RecordingCatalog, bucket_columns, read_report, bucket_origin, DAY_SECONDS
+
+
+# ================================= KATALOG REKAMAN VS BACA ULANG SEMUA CSV ===========================================
+# Ribuan sesi sintetis (beberapa device, tersebar N hari) dicatat ke katalog, lalu diukur:
+#   - waktu membangun katalog & query: summary, tren harian 30 hari per device, tren per jam
+#     seluruh rentang, deret skor 1000 titik (LTTB)
+#   - sebagian sesi juga ditulis sebagai Laporan_Kondisi_*.csv: tren harian dengan membaca
+#     ulang semua CSV (cara lama) vs indeks file yang sama (python catalog.py) + trend()
+# Jalankan: python benchmarks/bench_catalog.py [--sessions 3000] [--csv-sessions 200]
+# Gagal (exit 1) kalau tren harian dari katalog berbeda dari hasil baca CSV.
+
+WINDOWS_PER_SECOND = 12.5   # 1600 Hz, hop 128
+DEVICES = 4
+LABELS = np.array(['normal', 'rusak_ringan', 'rusak_berat'])
+REPEAT = 5
+TOLERANCE = 0.05  # poin persen (kolom skor float32)
+
+
+def make_sessions(n, days, seed=0):
+    # (nama, device, mulai epoch, skor EMA 0-100 per window)
+    rng = np.random.default_rng(seed)
+    t_end = time.time()
+    starts = np.sort(rng.uniform(t_end - days * DAY_SECONDS, t_end - 3600, n))
+    for i, start in enumerate(starts):
+        start = float(np.floor(start))
+        device = f"motor{i % DEVICES}"
+        n_windows = int(rng.uniform(2, 20) * 60 * WINDOWS_PER_SECOND)
+        level = rng.uniform(10, 70)
+        walk = np.cumsum(rng.normal(0, 0.3, n_windows))
+        scores = np.clip(level + walk + rng.normal(0, 2, n_windows), 0, 100)
+        stamp = datetime.fromtimestamp(start).strftime('%Y%m%d_%H%M%S')
+        yield f"field_test_{stamp}_dev{device}", device, start, scores
+
+
+def session_arrays(start, scores):
+    times = start + np.arange(len(scores)) / WINDOWS_PER_SECOND
+    labels = LABELS[np.digitize(scores, (40, 65))]
+    return times, labels
+
+
+def write_report(directory, name, start, scores, labels):
+    path = os.path.join(directory, name.replace('field_test', 'Laporan_Kondisi') + ".csv")
+    times = start + np.arange(len(scores)) / WINDOWS_PER_SECOND
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Jam', 'Persentase_Kerusakan', 'Status_Diagnosa'])
+        writer.writerows([datetime.fromtimestamp(t).strftime('%H:%M:%S'), f"{s:.1f}%", label.upper()]
+                         for t, s, label in zip(times, scores, labels))
+
+
+def timed(fn, repeat=REPEAT):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def csv_daily_trend(directory):
+    # Cara lama: baca semua Laporan_Kondisi_*.csv, lalu rata-rata per hari
+    times, scores = [], []
+    for fname in sorted(os.listdir(directory)):
+        if not fname.startswith('Laporan_Kondisi'):
+            continue
+        day = datetime.strptime(fname.split('_')[2], '%Y%m%d').date()
+        t, s, _labels = read_report(os.path.join(directory, fname), day)
+        times.append(t)
+        scores.append(s)
+    times, scores = np.concatenate(times), np.concatenate(scores)
+    origin = bucket_origin(times.min(), DAY_SECONDS)
+    b = ((times - origin) // DAY_SECONDS).astype(int)
+    counts = np.bincount(b)
+    keep = counts > 0
+    return origin + np.flatnonzero(keep) * DAY_SECONDS, np.bincount(b, weights=scores)[keep] / counts[keep]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--csv-sessions', type=int, default=200, help="sesi yang juga ditulis sebagai CSV")
+    args = parser.parse_args()
+    failed = False
+    tmp = tempfile.mkdtemp(prefix="bench_catalog_")
+    try:
+        catalog = RecordingCatalog(os.path.join(tmp, "catalog"))
+        csv_dir = os.path.join(tmp, "csv")
+        os.makedirs(csv_dir)
+
+        t_add = t_csv = 0.0
+        windows = 0
+        for i, (name, device, start, scores) in enumerate(make_sessions(args.sessions, args.days)):
+            times, labels = session_arrays(start, scores)
+            t0 = time.perf_counter()
+            catalog.add(name, device, start, times[-1], bucket_columns(times, scores),
+                        samples=len(scores) * 128, labels=dict(zip(*np.unique(labels, return_counts=True))))
+            t_add += time.perf_counter() - t0
+            windows += len(scores)
+            if i < args.csv_sessions:
+                t0 = time.perf_counter()
+                write_report(csv_dir, name, start, scores, labels)
+                t_csv += time.perf_counter() - t0
+        size_mb = sum(os.path.getsize(os.path.join(root, f))
+                      for root, _, files in os.walk(catalog.root) for f in files) / 1e6
+        print(f"{args.sessions} sesi, {windows} window, {args.days} hari | katalog {size_mb:.1f} MB, "
+              f"dicatat {t_add * 1000 / args.sessions:.2f} ms/sesi")
+
+        now = time.time()
+        month = now - 30 * DAY_SECONDS
+        queries = (
+            ("sessions device 30 hari", lambda: catalog.sessions('motor0', month)),
+            ("summary device 30 hari", lambda: catalog.summary('motor0', month)),
+            ("trend harian device 30 hari", lambda: catalog.trend('motor0', month)),
+            ("trend per jam semua device", lambda: catalog.trend(bucket_s=3600)),
+            ("series 1000 titik device", lambda: catalog.series('motor0', max_points=1000)),
+            ("series 1000 titik 1 hari", lambda: catalog.series('motor0', now - 2 * DAY_SECONDS,
+                                                                now - DAY_SECONDS, max_points=1000)),
+        )
+        for label, fn in queries:
+            best, _ = timed(fn)
+            print(f"  {label:<30} {best * 1000:8.2f} ms")
+
+        # Cara lama vs katalog dari file CSV yang sama
+        n_csv = min(args.csv_sessions, args.sessions)
+        if n_csv:
+            t_parse, (csv_time, csv_mean) = timed(lambda: csv_daily_trend(csv_dir), repeat=1)
+            legacy = RecordingCatalog(os.path.join(tmp, "legacy"))
+            t0 = time.perf_counter()
+            legacy.index_directory(csv_dir)
+            t_index = time.perf_counter() - t0
+            t_query, trend = timed(lambda: legacy.trend())
+            print(f"{n_csv} sesi CSV (ditulis {t_csv:.1f} s): baca ulang semua CSV {t_parse * 1000:.0f} ms vs "
+                  f"katalog {t_query * 1000:.2f} ms (x{t_parse / max(t_query, 1e-9):.0f}), "
+                  f"indeks sekali {t_index * 1000:.0f} ms")
+            per_session = t_parse / n_csv
+            print(f"  estimasi baca ulang CSV untuk {args.sessions} sesi: {per_session * args.sessions:.1f} s")
+            same = (len(trend['time']) == len(csv_time) and np.allclose(trend['time'], csv_time)
+                    and np.allclose(trend['mean'], csv_mean, atol=TOLERANCE))
+            print(f"  tren harian sama: {'OK' if same else 'BEDA'} ({len(csv_time)} hari)")
+            failed |= not same
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if failed:
+        print("[GAGAL] Tren harian katalog berbeda dari hasil baca CSV")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
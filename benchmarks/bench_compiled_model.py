@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compiled_model import compile_model, save_compiled, load_compiled, compile_estimator, PER_TREE_MIN_BATCH
+from synthetic import load_or_make_model, synthetic_signal
+from server import extract_features_batch
+
+
+# ================================= PARITY & SPEED: PICKLE vs MODEL TERKOMPILASI ===========================================
+# Kolom kecepatan: sklearn (pickle, predict_proba), .npz (traversal NumPy: per level / per pohon
+# tergantung batch), .pkl dimuat (ModelVersion pickle: traversal NumPy untuk batch kecil,
+# predict_proba sklearn mulai ESTIMATOR_MIN_BATCH).
+# Jalankan: python benchmarks/bench_compiled_model.py [MODEL_SIAP_DEPLOY.pkl]
+# Gagal (exit 1) kalau probabilitas berbeda lebih dari TOLERANCE atau label argmax berbeda.
+
+TOLERANCE = 1e-9
+REPEAT = 50
+
+
+def timeit(fn, repeat=REPEAT):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "MODEL_SIAP_DEPLOY.pkl"
+    model_data = load_or_make_model(path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        npz_path = os.path.join(tmp, "model.npz")
+        t0 = time.perf_counter()
+        save_compiled(compile_model(model_data), npz_path)
+        t_compile = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        engine = load_compiled(npz_path, mmap=True)
+        t_load = time.perf_counter() - t0
+
+        # Window uji: campuran level getaran + noise acak (termasuk di luar distribusi training)
+        rng = np.random.default_rng(1)
+        windows = [synthetic_signal(256, amp, seed=i) for i, amp in enumerate(rng.uniform(0.1, 4.0, 400))]
+        windows += list(rng.normal(0, 3.0, size=(100, 256, 3)))
+        features = extract_features_batch(np.stack(windows))
+        # Batch besar (diagnosa ulang / window stride): fitur yang sama diulang
+        features = np.tile(features, (9, 1))
+
+        def sklearn_proba(x):
+            x = model_data['pca'].transform(model_data['scaler'].transform(x))
+            return model_data['model'].predict_proba(x)
+
+        # Parity dua jalur NumPy: per level (batch kecil) dan per pohon (batch besar)
+        ref = sklearn_proba(features)
+        small = PER_TREE_MIN_BATCH - 1
+        got = np.concatenate([engine.predict_proba(features[i:i + small]) for i in range(0, len(features), small)])
+        got_tree = engine.predict_proba(features)
+        max_err = max(np.abs(ref - got).max(), np.abs(ref - got_tree).max())
+        same_label = all(np.array_equal(model_data['model'].classes_[ref.argmax(1)], engine.classes_[p.argmax(1)])
+                         for p in (got, got_tree))
+        hybrid = compile_estimator(model_data)
+
+        print(f"Compile: {t_compile * 1e3:.1f} ms | Load (mmap): {t_load * 1e3:.2f} ms")
+        print(f"Parity : max |dP| = {max_err:.2e} | label sama: {same_label}")
+
+        print(f"{'batch':>6}{'sklearn (ms)':>15}{'.npz (ms)':>12}{'speedup':>10}{'.pkl dimuat (ms)':>18}{'speedup':>10}")
+        for batch in (1, 4, 16, 64, 256, 1024, 4096):
+            x = features[:batch]
+            t_ref = timeit(lambda: sklearn_proba(x))
+            repeat = REPEAT if batch < 1024 else 10
+            t_new = timeit(lambda: engine.predict_proba(x), repeat)
+            t_hybrid = timeit(lambda: hybrid.forest_proba(model_data['pca'].transform(model_data['scaler'].transform(x))),
+                              repeat)
+            print(f"{batch:>6}{t_ref * 1e3:>15.3f}{t_new * 1e3:>12.3f}{t_ref / t_new:>9.1f}x"
+                  f"{t_hybrid * 1e3:>18.3f}{t_ref / t_hybrid:>9.1f}x")
+
+        del engine  # tutup memmap sebelum folder temp dihapus
+
+    if max_err > TOLERANCE or not same_label:
+        print("[FAIL] Model terkompilasi tidak identik dengan pickle!")
+        sys.exit(1)
+    print("[OK] Parity lolos.")
+
+
+if __name__ == '__main__':
+    main()
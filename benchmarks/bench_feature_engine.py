@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import numpy as np
+from scipy.fft import rfft
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feature_engine import SpectralFeatureExtractor, SpectralAverager
+from ring_buffer import RingBuffer
+from synthetic import synthetic_signal
+from server import extract_features_live
+
+
+# ================================= PARITY & SPEED: EKSTRAKSI FITUR ===========================================
+# Bandingkan extract_features_live (3x fft kompleks per window), versi batch lama
+# (rfft 2-D di sumbu waktu yang tidak kontigu) dan SpectralFeatureExtractor.
+# Jalankan: python benchmarks/bench_feature_engine.py
+# Gagal (exit 1) kalau fitur berbeda lebih dari TOLERANCE.
+
+TOLERANCE = 1e-9
+WINDOW = 256
+HOP = 128
+REPEAT = 50
+
+
+def batch_old(windows):
+    # extract_features_batch sebelum feature_engine.py
+    signal_clip = np.clip(windows, -5.0, 5.0)
+    spec = np.abs(rfft(signal_clip, axis=1)[:, 2:WINDOW // 2, :])
+    tilt = signal_clip.mean(axis=1)
+    return np.concatenate([tilt, spec.transpose(0, 2, 1).reshape(len(spec), -1)], axis=1)
+
+
+def timeit(fn, repeat=REPEAT):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    rng = np.random.default_rng(2)
+    signal = np.concatenate([synthetic_signal(2048, amp, seed=i) for i, amp in enumerate((0.3, 1.5, 3.5))])
+    signal += rng.normal(0, 2.0, signal.shape)  # sebagian sampel lewat batas clip
+    buf = RingBuffer(len(signal), window=WINDOW, hop=HOP)
+    buf.push(signal.astype(np.float32))
+    windows = buf.pop_windows()  # view strided (K, 256, 3) seperti di server
+
+    extractor = SpectralFeatureExtractor(WINDOW)
+    # Referensi dihitung di float64 (seperti data training); engine juga selalu float64
+    ref = np.vstack([extract_features_live(w.astype(np.float64)) for w in windows])
+    got = extractor.transform(windows)
+    max_err = np.abs(ref - got).max()
+    print(f"Window: {len(windows)} x {WINDOW} (hop {HOP}) | fitur: {extractor.n_features}")
+    print(f"Parity : max |dF| live vs engine = {max_err:.2e}")
+
+    # Mode Welch dengan span 1 harus identik dengan fitur per window
+    max_err_avg = np.abs(SpectralAverager(3, extractor.n_features, 1).update(got) - got).max()
+    print(f"Parity : max |dF| averager(span=1) = {max_err_avg:.2e}")
+
+    for k in (1, 4, len(windows)):
+        w = windows[:k]
+        t_live = timeit(lambda: [extract_features_live(x) for x in w])
+        t_old = timeit(lambda: batch_old(w))
+        t_new = timeit(lambda: extractor.transform(w, copy=False))
+        print(f"K={k:<4} live {t_live * 1e3:8.3f} ms | batch lama {t_old * 1e3:8.3f} ms | "
+              f"engine {t_new * 1e3:8.3f} ms ({t_live / t_new:.1f}x vs live)")
+
+    if max_err > TOLERANCE or max_err_avg > TOLERANCE:
+        print("[GAGAL] Fitur tidak sama")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_gate import InferenceGate
+from model_registry import ModelVersion
+from compiled_model import compile_model, CompiledModel
+from synthetic import make_synthetic_model, synthetic_signal
+from server import feature_extractor, damage_weights_for, EMA_ALPHA, WINDOW_SIZE, HOP_SIZE
+
+
+# ================================= UJI GERBANG INFERENSI ===========================================
+# Satu perjalanan sintetis per segmen (motor diam -> normal stabil -> rusak ringan stabil ->
+# naik ke rusak berat), diprediksi dua kali dengan model yang sama:
+#   - tanpa gerbang: semua window lewat PCA + RF (seperti sebelumnya)
+#   - dengan gerbang: window sepi / stasioner memakai ulang prediksi acuan + cache LRU
+# Dilaporkan: window yang dilewati, waktu PCA + RF (terukur vs estimasi gerbang), selisih
+# jejak EMA per segmen (poin persen skor kerusakan, maks & rata-rata), label yang berbeda,
+# dan selisih "Rata-rata Kerusakan" laporan akhir.
+# Juga: sesi kedua lewat objek gerbang yang sama (cache sudah terisi sesi pertama) harus
+# menghasilkan skor yang sama persis dengan sesi itu di gerbang baru (cache per sesi).
+# Jalankan: python benchmarks/bench_inference_gate.py [--seconds 60]
+# Gagal (exit 1) kalau selisih EMA rata-rata / rata-rata laporan melebihi batas di bawah,
+# window diam tidak dilewati, hasil satu sesi dipengaruhi sesi lain, atau estimasi CPU
+# dihemat (cpu_saved_s) meleset dari penghematan terukur lebih dari MAX_SAVED_ERROR.
+
+SAMPLE_RATE = 1600
+BATCH_WINDOWS = 4          # batch 512 sampel dari ESP32
+MAX_MEAN_EMA_DIFF_PCT = 2.0   # rata-rata |selisih EMA| per segmen
+MAX_REPORT_DIFF_PCT = 1.0     # selisih "Rata-rata Kerusakan" satu sesi penuh
+ISOLATION_CACHE_STEP = 3.0    # kuantisasi cache uji antar-sesi
+MAX_SAVED_ERROR = 0.2         # |estimasi - terukur| CPU dihemat, relatif ke waktu PCA + RF tanpa gerbang
+TIMING_RUNS = 3               # waktu & estimasi = median beberapa run (gerbang baru tiap run)
+SEGMENTS = (
+    ('diam', 0.01, 0.01),
+    ('normal', 0.3, 0.3),
+    ('rusak_ringan', 1.2, 1.2),
+    ('naik', 1.2, 3.0),
+)
+
+
+def segment_windows(seconds, amp_start, amp_end, seed):
+    # Sinyal per blok 0.32 s (amplitudo naik bertahap), dipotong window 256 / hop 128
+    block = 512
+    n_blocks = int(seconds * SAMPLE_RATE / block)
+    amps = np.linspace(amp_start, amp_end, n_blocks)
+    signal = np.concatenate([synthetic_signal(block, amp, SAMPLE_RATE, seed=seed + i) for i, amp in enumerate(amps)])
+    windows = np.lib.stride_tricks.sliding_window_view(signal, WINDOW_SIZE, axis=0)[::HOP_SIZE]
+    return np.ascontiguousarray(windows.transpose(0, 2, 1))
+
+
+def run(model, windows, gate=None):
+    # -> (skor mentah per window, label, detik PCA + RF)
+    weights = damage_weights_for(model.classes_)
+    state = gate.new_state() if gate is not None else None
+    scores, labels, spent = [], [], 0.0
+    for start in range(0, len(windows), BATCH_WINDOWS):
+        features = feature_extractor.transform(windows[start:start + BATCH_WINDOWS])
+        t0 = time.perf_counter()
+        if gate is None:
+            probs = model.predict_proba(features)
+        else:
+            probs, _ = gate.predict_proba(state, features, model)
+        spent += time.perf_counter() - t0
+        scores.append(probs @ weights)
+        labels.append(model.classes_[np.argmax(probs, axis=1)])
+    return np.concatenate(scores), np.concatenate(labels), spent
+
+
+def ema_trace(scores):
+    out, ema = np.empty(len(scores)), 0.0
+    for i, score in enumerate(scores):
+        ema = score * EMA_ALPHA + ema * (1.0 - EMA_ALPHA)
+        out[i] = ema
+    return out * 100
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=60, help="durasi tiap segmen")
+    args = parser.parse_args()
+    failed = False
+
+    model_data = make_synthetic_model()
+    models = (ModelVersion(model_data, 'synthetic', 'synthetic.pkl'),
+              ModelVersion({'compiled': CompiledModel(compile_model(model_data))}, 'synthetic', 'synthetic.npz'))
+    segments = [(name, segment_windows(args.seconds, a0, a1, seed=100 * i))
+                for i, (name, a0, a1) in enumerate(SEGMENTS)]
+    windows = np.concatenate([w for _, w in segments])
+    other = np.concatenate([segment_windows(args.seconds, a0, a1, seed=100 * i + 50)
+                            for i, (_, a0, a1) in enumerate(SEGMENTS)])
+    bounds = np.cumsum([0] + [len(w) for _, w in segments])
+
+    for model in models:
+        t_full, t_gated, estimates = [], [], []
+        for _ in range(TIMING_RUNS):
+            gate = InferenceGate(feature_extractor.channels, WINDOW_SIZE, feature_extractor.n_bins, ema_alpha=EMA_ALPHA)
+            full_scores, full_labels, t = run(model, windows)
+            t_full.append(t)
+            gated_scores, gated_labels, t = run(model, windows, gate)
+            t_gated.append(t)
+            info = gate.info()
+            estimates.append(info['cpu_saved_s'])
+        t_full, t_gated, estimate = np.median(t_full), np.median(t_gated), np.median(estimates)
+        print(f"[{model.version}] {len(windows)} window | PCA + RF tanpa gerbang {t_full:.2f} s vs dengan gerbang "
+              f"{t_gated:.2f} s (x{t_full / max(t_gated, 1e-9):.1f}) | dihemat terukur {t_full - t_gated:.2f} s, "
+              f"estimasi gerbang {estimate:.2f} s (median {TIMING_RUNS} run)")
+        saved_error = abs(estimate - (t_full - t_gated)) / t_full
+        print(f"    {info['windows']} | dilewati {info['skipped_ratio']:.0%} | "
+              f"estimasi hemat meleset {saved_error:.0%} dari waktu tanpa gerbang")
+        failed |= saved_error > MAX_SAVED_ERROR
+
+        ema_full, ema_gated = ema_trace(full_scores), ema_trace(gated_scores)
+        for (name, _), lo, hi in zip(segments, bounds[:-1], bounds[1:]):
+            diff = np.abs(ema_full[lo:hi] - ema_gated[lo:hi])
+            mismatch = np.count_nonzero(full_labels[lo:hi] != gated_labels[lo:hi])
+            print(f"    {name:<13} EMA akhir {ema_full[hi - 1]:5.1f}% vs {ema_gated[hi - 1]:5.1f}% | "
+                  f"|selisih EMA| maks {diff.max():5.2f} rata2 {diff.mean():5.2f} poin | "
+                  f"label beda {mismatch}/{hi - lo}")
+            failed |= diff.mean() > MAX_MEAN_EMA_DIFF_PCT
+
+        report_diff = abs(ema_full.mean() - ema_gated.mean())
+        idle_skipped = info['windows']['quiet'] / bounds[1]
+        print(f"    Rata-rata Kerusakan sesi {ema_full.mean():.2f}% vs {ema_gated.mean():.2f}% | "
+              f"window diam dilewati {idle_skipped:.0%}")
+        failed |= report_diff > MAX_REPORT_DIFF_PCT or idle_skipped < 0.5
+
+        # Sesi lain (amplitudo sama, noise lain) setelah satu sesi vs di gerbang baru. Kuantisasi
+        # cache sengaja kasar supaya vektor PCA dua sesi banyak yang jatuh ke kunci yang sama
+        coarse = lambda: InferenceGate(feature_extractor.channels, WINDOW_SIZE, feature_extractor.n_bins,
+                                       cache_step=ISOLATION_CACHE_STEP, ema_alpha=EMA_ALPHA)
+        shared = coarse()
+        run(model, windows, shared)
+        shared_scores, _, _ = run(model, other, shared)
+        alone_scores, _, _ = run(model, other, coarse())
+        isolated = np.array_equal(shared_scores, alone_scores)
+        print(f"    sesi kedua tidak terpengaruh cache sesi pertama: {'OK' if isolated else 'BEDA'}")
+        failed |= not isolated
+
+    if failed:
+        print("[GAGAL] Selisih EMA / rata-rata laporan melebihi batas, window diam tidak dilewati, "
+              "hasil sesi dipengaruhi sesi lain, atau estimasi CPU dihemat meleset")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest_codec import encode_frame, decode_frames, decode_json, FMT_FLOAT32, FMT_INT16
+
+
+# ================================= BENCHMARK FORMAT PAYLOAD /raw_data ===========================================
+# Bandingkan ukuran payload dan waktu decode per batch antara JSON (format lama ESP32)
+# dan frame biner VIB1 (float32 & int16). Jalankan: python benchmarks/bench_ingest_format.py
+
+BATCH_SIZE = 512
+REPEAT = 500
+
+
+def make_batch(rng):
+    # Mirip ADXL345 di range 16G: gravitasi di Z + getaran kecil
+    data = rng.normal(0.0, 1.5, size=(BATCH_SIZE, 3))
+    data[:, 2] += 9.81
+    return np.round(data, 2)
+
+
+def esp32_json(data):
+    # Sama persis dengan sendDataBatch() di sketch (String(x, 2))
+    rows = ",".join(f"[{x:.2f},{y:.2f},{z:.2f}]" for x, y, z in data)
+    return ('{"data":[' + rows + ']}').encode()
+
+
+def bench(name, payload, decode):
+    decode(payload)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        decode(payload)
+    per_batch = (time.perf_counter() - t0) / REPEAT
+    return name, len(payload), per_batch
+
+
+def main():
+    rng = np.random.default_rng(0)
+    data = make_batch(rng)
+
+    payload_json = esp32_json(data)
+    payload_f32 = encode_frame(data, device_id=1, seq=1, fmt=FMT_FLOAT32)
+    payload_i16 = encode_frame(data, device_id=1, seq=1, fmt=FMT_INT16)
+
+    # Cek hasil decode sama dulu sebelum diukur
+    _, ref = decode_json(payload_json)
+    _, got_f32 = decode_frames(payload_f32)
+    _, got_i16 = decode_frames(payload_i16)
+    assert np.allclose(ref, got_f32, atol=1e-5)
+    assert np.allclose(ref, got_i16, atol=1e-5)
+
+    results = [
+        bench("json", payload_json, lambda b: decode_json(json.loads(b))),
+        bench("biner float32", payload_f32, decode_frames),
+        bench("biner int16", payload_i16, decode_frames),
+    ]
+
+    base_bytes, base_time = results[0][1], results[0][2]
+    print(f"Batch: {BATCH_SIZE} sampel XYZ, {REPEAT} ulangan")
+    print(f"{'format':<15}{'bytes':>10}{'rasio':>8}{'decode (us)':>14}{'speedup':>10}")
+    for name, size, t in results:
+        print(f"{name:<15}{size:>10}{size / base_bytes:>8.2f}{t * 1e6:>14.1f}{base_time / t:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
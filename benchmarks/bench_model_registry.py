@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+import numpy as np
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_registry
+from model_registry import ModelRegistry
+from compiled_model import compile_model, save_compiled
+from synthetic import make_synthetic_model, synthetic_signal
+from server import extract_features_batch, extract_features_live
+
+
+# ================================= UJI REGISTRY MODEL (LOAD, HOT RELOAD, SHADOW) ===========================================
+#   1. waktu load + warm-up: pickle joblib (mmap) vs .npz terkompilasi (mmap)
+#   2. dimensi fitur salah -> ditolak, model lama tetap aktif
+#   3. file model belum ada saat start -> watcher memuat begitu file muncul
+#   4. hot reload saat 4 thread terus memprediksi: tidak ada window yang gagal / hilang
+#   5. shadow model: latensi & kecocokan label dengan model aktif
+#   6. .pkl diganti sementara .npz lama masih ada -> .pkl baru yang aktif (juga setelah
+#      restart), dan .pkl rusak tidak membuat .npz basi aktif lagi
+# Jalankan: python benchmarks/bench_model_registry.py
+# Gagal (exit 1) kalau salah satu pemeriksaan di atas tidak terpenuhi.
+
+THREADS = 4
+WINDOWS_PER_BATCH = 4
+
+
+def atomic_copy(src, dst):
+    # Cara deploy yang benar: tulis ke file sementara lalu os.replace (file lama yang
+    # sedang di-mmap tetap utuh sampai tidak dipakai)
+    tmp = dst + ".tmp"
+    with open(src, 'rb') as f_in, open(tmp, 'wb') as f_out:
+        f_out.write(f_in.read())
+    os.replace(tmp, dst)
+    past = time.time() - model_registry.MODEL_SETTLE_S - 1
+    os.utime(dst, (past, past))  # langsung dianggap "selesai ditulis"
+
+
+def main():
+    failed = False
+    n_features = extract_features_live(np.zeros((256, 3))).shape[1]
+    rng = np.random.default_rng(3)
+    features = extract_features_batch(np.stack(
+        [synthetic_signal(256, amp, seed=i) for i, amp in enumerate(rng.uniform(0.1, 4.0, 64))]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_a, model_b = make_synthetic_model(seed=0), make_synthetic_model(seed=1, n_estimators=60)
+        files = {}
+        for name, data in (('a', model_a), ('b', model_b)):
+            files[name + '.pkl'] = os.path.join(tmp, name + '.pkl')
+            joblib.dump(data, files[name + '.pkl'])
+            files[name + '.npz'] = os.path.join(tmp, name + '.npz')
+            save_compiled(compile_model(data), files[name + '.npz'])
+        bad = compile_model(model_a)
+        bad['W'], bad['n_features_in'] = bad['W'][:-3], np.array(n_features - 3, dtype=np.int32)
+        files['bad.npz'] = os.path.join(tmp, 'bad.npz')
+        save_compiled(bad, files['bad.npz'])
+
+        # 1. load + warm-up
+        for ext in ('pkl', 'npz'):
+            registry = ModelRegistry([files['a.' + ext]], n_features, poll_interval=0)
+            model = registry.load()
+            print(f"[LOAD] {ext}: load {model.load_seconds * 1000:7.1f} ms | warm-up "
+                  f"{model.warmup_seconds * 1000:6.1f} ms | versi {model.version}")
+
+        # 2. dimensi salah ditolak
+        live = os.path.join(tmp, 'live.npz')
+        atomic_copy(files['a.npz'], live)
+        registry = ModelRegistry([live], n_features, poll_interval=0)
+        first = registry.load()
+        atomic_copy(files['bad.npz'], live)
+        swapped = registry.check_reload()
+        rejected = not swapped and registry.active is first and registry.last_error is not None
+        print(f"[VALIDASI] model {n_features - 3} fitur ditolak: {rejected} | error: {registry.last_error}")
+        failed |= not rejected
+
+        # 3. file belum ada -> muncul belakangan
+        late = os.path.join(tmp, 'late.npz')
+        registry = ModelRegistry([late], n_features, poll_interval=0)
+        registry.load()
+        missing = registry.active is None
+        atomic_copy(files['a.npz'], late)
+        registry.check_reload()
+        print(f"[TANPA MODEL] awal kosong: {missing} | setelah file muncul aktif: {registry.active is not None}")
+        failed |= not missing or registry.active is None
+
+        # 4. hot reload di tengah prediksi paralel
+        atomic_copy(files['a.npz'], live)
+        registry = ModelRegistry([live], n_features, poll_interval=0)
+        registry.load()
+        stop = threading.Event()
+        counts, errors = {}, []
+        lock = threading.Lock()
+
+        def worker(seed):
+            local_rng = np.random.default_rng(seed)
+            while not stop.is_set():
+                model = registry.active  # sama seperti predict_windows
+                batch = features[local_rng.integers(0, len(features), WINDOWS_PER_BATCH)]
+                try:
+                    probs = model.predict_proba(batch)
+                    assert probs.shape == (WINDOWS_PER_BATCH, len(model.classes_))
+                except Exception as e:
+                    errors.append(e)
+                with lock:
+                    counts[model.version] = counts.get(model.version, 0) + len(batch)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+        for t in threads:
+            t.start()
+        swaps = []
+        for src in ('b.npz', 'a.npz', 'b.npz'):
+            time.sleep(0.3)
+            atomic_copy(files[src], live)
+            t0 = time.perf_counter()
+            swaps.append((src, registry.check_reload(), time.perf_counter() - t0))
+        time.sleep(0.3)
+        stop.set()
+        for t in threads:
+            t.join()
+        print(f"[HOT RELOAD] swap: " + ", ".join(f"{s} {'ok' if ok else 'GAGAL'} ({dt * 1000:.0f} ms)"
+                                                  for s, ok, dt in swaps))
+        print(f"             window per versi: {counts} | error: {len(errors)}")
+        failed |= bool(errors) or not all(ok for _, ok, _ in swaps) or len(counts) < 2
+
+        # 5. shadow: model b membayangi model a
+        registry = ModelRegistry([files['a.npz']], n_features, shadow_path=files['b.npz'], poll_interval=0)
+        registry.load()
+        registry.load_shadow()
+        for i in range(0, len(features), WINDOWS_PER_BATCH):
+            batch = features[i:i + WINDOWS_PER_BATCH]
+            t0 = time.perf_counter()
+            probs = registry.active.predict_proba(batch)
+            labels = registry.active.classes_[probs.argmax(axis=1)]
+            registry.submit_shadow(batch, labels, time.perf_counter() - t0)
+            time.sleep(0.005)
+        registry.shutdown()
+        shadow = registry.info()['shadow']
+        print(f"[SHADOW] {shadow['version']}: {shadow['windows']} window | kecocokan label "
+              f"{shadow['agreement']} | dilewati {shadow['skipped']} | error {shadow['errors']}")
+        failed |= shadow['windows'] == 0 or shadow['errors'] > 0
+
+        # 6. .npz basi + .pkl baru
+        stale_npz, fresh_pkl = os.path.join(tmp, 'deploy.npz'), os.path.join(tmp, 'deploy.pkl')
+        atomic_copy(files['a.pkl'], fresh_pkl)
+        atomic_copy(files['a.npz'], stale_npz)  # .npz dikompilasi dari .pkl yang sama, lebih baru
+        registry = ModelRegistry([stale_npz, fresh_pkl], n_features, poll_interval=0)
+        first = registry.load()
+        time.sleep(0.05)
+        atomic_copy(files['b.pkl'], fresh_pkl)
+        registry.check_reload()
+        expected = registry.validate(registry._load_file(files['b.pkl'])).predict_proba(features)
+        reloaded = (registry.active.source == fresh_pkl
+                    and np.allclose(registry.active.predict_proba(features), expected))
+        restarted = ModelRegistry([stale_npz, fresh_pkl], n_features, poll_interval=0).load()
+        with open(fresh_pkl + ".tmp", 'wb') as f:
+            f.write(b"bukan pickle")
+        os.replace(fresh_pkl + ".tmp", fresh_pkl)
+        past = time.time() - model_registry.MODEL_SETTLE_S - 1
+        os.utime(fresh_pkl, (past, past))
+        before = registry.active
+        registry.check_reload()
+        kept = registry.active is before and registry.last_error is not None
+        print(f"[NPZ BASI] awal {first.kind} | .pkl diganti -> {registry.active.kind if reloaded else 'GAGAL'} "
+              f"| restart -> {restarted.kind} | .pkl rusak, model lama tetap: {kept}")
+        failed |= first.source != stale_npz or not reloaded or restarted.source != fresh_pkl or not kept
+
+    if failed:
+        print("[GAGAL] Registry model tidak sesuai harapan")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_telegram import FakeTelegramServer
+from notifier import TelegramNotifier
+
+
+# ================================= UJI PENGIRIM NOTIFIKASI TELEGRAM ===========================================
+# Semua ke stub lokal fake_telegram.py (tidak ada pesan sungguhan):
+#   1. laporan akhir banyak chat: requests.post langsung (cara lama, pemanggil ikut
+#      menunggu) vs TelegramNotifier (pemanggil hanya mengantrikan)
+#   2. urutan per chat tetap (grafik -> laporan -> data mentah)
+#   3. peringatan berulang digabung jadi satu pesan
+#   4. Telegram membalas 429 -> dikirim ulang setelah retry_after, tidak ada yang hilang
+# Jalankan: python benchmarks/bench_notifier.py [--chats 20] [--latency 0.05]
+# Gagal (exit 1) kalau ada pesan hilang, urutan salah, atau peringatan tidak digabung.
+
+PHOTO = b"\x89PNG" + bytes(60_000)  # ukuran mirip grafik tren
+
+
+def ms(values):
+    values = np.asarray(values) * 1000
+    return f"p50 {np.percentile(values, 50):7.1f} ms | p99 {np.percentile(values, 99):7.1f} ms"
+
+
+def old_style(url, chats, doc_path):
+    # Salinan finalize_session versi lama: koneksi baru per request, berurutan
+    blocked = []
+    for chat_id in chats:
+        t0 = time.perf_counter()
+        requests.post(f"{url}/botTOKEN/sendPhoto", files={'photo': PHOTO},
+                      data={'chat_id': chat_id, 'caption': 'laporan'})
+        for caption in ("📄 Laporan User", "💾 Data Mentah"):
+            with open(doc_path, 'rb') as f:
+                requests.post(f"{url}/botTOKEN/sendDocument", data={'chat_id': chat_id, 'caption': caption},
+                              files={'document': f})
+        blocked.append(time.perf_counter() - t0)
+    return blocked
+
+
+def new_style(url, chats, doc_path, **kwargs):
+    notifier = TelegramNotifier(url, "TOKEN", **kwargs)
+    blocked, futures = [], []
+    t_start = time.monotonic()
+    for chat_id in chats:
+        t0 = time.perf_counter()
+        futures.append(notifier.send_photo(chat_id, PHOTO, caption='laporan'))
+        futures.append(notifier.send_document(chat_id, doc_path, caption="📄 Laporan User"))
+        futures.append(notifier.send_document(chat_id, doc_path, caption="💾 Data Mentah"))
+        blocked.append(time.perf_counter() - t0)
+    notifier.join()
+    wall = time.monotonic() - t_start
+    notifier.stop()
+    lost = sum(1 for f in futures if f.exception() is not None)
+    return blocked, wall, lost, notifier.stats()
+
+
+def in_order(stub):
+    # Per chat: sendPhoto dulu, baru 2x sendDocument
+    per_chat = {}
+    for call in sorted(stub.calls, key=lambda c: c['time']):
+        per_chat.setdefault(call['chat_id'], []).append(call['method'])
+    return all(m == ['sendPhoto', 'sendDocument', 'sendDocument'] for m in per_chat.values())
+
+
+def main():
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help="jeda stub Telegram per request (detik)")
+    args = parser.parse_args()
+    chats = list(range(1000, 1000 + args.chats))
+    failed = False
+
+    with tempfile.NamedTemporaryFile(suffix='.csv') as doc:
+        doc.write(b"Jam;Persentase_Kerusakan;Status_Diagnosa\n" * 2000)
+        doc.flush()
+
+        with FakeTelegramServer(latency=args.latency) as stub:
+            blocked = old_style(stub.url, chats, doc.name)
+            print(f"[LAMA] {len(stub.calls)} request | pemanggil tertahan {ms(blocked)} "
+                  f"| total {sum(blocked):.2f} s")
+
+        with FakeTelegramServer(latency=args.latency) as stub:
+            blocked, wall, lost, stats = new_style(stub.url, chats, doc.name, chat_interval=0.2)
+            ordered = in_order(stub)
+            print(f"[BARU] {len(stub.calls)} request | pemanggil tertahan {ms(blocked)} "
+                  f"| semua terkirim dalam {wall:.2f} s | hilang {lost} | urutan per chat benar: {ordered}")
+            failed |= lost > 0 or not ordered or len(stub.calls) != 3 * len(chats)
+
+        # Peringatan berulang: 50x 'danger' untuk sesi yang sama -> satu pesan; sesi baru di chat
+        # yang sama (key lain, masih dalam coalesce_window) tetap mendapat peringatan pertamanya
+        with FakeTelegramServer(latency=args.latency) as stub:
+            notifier = TelegramNotifier(stub.url, "TOKEN")
+            for _ in range(50):
+                notifier.send_message(1, "⚠️ BAHAYA", coalesce='danger:sesi1')
+            notifier.join()
+            sent = stub.count('sendMessage')
+            notifier.send_message(1, "⚠️ BAHAYA", coalesce='danger:sesi2')
+            notifier.join()
+            next_session = stub.count('sendMessage') - sent
+            print(f"[COALESCE] 50 peringatan -> {sent} pesan, sesi berikutnya -> {next_session} pesan "
+                  f"| {notifier.stats()}")
+            failed |= sent != 1 or next_session != 1
+
+        # 429 tiap request ke-3: semua tetap terkirim setelah retry_after
+        with FakeTelegramServer(fail_every=3, retry_after=1) as stub:
+            blocked, wall, lost, stats = new_style(stub.url, chats[:5], doc.name, chat_interval=0.0)
+            # (stub juga mencatat request yang dibalas 429, jadi urutan tidak dicek di sini)
+            print(f"[429] {len(stub.calls)} request ({stats['retried']} diulang) | hilang {lost} "
+                  f"| selesai {wall:.2f} s")
+            failed |= lost > 0 or stats['retried'] == 0
+
+    if failed:
+        print("[GAGAL] Ada notifikasi hilang / urutan salah / tidak digabung")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import io
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from rendering import ChartRenderer, lttb, render_trend, TREND_MAX_POINTS
+
+
+# ================================= BENCHMARK RENDER GRAFIK TREN ===========================================
+# Bandingkan cara lama (pyplot global, semua titik EMA) dengan rendering.py (Figure
+# template + LTTB) untuk panjang sesi berbeda, plus waktu tunggu lewat process pool.
+# Jalankan: python benchmarks/bench_rendering.py
+
+WINDOWS_PER_SECOND = 12.5  # 1600 Hz, hop 128
+SESSION_MINUTES = (1, 5, 30, 60, 240)
+REPEAT = 5
+
+
+def ema_series(minutes, rng):
+    n = int(minutes * 60 * WINDOWS_PER_SECOND)
+    times = np.linspace(0, minutes, n)
+    raw = np.clip(rng.normal(0.4, 0.3, n), 0, 1)
+    scores = np.empty(n)
+    ema = 0.0
+    for i, r in enumerate(raw):
+        ema = r * 0.15 + ema * 0.85
+        scores[i] = ema * 100
+    return times, scores
+
+
+def render_pyplot(times, scores, duration):
+    # Salinan generate_final_report versi lama
+    plt.figure(figsize=(10, 6))
+    plt.plot(times, scores, color='blue', linewidth=2, label='Kondisi Motor')
+    plt.axhspan(0, 30, facecolor='green', alpha=0.1, label='Zona Aman')
+    plt.axhspan(30, 60, facecolor='yellow', alpha=0.1, label='Zona Gejala')
+    plt.axhspan(60, 100, facecolor='red', alpha=0.1, label='Zona Bahaya')
+    plt.title(f"Grafik Kesehatan Motor (Durasi: {duration:.1f} m)")
+    plt.xlabel("Waktu (Menit)")
+    plt.ylabel("Tingkat Kerusakan (%)")
+    plt.ylim(0, 100)
+    plt.grid(True, linestyle='--', alpha=0.5)
+    plt.legend(loc='upper left')
+    plt.tight_layout()
+    img_io = io.BytesIO()
+    plt.savefig(img_io, format='png')
+    plt.close()
+    return img_io.getvalue()
+
+
+def timed(fn, *args):
+    fn(*args)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(*args)
+    return (time.perf_counter() - t0) / REPEAT
+
+
+def main():
+    rng = np.random.default_rng(0)
+    renderer = ChartRenderer(workers=1)
+    renderer.start().result()
+
+    print(f"Grafik tren, {REPEAT} ulangan, budget {TREND_MAX_POINTS} titik")
+    print(f"{'menit':>6}{'titik':>9}{'pyplot (ms)':>13}{'lttb (ms)':>11}{'template (ms)':>15}{'pool (ms)':>11}")
+    for minutes in SESSION_MINUTES:
+        times, scores = ema_series(minutes, rng)
+        t_old = timed(render_pyplot, times, scores, minutes)
+        t_lttb = timed(lttb, times, scores, TREND_MAX_POINTS)
+        t_new = timed(render_trend, times, scores, minutes)
+        t_pool = timed(lambda: renderer.trend(times, scores, minutes).result())
+        print(f"{minutes:>6}{len(times):>9}{t_old * 1e3:>13.1f}{t_lttb * 1e3:>11.1f}"
+              f"{t_new * 1e3:>15.1f}{t_pool * 1e3:>11.1f}")
+    renderer.shutdown()
+
+
+if __name__ == '__main__':
+    main()
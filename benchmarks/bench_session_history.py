@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import pickle
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_history import SessionHistory
+
+
+# ================================= MEMORI & WAKTU RIWAYAT SESI ===========================================
+# Bandingkan list lama (predictions + history_scores + history_times, np.mean/np.max
+# saat laporan) dengan SessionHistory untuk beberapa panjang sesi Mode Bebas.
+# Juga ukuran pickle SessionHistory (disimpan tiap chunk di session store SQLite) dan
+# round-trip-nya: harus tetap kecil berapa pun durasi sesi, dan tier grafik tidak berubah.
+# Jalankan: python benchmarks/bench_session_history.py
+# Gagal (exit 1) kalau rata-rata / puncak / histogram label berbeda dari list lama,
+# atau hasil unpickle berbeda.
+
+WINDOWS_PER_SECOND = 12.5   # 1600 Hz, hop 128
+WINDOWS_PER_CHUNK = 4       # batch 512 sampel
+SESSION_MINUTES = (5, 60, 240, 720)
+LABELS = np.array(['normal', 'rusak_ringan', 'rusak_berat'])
+TOLERANCE = 1e-9
+
+
+def chunks(minutes, rng):
+    n_chunks = int(minutes * 60 * WINDOWS_PER_SECOND / WINDOWS_PER_CHUNK)
+    ema = 0.0
+    for i in range(n_chunks):
+        elapsed = i * WINDOWS_PER_CHUNK / WINDOWS_PER_SECOND / 60
+        raw = np.clip(rng.normal(0.4, 0.3, WINDOWS_PER_CHUNK), 0, 1)
+        scores = []
+        for r in raw:
+            ema = r * 0.15 + ema * 0.85
+            scores.append(ema * 100)
+        yield elapsed, scores, LABELS[rng.integers(0, 3, WINDOWS_PER_CHUNK)]
+
+
+def run_lists(data):
+    session = {'predictions': [], 'history_scores': [], 'history_times': []}
+    for elapsed, scores, labels in data:
+        session['predictions'].extend(labels)
+        session['history_times'].extend([elapsed] * len(scores))
+        session['history_scores'].extend(scores)
+    return session
+
+
+def run_history(data):
+    history = SessionHistory()
+    for elapsed, scores, labels in data:
+        history.append(elapsed, scores, labels)
+    return history
+
+
+def measure(fn, data):
+    # Waktu diukur tanpa tracemalloc (tracemalloc memperlambat alokasi kecil)
+    t0 = time.perf_counter()
+    fn(data)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    result = fn(data)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def main():
+    failed = False
+    for minutes in SESSION_MINUTES:
+        data = list(chunks(minutes, np.random.default_rng(minutes)))
+        old, t_old, mem_old = measure(run_lists, data)
+        new, t_new, mem_new = measure(run_history, data)
+
+        t0 = time.perf_counter()
+        avg_old, max_old = np.mean(old['history_scores']), np.max(old['history_scores'])
+        t_report_old = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        avg_new, max_new = new.mean, new.peak
+        times, scores = new.series()
+        t_report_new = time.perf_counter() - t0
+
+        labels, counts = np.unique(old['predictions'], return_counts=True)
+        same_labels = dict(zip(map(str, labels), map(int, counts))) == new.label_counts
+        err = max(abs(avg_old - avg_new), abs(max_old - max_new))
+        failed |= err > TOLERANCE or not same_labels
+
+        t0 = time.perf_counter()
+        blob = pickle.dumps(new, protocol=pickle.HIGHEST_PROTOCOL)
+        restored = pickle.loads(blob)
+        t_pickle = time.perf_counter() - t0
+        same_pickle = (all(np.array_equal(a, b) for a, b in zip(new.columns(), restored.columns()))
+                       and restored.label_counts == new.label_counts and restored.total == new.total)
+        restored.append(minutes, [50.0], ['normal'])  # tier hasil unpickle masih bisa diisi
+        failed |= not same_pickle
+
+        print(f"{minutes:>4} menit ({new.count:>7} window) | memori list {mem_old / 1e6:7.2f} MB "
+              f"vs history {mem_new / 1e6:5.2f} MB | append {t_old * 1e6 / len(data):5.1f} vs "
+              f"{t_new * 1e6 / len(data):5.1f} us/chunk")
+        print(f"       laporan {t_report_old * 1e3:7.3f} ms vs {t_report_new * 1e3:6.3f} ms "
+              f"({len(times)} titik grafik) | |d rata2/puncak| {err:.1e} | label sama: {same_labels}")
+        print(f"       pickle {len(blob) / 1e3:6.1f} kB, dump+load {t_pickle * 1e3:5.2f} ms | "
+              f"round-trip sama: {same_pickle}")
+
+    if failed:
+        print("[GAGAL] Statistik atau hasil unpickle tidak sama")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# ================================= WAKTU COLD START SERVER ===========================================
+# Diukur di proses Python baru (folder kerja sementara, tanpa TELEGRAM_TOKEN):
+#   - import server       : median beberapa kali `import server` + modul berat yang ikut termuat
+#   - start server        : `python server.py` (atau --gunicorn) sampai
+#       /status pertama 200, /raw_data pertama 200, dan /status "ready" (model aktif),
+#       plus durasi tiap langkah startup background dari /status
+# Model: artefak .npz dari model sintetis (butuh scikit-learn), atau --model <path>.
+# Jalankan: python benchmarks/bench_startup.py [--gunicorn] [--model MODEL.npz]
+# Gagal (exit 1) kalau modul berat (pandas, matplotlib, telegram, sklearn, joblib, scipy)
+# ikut ter-import oleh `import server`, server tidak siap dalam --timeout detik, atau
+# /status pertama 200 tidak lebih awal dari "ready" (healthcheck menunggu load model).
+
+HEAVY_MODULES = ('pandas', 'matplotlib', 'telegram', 'sklearn', 'joblib', 'scipy', 'requests')
+IMPORT_RUNS = 5
+POLL_INTERVAL = 0.02
+
+IMPORT_PROBE = (
+    "import sys, time, json\n"
+    "t0 = time.perf_counter()\n"
+    "import server\n"
+    "elapsed = time.perf_counter() - t0\n"
+    f"print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def child_env(workdir, model_path, port):
+    env = dict(os.environ, PYTHONPATH=ROOT, PORT=str(port), LOG_SAMPLE_EVERY="0")
+    env.pop("TELEGRAM_TOKEN", None)
+    env["MODEL_COMPILED_PATH"] = model_path or os.path.join(workdir, "tidak_ada.npz")
+    env["SESSION_DB"] = os.path.join(workdir, "sessions.db")
+    return env
+
+
+def measure_import(workdir, env):
+    runs, heavy = [], set()
+    for _ in range(IMPORT_RUNS):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=workdir, env=env,
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        runs.append(result['seconds'])
+        heavy.update(result['heavy'])
+    return float(np.median(runs)), sorted(heavy)
+
+
+def measure_start(workdir, env, port, use_gunicorn, timeout, expect_ready=True):
+    import requests
+
+    if use_gunicorn:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"), "wsgi:app"]
+    else:
+        cmd = [sys.executable, os.path.join(ROOT, "server.py")]
+    base = f"http://127.0.0.1:{port}"
+    batch = {'data': np.random.default_rng(0).normal(0, 0.3, (512, 3)).round(4).tolist(), 'device_id': 'bench'}
+    marks = {}
+    log = open(os.path.join(workdir, "server.log"), 'w')
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    status = None
+    try:
+        while time.perf_counter() - t0 < timeout and len(marks) < (3 if expect_ready else 2):
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server berhenti (exit {proc.returncode}), lihat {log.name}")
+            try:
+                if 'status' not in marks or 'ready' not in marks:
+                    resp = requests.get(f"{base}/status", timeout=1)
+                    if resp.status_code == 200:
+                        # Satu waktu per respons: /status pertama yang sudah "ready" -> status == ready
+                        now = time.perf_counter() - t0
+                        status = resp.json()
+                        marks.setdefault('status', now)
+                        if status.get('ready'):
+                            marks.setdefault('ready', now)
+                if 'raw_data' not in marks:
+                    resp = requests.post(f"{base}/raw_data", json=batch, timeout=1)
+                    if resp.status_code == 200:
+                        marks['raw_data'] = time.perf_counter() - t0
+            except requests.RequestException:
+                pass
+            time.sleep(POLL_INTERVAL)
+        # Durasi langkah background dibaca setelah semua langkah selesai
+        while time.perf_counter() - t0 < timeout and proc.poll() is None:
+            try:
+                status = requests.get(f"{base}/status", timeout=1).json()
+            except requests.RequestException:
+                pass
+            steps = (status or {}).get('startup', {}).get('steps', {})
+            if all(step['state'] in ('ready', 'failed') for step in steps.values()):
+                break
+            time.sleep(POLL_INTERVAL * 5)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+    return marks, (status or {}).get('startup', {}).get('steps', {})
+
+
+def synthetic_model(workdir):
+    from synthetic import make_synthetic_model
+    from compiled_model import compile_model, save_compiled
+    path = os.path.join(workdir, "MODEL_SINTETIS.npz")
+    save_compiled(compile_model(make_synthetic_model()), path)
+    return path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--gunicorn', action='store_true', help="start lewat gunicorn (seperti Railway)")
+    parser.add_argument('--model', default=None, help="file model .npz/.pkl (default: model sintetis)")
+    parser.add_argument('--no-model', action='store_true', help="tanpa model (hanya ingest & /status)")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    failed = False
+    try:
+        model_path = None
+        if not args.no_model:
+            model_path = os.path.abspath(args.model) if args.model else synthetic_model(workdir)
+        port = free_port()
+        env = child_env(workdir, model_path, port)
+
+        import_s, heavy = measure_import(workdir, env)
+        print(f"import server: {import_s * 1000:.0f} ms (median {IMPORT_RUNS}x) | "
+              f"modul berat ikut termuat: {', '.join(heavy) or '-'}")
+        failed |= bool(heavy)
+
+        marks, steps = measure_start(workdir, env, port, args.gunicorn, args.timeout, model_path is not None)
+        mode = "gunicorn" if args.gunicorn else "python server.py"
+        for key, label in (('status', "/status pertama 200"), ('raw_data', "/raw_data pertama 200"),
+                           ('ready', "/status ready (model aktif)")):
+            value = marks.get(key)
+            print(f"  [{mode}] {label:<28} " + (f"{value * 1000:8.0f} ms" if value is not None else "   tidak tercapai"))
+        for name, step in sorted(steps.items()):
+            print(f"  langkah {name:<8} {step['state']:<8} mulai +{(step['started_s'] or 0) * 1000:.0f} ms, "
+                  f"durasi {(step['seconds'] or 0) * 1000:.0f} ms" + (f" ({step['error']})" if step['error'] else ""))
+        failed |= 'raw_data' not in marks or (model_path is not None and 'ready' not in marks)
+        if model_path is not None and 'status' in marks and 'ready' in marks and marks['status'] >= marks['ready']:
+            print("  /status baru menjawab setelah model siap (load model memblokir start)")
+            failed = True
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failed:
+        print("[GAGAL] Modul berat ter-import saat start, server tidak siap, atau /status menunggu model")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
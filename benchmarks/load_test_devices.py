@@ -0,0 +1,145 @@
+import os
+import sys
+import io
+import logging
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+from recorder import iter_frames
+from ingest_codec import encode_frame, FMT_INT16
+from synthetic import make_synthetic_model, synthetic_signal
+
+
+# ================================= LOAD TEST BANYAK ESP32 ===========================================
+# Menjalankan server Flask lokal (threaded), membuat satu sesi per device, lalu
+# N device simulasi mengirim frame biner VIB1 secara paralel.
+# Dicek: tiap sesi hanya menerima sampel dari device-nya sendiri, dan rekaman .vibrec
+# sesi berisi semua batch device itu berurutan (dengan --url: ditulis beberapa worker).
+#
+# Jalankan: python benchmarks/load_test_devices.py --devices 50 --batches 40
+#
+# Server multi-worker (gunicorn) yang sudah jalan: sesi dibuat lewat store SQLite yang sama
+#   SESSION_STORE=sqlite SESSION_DB=/tmp/s.db gunicorn -c gunicorn.conf.py wsgi:app
+#   SESSION_STORE=sqlite SESSION_DB=/tmp/s.db python benchmarks/load_test_devices.py --url http://127.0.0.1:5000
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def device_worker(url, device_id, batches, batch_size, latencies, rejected, errors):
+    http = requests.Session()  # keep-alive per device
+    amp = 0.3 + (device_id % 3)  # tiap device beda level getaran
+    for seq in range(batches):
+        data = synthetic_signal(batch_size, amp, seed=device_id * 100000 + seq)
+        body = encode_frame(data, device_id=device_id, seq=seq, fmt=FMT_INT16)
+        while True:
+            t0 = time.perf_counter()
+            resp = http.post(url, data=body, headers={'Content-Type': 'application/x-vib-frame'})
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code == 429:
+                rejected.append(device_id)
+                time.sleep(float(resp.headers.get('Retry-After', 1)) * 0.1)
+                continue
+            if resp.status_code != 200:
+                errors.append((device_id, resp.status_code))
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--batches', type=int, default=40)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--url', default=None, help="base URL server yang sudah jalan (butuh SESSION_STORE=sqlite)")
+    args = parser.parse_args()
+    if args.url and not server.session_store.shared:
+        print("[ERROR] --url butuh SESSION_STORE=sqlite dengan SESSION_DB yang sama dengan server.")
+        sys.exit(1)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server_log = io.StringIO()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(server_log):
+        server.RECORDING_DIR = tmp
+        if not args.url:
+            server.model_registry.activate(make_synthetic_model(), "synthetic")
+
+        chats = {}
+        for device_id in range(1, args.devices + 1):
+            chats[device_id] = 1000 + device_id
+            server.create_session(chats[device_id], 60, str(device_id))
+
+        if args.url:
+            url = args.url.rstrip('/') + "/raw_data"
+        else:
+            httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{httpd.server_port}/raw_data"
+
+        latencies, rejected, errors = [], [], []
+        threads = [
+            threading.Thread(target=device_worker,
+                             args=(url, d, args.batches, args.batch_size, latencies, rejected, errors))
+            for d in chats
+        ]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        t_ingest = time.perf_counter() - t0
+        if not args.url:
+            server.pipeline_queue.join()
+        else:
+            # Worker gunicorn memproses dari antrian bersama; selesai = antrian kosong dan
+            # tidak ada worker yang masih memegang lock device
+            while server.session_store.pending_chunks():
+                time.sleep(0.05)
+            for device_id in chats:
+                with server.session_store.lock(str(device_id)):
+                    pass
+        t_total = time.perf_counter() - t0
+        if not args.url:
+            httpd.shutdown()
+
+        # Verifikasi routing: jumlah sampel per sesi = yang dikirim device-nya
+        expected = args.batches * args.batch_size
+        wrong = [d for d, chat in chats.items()
+                 if server.session_store.get(chat)['raw_buffer'].total_written != expected]
+        windows = sum(server.session_store.get(c)['history'].count
+                      for c in chats.values())
+        # Rekaman: seq frame 0..batches-1 berurutan, tanpa frame hilang / tersisip
+        broken = []
+        for d, chat in chats.items():
+            path = server.session_store.get(chat)['rec_path_raw']
+            server.recording_writer.flush(path, timeout=10)
+            seqs = [seq for seq, *_ in iter_frames(path)] if os.path.exists(path) else []
+            if seqs != list(range(args.batches)):
+                broken.append(d)
+        stats = server.pipeline_queue.stats()
+
+    total_samples = args.devices * expected
+    print(f"Device: {args.devices} | batch/device: {args.batches} | sampel/batch: {args.batch_size}")
+    print(f"Ingest selesai     : {t_ingest:.2f} s | pipeline selesai: {t_total:.2f} s")
+    print(f"Throughput         : {total_samples / t_total:,.0f} sampel/s ({windows / t_total:,.0f} window/s)")
+    print(f"Latensi POST (ms)  : p50 {percentile(latencies, 50):.2f} | p99 {percentile(latencies, 99):.2f} "
+          f"| max {percentile(latencies, 100):.2f}")
+    print(f"429 (backpressure) : {len(rejected)} | error HTTP: {len(errors)}")
+    print(f"Lag antrian max    : {stats['lag_max_s'] * 1000:.1f} ms (proses ini) | window diproses: {windows}")
+    print(f"Routing            : {'OK' if not wrong else f'SALAH di device {wrong[:10]}'}")
+    print(f"Rekaman .vibrec    : {'OK' if not broken else f'TIDAK URUT / KURANG di device {broken[:10]}'}")
+    if wrong or broken or errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
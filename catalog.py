@@ -0,0 +1,477 @@
+import os
+import re
+import csv
+import json
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+from recorder import FRAME_HEADER, FRAME_MAGIC, RAW_EXTENSION
+from device_registry import DEFAULT_DEVICE_ID
+from rendering import lttb, TREND_MAX_POINTS
+
+
+# ================================= KATALOG REKAMAN (INDEKS RIWAYAT LINTAS SESI) ===========================================
+# recordings_field/ hanya berisi file per sesi yang dinamai timestamp, jadi pertanyaan
+# seperti "tren kerusakan motor ini sebulan terakhir" dulu berarti membaca ulang semua CSV.
+# Katalog menyimpan:
+#
+#   - index.db (SQLite, WAL) : satu baris per sesi -> device, chat, mulai/selesai, jumlah
+#     sampel & window, total / puncak / terakhir skor EMA, histogram label, path file
+#   - <nama sesi>/<kolom>.npy : deret skor per bucket waktu (time f8 epoch, score f4 rata-rata,
+#     peak f4, count i4 window), dari tier grafik SessionHistory (per detik untuk sesi <= 1 jam,
+#     per menit atau lebih lebar untuk sesi lebih panjang). Dibaca dengan np.load(mmap_mode='r').
+#
+# Sesi baru dicatat saat finalisasi (finalize_session); file lama di recordings_field (sebelum
+# katalog ada) diindeks dengan `python catalog.py`.
+#
+# Query:
+#   sessions() : daftar sesi di rentang waktu (indeks device + waktu mulai)
+#   summary()  : agregat rentang dari statistik per sesi saja (tanpa membuka kolom)
+#   trend()    : agregat per bucket (mis. per hari). Sesi yang seluruhnya ada di satu bucket
+#                memakai statistik SQL; hanya sesi yang memotong batas bucket / rentang yang
+#                kolomnya dibaca. Rentang panjang dengan bucket sempit -> bucket dilebarkan
+#                (kelipatan bulat) supaya jumlah bucket <= max_buckets
+#   series()   : deret skor lintas sesi, diperkecil LTTB ke jumlah titik tertentu
+
+CATALOG_COLUMNS = (('time', '<f8'), ('score', '<f4'), ('peak', '<f4'), ('count', '<i4'))
+DAY_SECONDS = 86400
+SERIES_OVERSAMPLE = 4  # series(): deret mentah > max_points x ini -> dirata-rata per bucket dulu
+TREND_MAX_BUCKETS = 10000  # trend(): batas jumlah bucket (array per bucket dialokasikan penuh)
+
+_RECORDING_NAME = re.compile(r'^(?:field_test|Laporan_Kondisi)_(\d{8}_\d{6})(?:_dev([A-Za-z0-9_-]+))?\.(vibrec|csv)$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    name TEXT PRIMARY KEY,
+    device_id TEXT NOT NULL,
+    chat_id INTEGER,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    windows INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    score_peak REAL NOT NULL,
+    score_last REAL NOT NULL,
+    labels TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    raw_path TEXT,
+    report_path TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_device_time ON recordings (device_id, start_time);
+CREATE INDEX IF NOT EXISTS recordings_time ON recordings (start_time);
+"""
+
+_FIELDS = ('name', 'device_id', 'chat_id', 'start_time', 'end_time', 'samples', 'windows',
+           'score_sum', 'score_peak', 'score_last', 'labels', 'points', 'raw_path', 'report_path')
+
+
+def parse_time(value, default=None):
+    # Epoch detik, atau 'YYYY-mm-dd[ HH:MM[:SS]]' jam lokal -> epoch detik. ValueError kalau tidak valid
+    if value is None or value == '':
+        return default
+    try:
+        t = float(value)
+    except (TypeError, ValueError):
+        t = datetime.fromisoformat(str(value)).timestamp()
+    try:
+        # NaN / inf / di luar jangkauan datetime (bucket_origin memakai fromtimestamp)
+        datetime.fromtimestamp(t)
+    except (OverflowError, OSError, ValueError):
+        raise ValueError(f"Waktu tidak valid: {value}") from None
+    return t
+
+
+def fit_bucket(lo, hi, bucket_s, max_buckets=TREND_MAX_BUCKETS):
+    # Lebar bucket >= bucket_s supaya [lo, hi) muat di max_buckets bucket (+2: awal bucket
+    # sejajar tengah malam & ujung inklusif). Dilebarkan kelipatan bulat, jadi bucket harian
+    # tetap mulai 00:00. ValueError kalau bucket_s bukan angka positif yang terhingga
+    if not math.isfinite(bucket_s) or bucket_s <= 0:
+        raise ValueError(f"Lebar bucket tidak valid: {bucket_s}")
+    return bucket_s * max(math.ceil((hi - lo) / (bucket_s * (max_buckets - 2))), 1)
+
+
+def bucket_origin(t, bucket_s):
+    # Awal bucket yang memuat t, sejajar tengah malam jam lokal (bucket harian mulai 00:00)
+    offset = datetime.fromtimestamp(t).astimezone().utcoffset().total_seconds()
+    return (t + offset) // bucket_s * bucket_s - offset
+
+
+def scan_vibrec(path):
+    # (t awal, t akhir, jumlah sampel) dari header frame saja, data sampel tidak dibaca
+    start = end = None
+    samples = 0
+    size = os.path.getsize(path)
+    offset = 0
+    with open(path, 'rb') as f:
+        while offset + FRAME_HEADER.size <= size:
+            f.seek(offset)
+            magic, _seq, t0, rate, n = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+            if magic != FRAME_MAGIC:
+                raise ValueError(f"File rekaman rusak di offset {offset}")
+            offset += FRAME_HEADER.size + n * 12
+            if offset > size:
+                break  # frame terakhir belum selesai ditulis
+            if start is None:
+                start = t0
+            end = t0 + n / rate
+            samples += n
+    return start, end, samples
+
+
+def scan_raw_csv(path):
+    # CSV mentah format lama (timestamp;x;y;z) -> (t awal, t akhir, jumlah sampel)
+    first = last = None
+    samples = 0
+    with open(path, newline='') as f:
+        reader = csv.reader(f, delimiter=';')
+        next(reader, None)
+        for row in reader:
+            if not row:
+                continue
+            if first is None:
+                first = row[0]
+            last = row[0]
+            samples += 1
+    if first is None:
+        return None, None, 0
+    return datetime.fromisoformat(first).timestamp(), datetime.fromisoformat(last).timestamp(), samples
+
+
+def read_report(path, day):
+    # Laporan_Kondisi_*.csv (Jam;Persentase_Kerusakan;Status_Diagnosa) -> (epoch, skor 0-100, label)
+    # per baris. Kolom Jam tanpa tanggal: tanggal dari nama file, +1 hari tiap jam mundur
+    times, scores, labels = [], [], []
+    base = datetime.combine(day, datetime.min.time())
+    last = None
+    with open(path, newline='') as f:
+        reader = csv.reader(f, delimiter=';')
+        next(reader, None)
+        for row in reader:
+            if len(row) < 3:
+                continue
+            clock = datetime.strptime(row[0], '%H:%M:%S')
+            t = base + timedelta(hours=clock.hour, minutes=clock.minute, seconds=clock.second)
+            if last is not None and t < last:
+                base += timedelta(days=1)
+                t += timedelta(days=1)
+            last = t
+            times.append(t.timestamp())
+            scores.append(float(row[1].rstrip('%')))
+            labels.append(row[2].lower())
+    return np.asarray(times), np.asarray(scores), labels
+
+
+def parse_recording_name(path):
+    # field_test_/Laporan_Kondisi_<stamp>[_dev<id>].<ext> -> (stamp, id device / None, ext), None kalau bukan
+    m = _RECORDING_NAME.match(os.path.basename(path))
+    return m.groups() if m is not None else None
+
+
+def bucket_columns(times, scores, width_s=1.0):
+    # Titik per window -> kolom katalog (rata-rata, puncak, jumlah window per bucket width_s)
+    if not len(times):
+        return tuple(np.empty(0, dtype=dtype) for _, dtype in CATALOG_COLUMNS)
+    keys, inverse = np.unique(np.floor_divide(times, width_s), return_inverse=True)
+    count = np.bincount(inverse)
+    peak = np.full(len(keys), -np.inf)
+    np.maximum.at(peak, inverse, scores)
+    return (np.bincount(inverse, weights=times) / count,
+            np.bincount(inverse, weights=scores) / count, peak, count)
+
+
+class RecordingCatalog:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, "index.db")
+        self._local = threading.local()  # koneksi per thread per proses
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+    def __contains__(self, name):
+        return self._conn().execute("SELECT 1 FROM recordings WHERE name = ?", (name,)).fetchone() is not None
+
+    # --- tulis ---
+
+    def _write_columns(self, name, columns):
+        folder = os.path.join(self.root, name)
+        os.makedirs(folder, exist_ok=True)
+        for (column, dtype), values in zip(CATALOG_COLUMNS, columns):
+            path = os.path.join(folder, column + ".npy")
+            with open(path + ".tmp", 'wb') as f:
+                np.save(f, np.ascontiguousarray(values, dtype=dtype))
+            os.replace(path + ".tmp", path)
+
+    def add(self, name, device_id, start_time, end_time, columns, chat_id=None, samples=0,
+            windows=None, score_sum=None, score_peak=None, score_last=None, labels=None,
+            raw_path=None, report_path=None):
+        # columns = (time epoch, skor rata-rata, puncak, jumlah window) per bucket, urut waktu.
+        # Statistik yang tidak diberikan dihitung dari kolom. Nama yang sama ditimpa.
+        times, scores, peaks, counts = (np.asarray(c) for c in columns)
+        if windows is None:
+            windows = int(counts.sum())
+        if score_sum is None:
+            score_sum = float(np.dot(scores, counts))
+        if score_peak is None:
+            score_peak = float(peaks.max()) if len(peaks) else 0.0
+        if score_last is None:
+            score_last = float(scores[-1]) if len(scores) else 0.0
+        self._write_columns(name, (times, scores, peaks, counts))
+        row = (name, device_id, chat_id, float(start_time), float(end_time), int(samples), int(windows),
+               float(score_sum), float(score_peak), float(score_last),
+               json.dumps({str(k): int(v) for k, v in (labels or {}).items()}),
+               len(times), raw_path, report_path, time.time())
+        self._conn().execute(
+            f"INSERT OR REPLACE INTO recordings ({', '.join(_FIELDS)}, indexed_at) "
+            f"VALUES ({', '.join('?' * len(row))})", row)
+
+    def add_session(self, session):
+        # Sesi server yang sudah selesai (statistik + tier grafik dari SessionHistory)
+        history = session['history']
+        t, scores, peaks, counts = history.columns()
+        start = session['start_time']
+        name = os.path.splitext(os.path.basename(session['rec_path_raw']))[0]
+        self.add(name, session['device_id'], start, session.get('rec_next_t') or time.time(),
+                 (start + t * 60.0, scores, peaks, counts), chat_id=session['chat_id'],
+                 samples=session.get('rec_samples', 0), windows=history.count, score_sum=history.total,
+                 score_peak=history.peak, score_last=history.last, labels=history.label_counts,
+                 raw_path=session['rec_path_raw'], report_path=session['csv_path_report'])
+        return name
+
+    def index_directory(self, directory, force=False):
+        # Indeks file rekaman yang belum ada di katalog (mis. sebelum katalog dipakai).
+        # Return jumlah sesi yang baru diindeks
+        found = {}
+        for fname in os.listdir(directory):
+            parsed = parse_recording_name(fname)
+            if parsed is None:
+                continue
+            stamp, suffix, ext = parsed
+            entry = found.setdefault((stamp, suffix), {})
+            path = os.path.join(directory, fname)
+            if fname.startswith('Laporan_Kondisi'):
+                entry['report'] = path
+            elif '.' + ext == RAW_EXTENSION or 'raw' not in entry:
+                entry['raw'] = path  # .vibrec lebih diutamakan daripada CSV hasil export
+
+        added = 0
+        for (stamp, suffix), entry in sorted(found.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+            name = f"field_test_{stamp}" + (f"_dev{suffix}" if suffix else "")
+            device_id = suffix or DEFAULT_DEVICE_ID
+            if not force and name in self:
+                continue
+            try:
+                self._index_files(name, stamp, device_id, entry.get('raw'), entry.get('report'))
+                added += 1
+            except (OSError, ValueError) as e:
+                print(f"[WARNING CATALOG] {name} dilewati: {e}")
+        return added
+
+    def _index_files(self, name, stamp, device_id, raw_path, report_path):
+        started = datetime.strptime(stamp, '%Y%m%d_%H%M%S')
+        start = end = None
+        samples = 0
+        if raw_path is not None:
+            scan = scan_vibrec if raw_path.endswith(RAW_EXTENSION) else scan_raw_csv
+            start, end, samples = scan(raw_path)
+
+        labels = {}
+        columns = bucket_columns(np.empty(0), np.empty(0))
+        if report_path is not None:
+            times, scores, row_labels = read_report(report_path, started.date())
+            columns = bucket_columns(times, scores)
+            for label in row_labels:
+                labels[label] = labels.get(label, 0) + 1
+            if len(times):
+                end = max(end or times[-1], times[-1])
+        start = start if start is not None else started.timestamp()
+        self.add(name, device_id, start, end if end is not None else start, columns, samples=samples,
+                 labels=labels, raw_path=raw_path, report_path=report_path)
+
+    # --- baca ---
+
+    def columns(self, name):
+        # Kolom satu sesi sebagai array read-only (mmap). (time, score, peak, count)
+        folder = os.path.join(self.root, name)
+        return tuple(np.load(os.path.join(folder, column + ".npy"), mmap_mode='r')
+                     for column, _ in CATALOG_COLUMNS)
+
+    @staticmethod
+    def _where(device_id, start, end):
+        clauses, params = [], []
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        if end is not None:
+            clauses.append("start_time < ?")
+            params.append(end)
+        if start is not None:
+            clauses.append("end_time >= ?")
+            params.append(start)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def sessions(self, device_id=None, start=None, end=None, limit=None):
+        # Sesi yang tumpang tindih dengan [start, end), urut waktu mulai
+        where, params = self._where(device_id, start, end)
+        sql = f"SELECT {', '.join(_FIELDS)} FROM recordings{where} ORDER BY start_time"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        out = []
+        for row in self._conn().execute(sql, params):
+            item = dict(zip(_FIELDS, row))
+            item['labels'] = json.loads(item['labels'])
+            item['score_mean'] = item['score_sum'] / item['windows'] if item['windows'] else 0.0
+            out.append(item)
+        return out
+
+    def devices(self):
+        # device_id -> (jumlah sesi, mulai pertama, selesai terakhir)
+        return {device_id: {'sessions': n, 'first': first, 'last': last}
+                for device_id, n, first, last in self._conn().execute(
+                    "SELECT device_id, COUNT(*), MIN(start_time), MAX(end_time) FROM recordings GROUP BY device_id")}
+
+    def summary(self, device_id=None, start=None, end=None):
+        # Agregat rentang dari statistik per sesi (sesi yang memotong rentang dihitung penuh)
+        where, params = self._where(device_id, start, end)
+        n, windows, total, peak, samples, seconds, first, last = self._conn().execute(
+            "SELECT COUNT(*), SUM(windows), SUM(score_sum), MAX(score_peak), SUM(samples), "
+            f"SUM(end_time - start_time), MIN(start_time), MAX(end_time) FROM recordings{where}", params).fetchone()
+        return {
+            'sessions': n,
+            'windows': windows or 0,
+            'samples': samples or 0,
+            'hours': (seconds or 0.0) / 3600,
+            'score_mean': total / windows if windows else 0.0,
+            'score_peak': peak or 0.0,
+            'first': first,
+            'last': last,
+        }
+
+    def trend(self, device_id=None, start=None, end=None, bucket_s=DAY_SECONDS, max_buckets=TREND_MAX_BUCKETS):
+        # Agregat per bucket waktu -> dict array: time (awal bucket, epoch), mean, peak,
+        # windows, sessions (hanya bucket yang berisi window), plus bucket_s yang dipakai
+        # (bisa lebih lebar dari yang diminta, lihat fit_bucket)
+        fit_bucket(0.0, 0.0, bucket_s, max_buckets)  # validasi lebar bucket
+        where, params = self._where(device_id, start, end)
+        rows = self._conn().execute(
+            f"SELECT name, start_time, end_time, windows, score_sum, score_peak, points FROM recordings{where}",
+            params).fetchall()
+        empty = {'time': np.empty(0), 'mean': np.empty(0), 'peak': np.empty(0),
+                 'windows': np.empty(0, dtype=np.int64), 'sessions': np.empty(0, dtype=np.int64),
+                 'bucket_s': float(bucket_s)}
+        if not rows or (start is not None and end is not None and end <= start):
+            return empty
+        names = [row[0] for row in rows]
+        t0, t1, windows, score_sum, score_peak, points = (np.array(col, dtype=float) for col in list(zip(*rows))[1:])
+        lo = start if start is not None else t0.min()
+        hi = end if end is not None else t1.max() + 1e-6
+        bucket_s = fit_bucket(lo, hi, bucket_s, max_buckets)
+        empty['bucket_s'] = float(bucket_s)
+        origin = bucket_origin(lo, bucket_s)
+        n = int((hi - origin) // bucket_s) + 1
+        b0 = ((t0 - origin) // bucket_s).astype(np.int64)
+        b1 = ((t1 - origin) // bucket_s).astype(np.int64)
+
+        # Sesi di dalam satu bucket & di dalam rentang: cukup statistik dari SQL
+        whole = (b0 == b1) & (t0 >= lo) & (t1 < hi)
+        sums = np.zeros(n)
+        counts = np.zeros(n)
+        sums += np.bincount(b0[whole], weights=score_sum[whole], minlength=n)
+        counts += np.bincount(b0[whole], weights=windows[whole], minlength=n)
+        sessions = np.bincount(b0[whole][windows[whole] > 0], minlength=n)
+        peaks = np.full(n, -np.inf)
+        np.maximum.at(peaks, b0[whole], score_peak[whole])
+
+        # Sisanya: baca kolom (mmap), hanya bagian yang masuk rentang
+        for i in np.flatnonzero(~whole & (points > 0)):
+            times, scores, peak, count = self.columns(names[i])
+            a, z = np.searchsorted(times, lo), np.searchsorted(times, hi)
+            if a >= z:
+                continue
+            b = ((times[a:z] - origin) // bucket_s).astype(np.int64)
+            weights = count[a:z].astype(float)
+            sums += np.bincount(b, weights=scores[a:z] * weights, minlength=n)
+            counts += np.bincount(b, weights=weights, minlength=n)
+            np.maximum.at(peaks, b, peak[a:z])
+            sessions[np.unique(b)] += 1
+
+        keep = counts > 0
+        if not keep.any():
+            return empty
+        return {
+            'time': origin + np.flatnonzero(keep) * float(bucket_s),
+            'mean': sums[keep] / counts[keep],
+            'peak': peaks[keep],
+            'windows': counts[keep].astype(np.int64),
+            'sessions': sessions[keep],
+            'bucket_s': float(bucket_s),
+        }
+
+    def series(self, device_id=None, start=None, end=None, max_points=TREND_MAX_POINTS):
+        # Deret skor (epoch, skor 0-100) lintas sesi di rentang, diperkecil LTTB ke max_points.
+        # Deret yang jauh lebih panjang dirata-rata per bucket dulu (trend), jadi waktu &
+        # memori tidak bergantung jumlah sesi
+        where, params = self._where(device_id, start, end)
+        rows = self._conn().execute(
+            f"SELECT name, points, start_time, end_time FROM recordings{where} ORDER BY start_time",
+            params).fetchall()
+        rows = [row for row in rows if row[1] > 0]
+        if not rows:
+            return np.empty(0), np.empty(0)
+        lo = start if start is not None else rows[0][2]
+        hi = end if end is not None else max(row[3] for row in rows) + 1e-6
+        if sum(row[1] for row in rows) > max_points * SERIES_OVERSAMPLE:
+            bucket_s = max((hi - lo) / (max_points * SERIES_OVERSAMPLE), 1.0)
+            agg = self.trend(device_id, lo, hi, bucket_s)
+            return lttb(agg['time'] + agg['bucket_s'] / 2, agg['mean'], max_points)
+
+        times, scores = [], []
+        for name, *_ in rows:
+            t, s, _peak, _count = self.columns(name)
+            a, z = np.searchsorted(t, lo), np.searchsorted(t, hi)
+            times.append(t[a:z])
+            scores.append(s[a:z])
+        times = np.concatenate(times)
+        order = np.argsort(times, kind='stable')  # sesi bisa tumpang tindih (device berbeda)
+        return lttb(times[order], np.concatenate(scores)[order], max_points)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Indeks rekaman lama di recordings_field ke katalog")
+    parser.add_argument('directory', nargs='?', default="recordings_field")
+    parser.add_argument('--catalog', default=None, help="folder katalog (default <directory>/catalog)")
+    parser.add_argument('--force', action='store_true', help="indeks ulang sesi yang sudah ada")
+    args = parser.parse_args()
+
+    catalog = RecordingCatalog(args.catalog or os.path.join(args.directory, "catalog"))
+    t0 = time.perf_counter()
+    added = catalog.index_directory(args.directory, force=args.force)
+    print(f"{added} sesi baru diindeks ({time.perf_counter() - t0:.2f} s), total {len(catalog)} sesi")
+    for device_id, info in sorted(catalog.devices().items()):
+        stats = catalog.summary(device_id)
+        print(f"  device {device_id}: {info['sessions']} sesi, {stats['hours']:.1f} jam, "
+              f"rata-rata kerusakan {stats['score_mean']:.1f}%, puncak {stats['score_peak']:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
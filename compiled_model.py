@@ -0,0 +1,233 @@
+import os
+import sys
+import zipfile
+import numpy as np
+
+
+# ================================= MODEL TERKOMPILASI (.npz) ===========================================
+# Artefak hasil "compile" dari MODEL_SIAP_DEPLOY.pkl:
+#   - StandardScaler + PCA dilipat jadi satu peta affine:  x_pca = x @ W + b
+#   - Random Forest diratakan jadi array node gabungan semua pohon
+#     (feature, threshold, left, right, value) + index akar tiap pohon.
+# Disimpan sebagai .npz TANPA kompresi, sehingga tiap array bisa di-memory-map
+# langsung dari file zip (lihat load_compiled).
+#
+# Kecepatan traversal NumPy vs predict_proba sklearn (bench_compiled_model.py, 100 pohon):
+# jauh lebih cepat untuk batch kecil (+-20x di 1 window, 2-3x di 64 window: jalur live,
+# 1 batch ESP32 = 4 window), tapi LEBIH LAMBAT mulai +-256 window (0.8x) dan makin jauh
+# untuk batch besar (0.1x di 4096). Karena itu forest_proba memilih jalur per ukuran batch:
+#   - < PER_TREE_MIN_BATCH       : semua pohon sekaligus, turun satu level per iterasi
+#   - >= PER_TREE_MIN_BATCH      : per pohon (array node satu pohon tetap di cache), +-1.7x
+#                                  lebih cepat dari per level di 1024+ window
+#   - >= ESTIMATOR_MIN_BATCH dan estimator sklearn asli tersedia (model .pkl yang dimuat):
+#                                  langsung estimator.predict_proba (traversal C)
+#
+# Compile:  python compiled_model.py MODEL_SIAP_DEPLOY.pkl MODEL_SIAP_DEPLOY.npz
+
+LEAF = -1  # nilai children_left/right sklearn untuk daun
+ESTIMATOR_MIN_BATCH = 128
+PER_TREE_MIN_BATCH = 512
+
+
+def fold_affine(scaler, pca):
+    # scaler : z = (x - mean) / scale
+    # pca    : p = (z - pca_mean) @ components.T   (dibagi sqrt(var) kalau whiten)
+    components = np.asarray(pca.components_, dtype=np.float64)
+    n_features = components.shape[1]
+
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    pca_mean = getattr(pca, 'mean_', None)
+    pca_mean = np.zeros(n_features) if pca_mean is None else np.asarray(pca_mean, dtype=np.float64)
+
+    W = (components / scale[np.newaxis, :]).T
+    b = -(mean / scale) @ components.T - pca_mean @ components.T
+    if getattr(pca, 'whiten', False):
+        std = np.sqrt(pca.explained_variance_)
+        W = W / std[np.newaxis, :]
+        b = b / std
+    return W, b
+
+
+def flatten_forest(forest):
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for est in forest.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        # Index anak digeser ke posisi global; daun tetap -1
+        left = np.where(left == LEAF, LEAF, left + offset).astype(np.int32)
+        right = np.where(right == LEAF, LEAF, right + offset).astype(np.int32)
+
+        # Distribusi kelas di daun dinormalisasi (sama dengan tree.predict_proba)
+        value = tree.value[:, 0, :].astype(np.float64)
+        total = value.sum(axis=1, keepdims=True)
+        total[total == 0] = 1.0
+        value = value / total
+
+        # Fitur daun (-2) diganti 0 supaya aman dipakai sebagai index
+        feature = np.where(tree.feature < 0, 0, tree.feature).astype(np.int32)
+
+        features.append(feature)
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(left)
+        rights.append(right)
+        values.append(value)
+        roots.append(offset)
+        offset += n
+
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.array(max(est.tree_.max_depth for est in forest.estimators_), dtype=np.int32),
+    }
+
+
+def compile_model(model_data):
+    scaler, pca, forest = model_data['scaler'], model_data['pca'], model_data['model']
+    W, b = fold_affine(scaler, pca)
+    arrays = flatten_forest(forest)
+    arrays['W'] = W
+    arrays['b'] = b
+    arrays['classes'] = np.asarray(forest.classes_).astype(str)
+    arrays['n_features_in'] = np.array(W.shape[0], dtype=np.int32)
+    return arrays
+
+
+def save_compiled(arrays, path):
+    # np.savez (bukan savez_compressed) -> member zip STORED, bisa di-mmap
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def _mmap_npz(path):
+    # np.load mengabaikan mmap_mode untuk .npz, jadi offset tiap .npy di dalam
+    # zip dihitung manual lalu dibuka dengan np.memmap.
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as raw:
+        for info in zf.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(zf.open(info))
+                continue
+            # Local file header: 30 byte + nama file + extra field
+            raw.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(raw.read(4), dtype='<u2')
+            data_start = info.header_offset + 30 + int(name_len) + int(extra_len)
+            raw.seek(data_start)
+            version = np.lib.format.read_magic(raw)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(raw)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(raw)
+            if dtype.hasobject:
+                raise ValueError(f"Array object tidak didukung: {name}")
+            if int(np.prod(shape)) == 0 or len(shape) == 0:
+                # memmap tidak bisa untuk array kosong / skalar, baca biasa
+                arrays[name] = np.fromfile(raw, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=raw.tell(),
+                                     shape=shape, order='F' if fortran else 'C')
+    return arrays
+
+
+class CompiledModel:
+    def __init__(self, arrays, estimator=None):
+        # estimator: RandomForestClassifier asli (opsional) untuk batch besar
+        self.estimator = estimator
+        self.W = np.asarray(arrays['W'])
+        self.b = np.asarray(arrays['b'])
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = np.asarray(arrays['roots'])
+        self.max_depth = int(arrays['max_depth'])
+        self.classes_ = np.asarray(arrays['classes'])
+        self.n_features_in_ = int(arrays['n_features_in'])
+
+    def transform(self, features):
+        # Scaler + PCA dalam satu perkalian matriks
+        return np.asarray(features, dtype=np.float64) @ self.W + self.b
+
+    def forest_proba(self, features_pca):
+        # Sama dengan sklearn: input di-cast ke float32, dibandingkan `<= threshold`.
+        # Jalur dipilih per ukuran batch (lihat header file)
+        X = np.asarray(features_pca, dtype=np.float32)
+        n = len(X)
+        if self.estimator is not None and n >= ESTIMATOR_MIN_BATCH:
+            return self.estimator.predict_proba(X)
+        if n >= PER_TREE_MIN_BATCH:
+            return self._proba_per_tree(X)
+        return self._proba_per_level(X)
+
+    def _proba_per_level(self, X):
+        # Traversal semua pohon untuk semua sampel sekaligus: matriks index node
+        # (sampel x pohon) diturunkan satu level per iterasi.
+        n = len(X)
+        rows = np.arange(n)[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            is_leaf = left == LEAF
+            if is_leaf.all():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(is_leaf, node, np.where(go_left, left, self.right[node]))
+        return self.value[node].mean(axis=1)
+
+    def _proba_per_tree(self, X):
+        # Satu pohon per iterasi luar: vektor index node (sampel,) diturunkan sampai daun.
+        # Gather hanya ke node satu pohon (kecil, tetap di cache) dan tanpa matriks n x pohon
+        n = len(X)
+        rows = np.arange(n)
+        out = np.zeros((n, self.value.shape[1]))
+        for root in self.roots.tolist():
+            node = np.full(n, root, dtype=np.int64)
+            while True:
+                left = self.left[node]
+                is_leaf = left == LEAF
+                if is_leaf.all():
+                    break
+                go_left = X[rows, self.feature[node]] <= self.threshold[node]
+                node = np.where(is_leaf, node, np.where(go_left, left, self.right[node]))
+            out += self.value[node]
+        return out / len(self.roots)
+
+    def predict_proba(self, features):
+        return self.forest_proba(self.transform(features))
+
+
+def compile_estimator(model_data):
+    # Model pickle yang sudah dimuat -> CompiledModel di memori (tanpa file .npz), dengan
+    # estimator sklearn aslinya untuk batch besar
+    return CompiledModel(compile_model(model_data), estimator=model_data['model'])
+
+
+def load_compiled(path, mmap=True):
+    if mmap:
+        arrays = _mmap_npz(path)
+    else:
+        with np.load(path) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+    return CompiledModel(arrays)
+
+
+if __name__ == '__main__':
+    import joblib
+
+    src = sys.argv[1] if len(sys.argv) > 1 else "MODEL_SIAP_DEPLOY.pkl"
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + ".npz"
+    arrays = compile_model(joblib.load(src))
+    save_compiled(arrays, dst)
+    print(f"[INFO] Model terkompilasi: {dst} ({len(arrays['roots'])} pohon, "
+          f"{len(arrays['feature'])} node, {arrays['W'].shape[0]} -> {arrays['W'].shape[1]} dimensi)")
@@ -0,0 +1,37 @@
+import re
+import threading
+
+
+# ================================= REGISTRY PERANGKAT (ESP32) -> CHAT ===========================================
+# Tiap unit ESP32 punya device id (header frame VIB1, field JSON "device_id",
+# atau header HTTP X-Device-Id). Chat Telegram di-bind ke satu device, lalu sesi
+# rekaman yang dimulai dari chat itu hanya menerima data dari device tersebut.
+#
+# Registry ini hanya menyimpan binding chat -> device (dipakai bot). Peta device ->
+# sesi aktif, lock per device, dan statistik "last seen" ada di session store
+# (session_store.py) supaya tetap benar walau server jalan dengan banyak worker.
+
+DEFAULT_DEVICE_ID = "0"  # ESP32 lama yang belum mengirim device id
+
+# Device id ikut dipakai di nama file rekaman, jadi hanya karakter aman
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9_-]')
+
+
+def normalize_device_id(value):
+    if value is None:
+        return DEFAULT_DEVICE_ID
+    value = _UNSAFE_CHARS.sub('', str(value).strip())[:32]
+    return value or DEFAULT_DEVICE_ID
+
+
+class DeviceRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chat_device = {}  # chat_id -> device_id (binding dari bot)
+
+    def bind(self, chat_id, device_id):
+        with self._lock:
+            self._chat_device[chat_id] = normalize_device_id(device_id)
+
+    def device_for_chat(self, chat_id):
+        return self._chat_device.get(chat_id, DEFAULT_DEVICE_ID)
@@ -0,0 +1,128 @@
+import sys
+import gzip
+import json
+import time
+import argparse
+import numpy as np
+import requests
+
+from ingest_codec import encode_frame, FMT_FLOAT32, FMT_INT16, DEFAULT_SAMPLE_RATE
+from synthetic import synthetic_stream
+
+
+# ================================= SIMULATOR ESP32 (KLIEN LOKAL) ===========================================
+# Mengirim sinyal sintetis ADXL345 ke server seperti ESP32, untuk menguji jalur ingest:
+#
+#   stream : satu POST chunked panjang ke /stream, tiap batch = satu frame VIB1
+#   post   : satu POST per batch ke /raw_data (keep-alive), opsional gzip
+#   esp32  : seperti post, tapi koneksi baru tiap batch (perilaku sketch lama)
+#
+# Contoh (server lokal sedang jalan & sesi untuk device 7 sudah dimulai dari bot):
+#   python device_simulator.py --mode stream --device-id 7 --seconds 30
+#   python device_simulator.py --mode post --format json --gzip --seconds 10 --speed 0
+
+FORMATS = {'int16': FMT_INT16, 'float32': FMT_FLOAT32, 'json': None}
+
+
+def make_body(data, fmt, device_id, seq, rate):
+    if fmt == 'json':
+        payload = {'device_id': device_id, 'seq': seq, 'sample_rate': rate,
+                   'data': np.round(data, 2).tolist()}
+        return json.dumps(payload).encode(), 'application/json'
+    return encode_frame(data, device_id=device_id, seq=seq, sample_rate=rate, fmt=FORMATS[fmt]), \
+        'application/x-vib-frame'
+
+
+def paced(batches, rate, speed):
+    # Jeda antar batch sesuai sample rate (speed 0 = secepatnya)
+    t0 = time.perf_counter()
+    sent = 0
+    for batch in batches:
+        if speed > 0:
+            delay = t0 + sent / rate / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield batch
+        sent += len(batch)
+
+
+def run_stream(base_url, batches, device_id=0, rate=DEFAULT_SAMPLE_RATE, speed=1.0, fmt='int16'):
+    if fmt == 'json':
+        raise ValueError("Mode stream hanya untuk frame biner (int16 / float32)")
+    stats = {'frames': 0, 'bytes': 0}
+
+    def frames():
+        for seq, data in enumerate(paced(batches, rate, speed)):
+            body, _ = make_body(data, fmt, device_id, seq, rate)
+            stats['frames'] += 1
+            stats['bytes'] += len(body)
+            yield body  # satu chunk HTTP per frame
+
+    t0 = time.perf_counter()
+    resp = requests.post(f"{base_url}/stream", data=frames(),
+                         headers={'Content-Type': 'application/x-vib-frame', 'X-Device-Id': str(device_id)})
+    stats['wall_s'] = time.perf_counter() - t0
+    stats['status'] = resp.status_code
+    stats['server'] = resp.json()
+    return stats
+
+
+def run_post(base_url, batches, device_id=0, rate=DEFAULT_SAMPLE_RATE, speed=1.0, fmt='int16',
+             compress=False, new_connection=False):
+    http = None if new_connection else requests.Session()
+    stats = {'frames': 0, 'bytes': 0, 'latency_s': [], 'status': {}}
+    t0 = time.perf_counter()
+    for seq, data in enumerate(paced(batches, rate, speed)):
+        body, content_type = make_body(data, fmt, device_id, seq, rate)
+        headers = {'Content-Type': content_type, 'X-Device-Id': str(device_id)}
+        if compress:
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        t_req = time.perf_counter()
+        if http is None:
+            headers['Connection'] = 'close'
+            resp = requests.post(f"{base_url}/raw_data", data=body, headers=headers)
+        else:
+            resp = http.post(f"{base_url}/raw_data", data=body, headers=headers)
+        stats['latency_s'].append(time.perf_counter() - t_req)
+        stats['status'][resp.status_code] = stats['status'].get(resp.status_code, 0) + 1
+        stats['frames'] += 1
+        stats['bytes'] += len(body)
+    stats['wall_s'] = time.perf_counter() - t0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulator ESP32 untuk /stream dan /raw_data")
+    parser.add_argument('--url', default="http://127.0.0.1:5000", help="base URL server")
+    parser.add_argument('--mode', choices=('stream', 'post', 'esp32'), default='stream')
+    parser.add_argument('--seconds', type=float, default=10.0, help="panjang sinyal sintetis")
+    parser.add_argument('--rate', type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument('--batch', type=int, default=256)
+    parser.add_argument('--speed', type=float, default=1.0, help="1 = real-time, 0 = secepatnya")
+    parser.add_argument('--format', choices=tuple(FORMATS), default='int16')
+    parser.add_argument('--gzip', action='store_true', help="mode post/esp32: Content-Encoding gzip")
+    parser.add_argument('--device-id', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    batches = synthetic_stream(args.seconds, args.batch, args.rate, seed=args.seed)
+    if args.mode == 'stream':
+        stats = run_stream(args.url, batches, args.device_id, args.rate, args.speed, args.format)
+        print(f"[STREAM] {stats['frames']} frame, {stats['bytes']:,} byte dalam {stats['wall_s']:.2f} s "
+              f"| HTTP {stats['status']} | server: {stats['server']}")
+    else:
+        stats = run_post(args.url, batches, args.device_id, args.rate, args.speed, args.format,
+                         compress=args.gzip, new_connection=args.mode == 'esp32')
+        ms = np.asarray(stats['latency_s']) * 1000
+        print(f"[{args.mode.upper()}] {stats['frames']} request, {stats['bytes']:,} byte dalam {stats['wall_s']:.2f} s "
+              f"| status {stats['status']}")
+        if len(ms):
+            print(f"Latensi request: p50 {np.percentile(ms, 50):.2f} ms | p99 {np.percentile(ms, 99):.2f} ms "
+                  f"| max {ms.max():.2f} ms")
+    if stats['frames'] == 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
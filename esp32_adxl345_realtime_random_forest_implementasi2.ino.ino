@@ -2,6 +2,7 @@
 #include <Adafruit_ADXL345_U.h>
 #include <WiFi.h>
 #include <HTTPClient.h>
+#include <WiFiClientSecure.h>
 #include <ArduinoJson.h>
 
 /* ================= KONFIGURASI WIFI & SERVER ================= */
@@ -10,6 +11,103 @@ const char* password = "(Isi nama passwordnya)";
 
 // Dimasukkan URL Railway yang sudah dideploy
 String serverUrl = "https://realtime-vibration-cloud-production.up.railway.app/raw_data"; 
+const char* serverHost = "realtime-vibration-cloud-production.up.railway.app";
+
+// Root CA untuk verifikasi sertifikat server (Let's Encrypt: ISRG Root X1/X2,
+// Google Trust Services: GTS Root R1/R4). Ganti kalau server pindah ke CA lain.
+const char* ROOT_CA_BUNDLE = R"PEM(
+-----BEGIN CERTIFICATE-----
+MIIFazCCA1OgAwIBAgIRAIIQz7DSQONZRGPgu2OCiwAwDQYJKoZIhvcNAQELBQAw
+TzELMAkGA1UEBhMCVVMxKTAnBgNVBAoTIEludGVybmV0IFNlY3VyaXR5IFJlc2Vh
+cmNoIEdyb3VwMRUwEwYDVQQDEwxJU1JHIFJvb3QgWDEwHhcNMTUwNjA0MTEwNDM4
+WhcNMzUwNjA0MTEwNDM4WjBPMQswCQYDVQQGEwJVUzEpMCcGA1UEChMgSW50ZXJu
+ZXQgU2VjdXJpdHkgUmVzZWFyY2ggR3JvdXAxFTATBgNVBAMTDElTUkcgUm9vdCBY
+MTCCAiIwDQYJKoZIhvcNAQEBBQADggIPADCCAgoCggIBAK3oJHP0FDfzm54rVygc
+h77ct984kIxuPOZXoHj3dcKi/vVqbvYATyjb3miGbESTtrFj/RQSa78f0uoxmyF+
+0TM8ukj13Xnfs7j/EvEhmkvBioZxaUpmZmyPfjxwv60pIgbz5MDmgK7iS4+3mX6U
+A5/TR5d8mUgjU+g4rk8Kb4Mu0UlXjIB0ttov0DiNewNwIRt18jA8+o+u3dpjq+sW
+T8KOEUt+zwvo/7V3LvSye0rgTBIlDHCNAymg4VMk7BPZ7hm/ELNKjD+Jo2FR3qyH
+B5T0Y3HsLuJvW5iB4YlcNHlsdu87kGJ55tukmi8mxdAQ4Q7e2RCOFvu396j3x+UC
+B5iPNgiV5+I3lg02dZ77DnKxHZu8A/lJBdiB3QW0KtZB6awBdpUKD9jf1b0SHzUv
+KBds0pjBqAlkd25HN7rOrFleaJ1/ctaJxQZBKT5ZPt0m9STJEadao0xAH0ahmbWn
+OlFuhjuefXKnEgV4We0+UXgVCwOPjdAvBbI+e0ocS3MFEvzG6uBQE3xDk3SzynTn
+jh8BCNAw1FtxNrQHusEwMFxIt4I7mKZ9YIqioymCzLq9gwQbooMDQaHWBfEbwrbw
+qHyGO0aoSCqI3Haadr8faqU9GY/rOPNk3sgrDQoo//fb4hVC1CLQJ13hef4Y53CI
+rU7m2Ys6xt0nUW7/vGT1M0NPAgMBAAGjQjBAMA4GA1UdDwEB/wQEAwIBBjAPBgNV
+HRMBAf8EBTADAQH/MB0GA1UdDgQWBBR5tFnme7bl5AFzgAiIyBpY9umbbjANBgkq
+hkiG9w0BAQsFAAOCAgEAVR9YqbyyqFDQDLHYGmkgJykIrGF1XIpu+ILlaS/V9lZL
+ubhzEFnTIZd+50xx+7LSYK05qAvqFyFWhfFQDlnrzuBZ6brJFe+GnY+EgPbk6ZGQ
+3BebYhtF8GaV0nxvwuo77x/Py9auJ/GpsMiu/X1+mvoiBOv/2X/qkSsisRcOj/KK
+NFtY2PwByVS5uCbMiogziUwthDyC3+6WVwW6LLv3xLfHTjuCvjHIInNzktHCgKQ5
+ORAzI4JMPJ+GslWYHb4phowim57iaztXOoJwTdwJx4nLCgdNbOhdjsnvzqvHu7Ur
+TkXWStAmzOVyyghqpZXjFaH3pO3JLF+l+/+sKAIuvtd7u+Nxe5AW0wdeRlN8NwdC
+jNPElpzVmbUq4JUagEiuTDkHzsxHpFKVK7q4+63SM1N95R1NbdWhscdCb+ZAJzVc
+oyi3B43njTOQ5yOf+1CceWxG1bQVs5ZufpsMljq4Ui0/1lvh+wjChP4kqKOJ2qxq
+4RgqsahDYVvTH9w7jXbyLeiNdd8XM2w9U/t7y0Ff/9yi0GE44Za4rF2LN9d11TPA
+mRGunUHBcnWEvgJBQl9nJEiU0Zsnvgc/ubhPgXRR4Xq37Z0j4r7g1SgEEzwxA57d
+emyPxgcYxn/eR44/KJ4EBs+lVDR3veyJm+kXQ99b21/+jh5Xos1AnX5iItreGCc=
+-----END CERTIFICATE-----
+-----BEGIN CERTIFICATE-----
+MIICGzCCAaGgAwIBAgIQQdKd0XLq7qeAwSxs6S+HUjAKBggqhkjOPQQDAzBPMQsw
+CQYDVQQGEwJVUzEpMCcGA1UEChMgSW50ZXJuZXQgU2VjdXJpdHkgUmVzZWFyY2gg
+R3JvdXAxFTATBgNVBAMTDElTUkcgUm9vdCBYMjAeFw0yMDA5MDQwMDAwMDBaFw00
+MDA5MTcxNjAwMDBaME8xCzAJBgNVBAYTAlVTMSkwJwYDVQQKEyBJbnRlcm5ldCBT
+ZWN1cml0eSBSZXNlYXJjaCBHcm91cDEVMBMGA1UEAxMMSVNSRyBSb290IFgyMHYw
+EAYHKoZIzj0CAQYFK4EEACIDYgAEzZvVn4CDCuwJSvMWSj5cz3es3mcFDR0HttwW
++1qLFNvicWDEukWVEYmO6gbf9yoWHKS5xcUy4APgHoIYOIvXRdgKam7mAHf7AlF9
+ItgKbppbd9/w+kHsOdx1ymgHDB/qo0IwQDAOBgNVHQ8BAf8EBAMCAQYwDwYDVR0T
+AQH/BAUwAwEB/zAdBgNVHQ4EFgQUfEKWrt5LSDv6kviejM9ti6lyN5UwCgYIKoZI
+zj0EAwMDaAAwZQIwe3lORlCEwkSHRhtFcP9Ymd70/aTSVaYgLXTWNLxBo1BfASdW
+tL4ndQavEi51mI38AjEAi/V3bNTIZargCyzuFJ0nN6T5U6VR5CmD1/iQMVtCnwr1
+/q4AaOeMSQ+2b1tbFfLn
+-----END CERTIFICATE-----
+-----BEGIN CERTIFICATE-----
+MIIFVzCCAz+gAwIBAgINAgPlk28xsBNJiGuiFzANBgkqhkiG9w0BAQwFADBHMQsw
+CQYDVQQGEwJVUzEiMCAGA1UEChMZR29vZ2xlIFRydXN0IFNlcnZpY2VzIExMQzEU
+MBIGA1UEAxMLR1RTIFJvb3QgUjEwHhcNMTYwNjIyMDAwMDAwWhcNMzYwNjIyMDAw
+MDAwWjBHMQswCQYDVQQGEwJVUzEiMCAGA1UEChMZR29vZ2xlIFRydXN0IFNlcnZp
+Y2VzIExMQzEUMBIGA1UEAxMLR1RTIFJvb3QgUjEwggIiMA0GCSqGSIb3DQEBAQUA
+A4ICDwAwggIKAoICAQC2EQKLHuOhd5s73L+UPreVp0A8of2C+X0yBoJx9vaMf/vo
+27xqLpeXo4xL+Sv2sfnOhB2x+cWX3u+58qPpvBKJXqeqUqv4IyfLpLGcY9vXmX7w
+Cl7raKb0xlpHDU0QM+NOsROjyBhsS+z8CZDfnWQpJSMHobTSPS5g4M/SCYe7zUjw
+TcLCeoiKu7rPWRnWr4+wB7CeMfGCwcDfLqZtbBkOtdh+JhpFAz2weaSUKK0Pfybl
+qAj+lug8aJRT7oM6iCsVlgmy4HqMLnXWnOunVmSPlk9orj2XwoSPwLxAwAtcvfaH
+szVsrBhQf4TgTM2S0yDpM7xSma8ytSmzJSq0SPly4cpk9+aCEI3oncKKiPo4Zor8
+Y/kB+Xj9e1x3+naH+uzfsQ55lVe0vSbv1gHR6xYKu44LtcXFilWr06zqkUspzBmk
+MiVOKvFlRNACzqrOSbTqn3yDsEB750Orp2yjj32JgfpMpf/VjsPOS+C12LOORc92
+wO1AK/1TD7Cn1TsNsYqiA94xrcx36m97PtbfkSIS5r762DL8EGMUUXLeXdYWk70p
+aDPvOmbsB4om3xPXV2V4J95eSRQAogB/mqghtqmxlbCluQ0WEdrHbEg8QOB+DVrN
+VjzRlwW5y0vtOUucxD/SVRNuJLDWcfr0wbrM7Rv1/oFB2ACYPTrIrnqYNxgFlQID
+AQABo0IwQDAOBgNVHQ8BAf8EBAMCAYYwDwYDVR0TAQH/BAUwAwEB/zAdBgNVHQ4E
+FgQU5K8rJnEaK0gnhS9SZizv8IkTcT4wDQYJKoZIhvcNAQEMBQADggIBAJ+qQibb
+C5u+/x6Wki4+omVKapi6Ist9wTrYggoGxval3sBOh2Z5ofmmWJyq+bXmYOfg6LEe
+QkEzCzc9zolwFcq1JKjPa7XSQCGYzyI0zzvFIoTgxQ6KfF2I5DUkzps+GlQebtuy
+h6f88/qBVRRiClmpIgUxPoLW7ttXNLwzldMXG+gnoot7TiYaelpkttGsN/H9oPM4
+7HLwEXWdyzRSjeZ2axfG34arJ45JK3VmgRAhpuo+9K4l/3wV3s6MJT/KYnAK9y8J
+ZgfIPxz88NtFMN9iiMG1D53Dn0reWVlHxYciNuaCp+0KueIHoI17eko8cdLiA6Ef
+MgfdG+RCzgwARWGAtQsgWSl4vflVy2PFPEz0tv/bal8xa5meLMFrUKTX5hgUvYU/
+Z6tGn6D/Qqc6f1zLXbBwHSs09dR2CQzreExZBfMzQsNhFRAbd03OIozUhfJFfbdT
+6u9AWpQKXCBfTkBdYiJ23//OYb2MI3jSNwLgjt7RETeJ9r/tSQdirpLsQBqvFAnZ
+0E6yove+7u7Y/9waLd64NnHi/Hm3lCXRSHNboTXns5lndcEZOitHTtNCjv0xyBZm
+2tIMPNuzjsmhDYAPexZ3FL//2wmUspO8IFgV6dtxQ/PeEMMA3KgqlbbC1j+Qa3bb
+bP6MvPJwNQzcmRk13NfIRmPVNnGuV/u3gm3c
+-----END CERTIFICATE-----
+-----BEGIN CERTIFICATE-----
+MIICCTCCAY6gAwIBAgINAgPlwGjvYxqccpBQUjAKBggqhkjOPQQDAzBHMQswCQYD
+VQQGEwJVUzEiMCAGA1UEChMZR29vZ2xlIFRydXN0IFNlcnZpY2VzIExMQzEUMBIG
+A1UEAxMLR1RTIFJvb3QgUjQwHhcNMTYwNjIyMDAwMDAwWhcNMzYwNjIyMDAwMDAw
+WjBHMQswCQYDVQQGEwJVUzEiMCAGA1UEChMZR29vZ2xlIFRydXN0IFNlcnZpY2Vz
+IExMQzEUMBIGA1UEAxMLR1RTIFJvb3QgUjQwdjAQBgcqhkjOPQIBBgUrgQQAIgNi
+AATzdHOnaItgrkO4NcWBMHtLSZ37wWHO5t5GvWvVYRg1rkDdc/eJkTBa6zzuhXyi
+QHY7qca4R9gq55KRanPpsXI5nymfopjTX15YhmUPoYRlBtHci8nHc8iMai/lxKvR
+HYqjQjBAMA4GA1UdDwEB/wQEAwIBhjAPBgNVHRMBAf8EBTADAQH/MB0GA1UdDgQW
+BBSATNbrdP9JNqPV2Py1PsVq8JQdjDAKBggqhkjOPQQDAwNpADBmAjEA6ED/g94D
+9J+uHXqnLrmvT/aDHQ4thQEd0dlq7A/Cr8deVl5c1RxYIigL9zC2L7F8AjEA8GE8
+p/SgguMh1YQdc4acLa/KNJvxn7kjNuK8YAOdgLOaVsjh4rsUecrNIdSUtUlD
+-----END CERTIFICATE-----
+)PEM";
+// 1 = TANPA verifikasi sertifikat (hanya untuk uji lokal / server self-signed)
+#define TLS_INSECURE 0
 
 Adafruit_ADXL345_Unified accel = Adafruit_ADXL345_Unified(12345);
 
@@ -19,6 +117,27 @@ Adafruit_ADXL345_Unified accel = Adafruit_ADXL345_Unified(12345);
 // Python server akan otomatis memotongnya menjadi window 256.
 const int BUFFER_SIZE = 512; 
 
+/* ================= FORMAT PAYLOAD ================= */
+// 1 = kirim frame biner VIB1 (int16 berskala 0.01 m/s^2, ~3 KB per batch)
+// 0 = kirim JSON lama (~10 KB String per batch)
+#define USE_BINARY_PAYLOAD 1
+const uint32_t DEVICE_ID = 1;        // ID unik tiap unit ESP32
+const uint16_t SAMPLE_RATE_HZ = 1600;
+const float INT16_SCALE = 0.01f;     // 1 LSB = 0.01 m/s^2 (sama dengan 2 desimal di JSON)
+const int FRAME_HEADER_SIZE = 24;
+uint32_t batchSeq = 0;
+
+// 1 = satu koneksi TLS panjang ke /stream (POST chunked), tiap batch = satu chunk frame VIB1.
+//     Tidak ada lagi handshake TLS + HTTPClient baru per batch. Butuh USE_BINARY_PAYLOAD 1.
+#define USE_STREAM 1
+// Stream ditutup & dibuka ulang tiap N frame (~10 menit di 1600 Hz) supaya proxy tidak memutus
+const uint32_t STREAM_ROTATE_FRAMES = 2000;
+
+#if USE_BINARY_PAYLOAD
+// Header 24 byte + 512 x 3 x int16 = 3096 byte, dialokasikan statis (tanpa heap)
+uint8_t frameBuf[FRAME_HEADER_SIZE + BUFFER_SIZE * 3 * 2];
+#endif
+
 float xBuff[BUFFER_SIZE];
 float yBuff[BUFFER_SIZE];
 float zBuff[BUFFER_SIZE];
@@ -96,10 +215,128 @@ void loop() {
   delayMicroseconds(400); 
 }
 
+#if USE_BINARY_PAYLOAD
+// Tulis nilai little-endian ke buffer (ESP32 sendiri little-endian)
+static inline void putU16(uint8_t* p, uint16_t v) { memcpy(p, &v, 2); }
+static inline void putU32(uint8_t* p, uint32_t v) { memcpy(p, &v, 4); }
+
+static inline int16_t toInt16(float v) {
+  float scaled = roundf(v / INT16_SCALE);
+  if (scaled > 32767.0f) scaled = 32767.0f;
+  if (scaled < -32768.0f) scaled = -32768.0f;
+  return (int16_t)scaled;
+}
+
+size_t buildBinaryFrame() {
+  // Header: magic, format, flags, sample rate, device id, seq, jumlah sampel, skala
+  memcpy(frameBuf, "VIB1", 4);
+  frameBuf[4] = 1; // format int16
+  frameBuf[5] = 0; // flags
+  putU16(frameBuf + 6, SAMPLE_RATE_HZ);
+  putU32(frameBuf + 8, DEVICE_ID);
+  putU32(frameBuf + 12, batchSeq++);
+  putU32(frameBuf + 16, BUFFER_SIZE);
+  memcpy(frameBuf + 20, &INT16_SCALE, 4);
+
+  uint8_t* p = frameBuf + FRAME_HEADER_SIZE;
+  for (int i = 0; i < BUFFER_SIZE; i++) {
+    int16_t xyz[3] = { toInt16(xBuff[i]), toInt16(yBuff[i]), toInt16(zBuff[i]) };
+    memcpy(p, xyz, sizeof(xyz));
+    p += sizeof(xyz);
+  }
+  return p - frameBuf;
+}
+#endif
+
+#if USE_BINARY_PAYLOAD && USE_STREAM
+WiFiClientSecure streamClient;
+uint32_t streamFrames = 0;
+
+bool openStream() {
+#if TLS_INSECURE
+  streamClient.setInsecure();
+#else
+  streamClient.setCACert(ROOT_CA_BUNDLE);
+#endif
+  if (!streamClient.connect(serverHost, 443)) {
+    Serial.println("[ERROR] Gagal membuka koneksi stream.");
+    return false;
+  }
+  streamClient.print("POST /stream HTTP/1.1\r\n");
+  streamClient.print("Host: "); streamClient.print(serverHost); streamClient.print("\r\n");
+  streamClient.print("Content-Type: application/x-vib-frame\r\n");
+  streamClient.print("X-Device-Id: "); streamClient.print(DEVICE_ID); streamClient.print("\r\n");
+  streamClient.print("Transfer-Encoding: chunked\r\n\r\n");
+  streamFrames = 0;
+  Serial.println("[NETWORK] Stream /stream terbuka.");
+  return true;
+}
+
+void closeStream() {
+  // Chunk kosong = akhir body, lalu baca ringkasan dari server
+  streamClient.print("0\r\n\r\n");
+  unsigned long start = millis();
+  while (streamClient.connected() && !streamClient.available() && millis() - start < 2000) delay(10);
+  while (streamClient.available()) Serial.write(streamClient.read());
+  Serial.println();
+  streamClient.stop();
+}
+
+void streamDataBatch() {
+  if (WiFi.status() != WL_CONNECTED) {
+    Serial.println("WiFi Disconnected! Reconnecting...");
+    streamClient.stop();
+    WiFi.reconnect();
+    return;
+  }
+  if (!streamClient.connected() && !openStream()) return;
+
+  size_t frameLen = buildBinaryFrame();
+  unsigned long startSend = millis();
+  // Satu chunk HTTP: ukuran (hex) CRLF data CRLF
+  streamClient.print(String(frameLen, HEX)); streamClient.print("\r\n");
+  size_t written = streamClient.write(frameBuf, frameLen);
+  streamClient.print("\r\n");
+  unsigned long endSend = millis();
+
+  if (written != frameLen) {
+    Serial.println("[ERROR] Stream terputus, buka ulang di batch berikutnya.");
+    streamClient.stop();
+    return;
+  }
+  if (++streamFrames % 100 == 0) {
+    Serial.print("[STREAM] "); Serial.print(streamFrames);
+    Serial.print(" frame terkirim | tulis terakhir: "); Serial.print(endSend - startSend); Serial.println(" ms");
+  }
+  if (streamFrames >= STREAM_ROTATE_FRAMES) closeStream();
+}
+#endif
+
 void sendDataBatch() {
+#if USE_BINARY_PAYLOAD && USE_STREAM
+  streamDataBatch();
+  return;
+#endif
   if(WiFi.status() == WL_CONNECTED) {
     HTTPClient http;
+#if TLS_INSECURE
     http.begin(serverUrl);
+#else
+    http.begin(serverUrl, ROOT_CA_BUNDLE);
+#endif
+
+#if USE_BINARY_PAYLOAD
+    http.addHeader("Content-Type", "application/x-vib-frame");
+    size_t frameLen = buildBinaryFrame();
+
+    Serial.print("[NETWORK] Transmisi frame biner (");
+    Serial.print(frameLen);
+    Serial.println(" byte) ke Cloud Server Railway...");
+
+    unsigned long startSend = millis();
+    int httpResponseCode = http.POST(frameBuf, frameLen);
+    unsigned long endSend = millis();
+#else
     http.addHeader("Content-Type", "application/json");
 
     // --- MEMORY RESERVATION (Untuk mencegah terjadinya crash) ---
@@ -115,7 +352,9 @@ void sendDataBatch() {
     Serial.println(" Sampel Data Getaran (Batch Size)...");
     Serial.println("[DATA] Mengekstrak Sumbu X, Y, Z dari ADXL345:");
 
-    json = "{\"data\":[";
+    json = "{\"device_id\":";
+    json += String(DEVICE_ID);
+    json += ",\"data\":[";
     
     for(int i=0; i<BUFFER_SIZE; i++) {
       json += "[";
@@ -145,6 +384,7 @@ void sendDataBatch() {
     // Kirim POST Request
     int httpResponseCode = http.POST(json);
     unsigned long endSend = millis();
+#endif
     
     if (httpResponseCode > 0) {
       Serial.print("[SUCCESS] Data Sent | Batch Size : ");
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# ================================= STUB LOKAL TELEGRAM BOT API ===========================================
+# Server HTTP kecil yang meniru https://api.telegram.org/bot<TOKEN>/<method> untuk
+# replay & benchmark, jadi tidak ada pesan sungguhan yang terkirim.
+#   - latency    : jeda buatan tiap request (detik), meniru jaringan ke Telegram
+#   - fail_every : tiap request ke-N dibalas 429 (retry_after) untuk uji backoff
+# Semua panggilan dicatat di `calls` (method, chat_id, ukuran body, waktu).
+#
+# Pakai mandiri:  python fake_telegram.py 8081   lalu  TELEGRAM_API_URL=http://127.0.0.1:8081
+
+
+class FakeTelegramServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_every=0, retry_after=1):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.calls = []
+        self._lock = threading.Lock()
+        self._count = 0
+        self._message_id = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-telegram", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, method=None):
+        with self._lock:
+            return sum(1 for c in self.calls if method is None or c['method'] == method)
+
+    def _record(self, method, chat_id, size):
+        with self._lock:
+            self._count += 1
+            self._message_id += 1
+            self.calls.append({'method': method, 'chat_id': chat_id, 'bytes': size, 'time': time.time()})
+            throttled = self.fail_every and self._count % self.fail_every == 0
+            return self._message_id, throttled
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                # Path: /bot<TOKEN>/<method>
+                parts = self.path.split('?', 1)[0].strip('/').split('/')
+                if len(parts) != 2 or not parts[0].startswith('bot'):
+                    self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                    return
+                method = parts[1]
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                chat_id = _extract_chat_id(body, self.headers.get('Content-Type', ''))
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+                message_id, throttled = stub._record(method, chat_id, len(body))
+                if throttled:
+                    self._reply(429, {'ok': False, 'error_code': 429,
+                                      'description': f'Too Many Requests: retry after {stub.retry_after}',
+                                      'parameters': {'retry_after': stub.retry_after}})
+                    return
+                if method == 'getMe':
+                    result = {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+                elif method == 'getUpdates':
+                    result = []
+                else:
+                    result = {'message_id': message_id, 'date': int(time.time()),
+                              'chat': {'id': chat_id, 'type': 'private'}}
+                self._reply(200, {'ok': True, 'result': result})
+
+            do_POST = _handle
+            do_GET = _handle
+
+        return Handler
+
+
+def _extract_chat_id(body, content_type):
+    # Cukup untuk statistik: form-urlencoded, JSON, atau multipart sederhana
+    try:
+        if 'json' in content_type:
+            return json.loads(body or b'{}').get('chat_id')
+        text = body.decode('utf-8', errors='ignore')
+        if 'multipart' in content_type:
+            marker = 'name="chat_id"'
+            i = text.find(marker)
+            if i >= 0:
+                return text[i + len(marker):].split('\r\n\r\n', 1)[1].split('\r\n', 1)[0]
+            return None
+        from urllib.parse import parse_qs
+        return parse_qs(text).get('chat_id', [None])[0]
+    except Exception:
+        return None
+
+
+if __name__ == '__main__':
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    stub = FakeTelegramServer(port=port).start()
+    print(f"[INFO] Fake Telegram Bot API jalan di {stub.url} (Ctrl+C untuk berhenti)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,102 @@
+import threading
+import numpy as np
+
+
+# ================================= EKSTRAKSI FITUR SPEKTRUM (STREAMING) ===========================================
+# Fitur sama dengan extract_features_live di server.py:
+#
+#   [tilt x, tilt y, tilt z, |FFT x| bin a..b, |FFT y| bin a..b, |FFT z| bin a..b]
+#   (sinyal di-clip +-clip dulu; default a=2, b=N/2, clip=5.0 -> 381 fitur untuk N=256)
+#
+# Bedanya: satu rfft untuk semua window & ketiga sumbu sekaligus (spektrum sinyal real
+# simetris, jadi |rfft| bin a..b == |fft| bin a..b), tanpa spektrum kompleks penuh.
+# Buffer clip (K,3,N) dan buffer fitur dipakai ulang per thread; sumbu FFT dibuat
+# kontigu supaya hasil rfft bisa langsung ditulis ke kolom fitur tanpa transpose.
+# Plan FFT: scipy.fft menyimpan cache plan sendiri per panjang transform, dan di sini
+# panjangnya selalu sama (window), jadi plan dibuat sekali lalu dipakai terus.
+# scipy.fft baru di-import saat transform() pertama (startup server tidak menunggu scipy).
+
+DEFAULT_CLIP = 5.0
+DEFAULT_START_BIN = 2
+
+
+class SpectralFeatureExtractor:
+    def __init__(self, window=256, start_bin=DEFAULT_START_BIN, end_bin=None, clip=DEFAULT_CLIP,
+                 channels=3, workers=1):
+        self.window = window
+        self.start_bin = start_bin
+        self.end_bin = window // 2 if end_bin is None else end_bin
+        if not 0 <= self.start_bin < self.end_bin <= window // 2 + 1:
+            raise ValueError(f"Rentang bin {self.start_bin}..{self.end_bin} tidak valid untuk window {window}")
+        self.clip = clip
+        self.channels = channels
+        self.workers = workers
+        self.n_bins = self.end_bin - self.start_bin
+        self.n_features = channels + channels * self.n_bins
+        self._local = threading.local()  # buffer per thread (worker pipeline jalan paralel)
+
+    def _buffers(self, k):
+        buf = getattr(self._local, 'buf', None)
+        if buf is None or buf[0].shape[0] < k:
+            cap = max(k, 8)
+            buf = self._local.buf = (np.empty((cap, self.channels, self.window)),
+                                     np.empty((cap, self.n_features)))
+        return buf[0][:k], buf[1][:k]
+
+    def transform(self, windows, copy=True):
+        # windows: (K, window, channels) -> fitur (K, n_features)
+        # copy=False: hasil berupa view buffer internal, hanya valid sampai transform()
+        # berikutnya di thread yang sama (cukup untuk langsung dimasukkan ke model)
+        windows = np.asarray(windows)
+        if windows.ndim == 2:
+            windows = windows[np.newaxis]
+        k, n, c = windows.shape
+        if n != self.window or c != self.channels:
+            raise ValueError(f"Window harus ({self.window}, {self.channels}), dapat ({n}, {c})")
+
+        signal_clip, feat = self._buffers(k)
+        # Clip sekaligus transpose ke (K, 3, N): sumbu waktu kontigu untuk FFT
+        if self.clip is None:
+            signal_clip[...] = windows.transpose(0, 2, 1)
+        else:
+            np.clip(windows.transpose(0, 2, 1), -self.clip, self.clip, out=signal_clip)
+
+        np.mean(signal_clip, axis=2, out=feat[:, :self.channels])
+        from scipy.fft import rfft
+        spec = rfft(signal_clip, axis=2, workers=self.workers)
+        # Kolom spektrum = (K, 3, bin) berurutan x, y, z -> view langsung dari buffer fitur
+        np.abs(spec[:, :, self.start_bin:self.end_bin],
+               out=feat[:, self.channels:].reshape(k, self.channels, self.n_bins))
+        return feat.copy() if copy else feat
+
+
+class SpectralAverager:
+    # Mode sliding/Welch opsional: fitur tiap window = rata-rata M window terakhir
+    # (tilt dirata-rata biasa, spektrum dirata-rata dalam daya lalu diakar).
+    # Satu objek per sesi; tiap window baru hanya O(n_features) karena pakai jumlah berjalan.
+    def __init__(self, n_channels, n_features, span):
+        self.n_channels = n_channels
+        self.span = span
+        self._ring = np.zeros((span, n_features))
+        self._sum = np.zeros(n_features)
+        self._pos = 0
+        self._count = 0
+
+    def update(self, features):
+        features = np.atleast_2d(features)
+        out = np.empty_like(features, dtype=float)
+        c = self.n_channels
+        for i, row in enumerate(features):
+            value = row.astype(float)
+            value[c:] **= 2  # magnitudo -> daya
+            self._sum += value - self._ring[self._pos]
+            self._ring[self._pos] = value
+            self._pos = (self._pos + 1) % self.span
+            self._count = min(self._count + 1, self.span)
+            if self._pos == 0:
+                # hitung ulang tiap satu putaran supaya galat penjumlahan tidak menumpuk
+                self._sum = self._ring.sum(axis=0)
+            avg = self._sum / self._count
+            out[i, :c] = avg[:c]
+            out[i, c:] = np.sqrt(np.maximum(avg[c:], 0.0))
+        return out
@@ -0,0 +1,59 @@
+import os
+import multiprocessing
+
+# Banyak worker = sesi harus di store bersama (SQLite), bukan dict per proses
+os.environ.setdefault("SESSION_STORE", "sqlite")
+
+
+# ================================= KONFIGURASI GUNICORN ===========================================
+# Jalankan: gunicorn -c gunicorn.conf.py wsgi:app
+#
+#   WEB_CONCURRENCY  : jumlah proses worker (default 2)
+#   GUNICORN_THREADS : thread per worker (gthread; /stream menahan satu thread per koneksi)
+#   SESSION_DB       : file SQLite sesi, dipakai bersama semua worker + proses bot
+#
+# Catatan: /metrics dihitung per worker (tiap scrape mengenai salah satu worker).
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+preload_app = True
+
+_bot_process = None
+
+
+def when_ready(arbiter):
+    # Bot polling hanya boleh satu (Telegram menolak getUpdates ganda), jadi jalan di
+    # proses sendiri milik master, bukan di tiap worker.
+    global _bot_process
+    import server
+    if not server.TOKEN:
+        arbiter.log.warning("TOKEN KOSONG! Bot Telegram tidak dijalankan.")
+        return
+    # Bukan daemon: proses bot sendiri membuat process pool render
+    _bot_process = multiprocessing.Process(target=server.run_telegram, name="telegram-bot")
+    _bot_process.start()
+    arbiter.log.info("Bot Telegram jalan (pid %s)", _bot_process.pid)
+
+
+def post_fork(server, worker):
+    # Model (+ watcher hot reload) & proses render disiapkan di background per worker:
+    # thread tidak ikut ter-fork dari master, dan worker langsung bisa menerima request
+    import server as app_server
+    app_server.start_background_init()
+
+
+def worker_exit(server, worker):
+    # Chunk yang sudah diambil dari antrian bersama & notifikasi Telegram (laporan akhir)
+    # yang masih antri di worker ini diselesaikan dulu
+    import server as app_server
+    app_server.pipeline_queue.join(timeout=10)
+    app_server.notifier.join(timeout=10)
+
+
+def on_exit(server):
+    if _bot_process is not None and _bot_process.is_alive():
+        _bot_process.terminate()
+        _bot_process.join(10)
@@ -0,0 +1,313 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ================================= GERBANG INFERENSI (LEWATI WINDOW SEPI / TIDAK BERUBAH) ===========================================
+# Tiap hop 128 sampel memicu Scaler + PCA + Random Forest, padahal saat motor diam atau
+# putaran stabil hasilnya praktis sama. Fitur spektrum tetap dihitung (murah, satu rfft per
+# batch); dari fitur itu gerbang memutuskan window mana yang benar-benar perlu PCA + RF:
+#
+#   - sepi: RMS pita semua sumbu (dihitung dari spektrum yang sudah ada, Parseval) di bawah
+#     GATE_RMS_FLOOR (batas yang sama dengan "sinyal datar" di waveform_status) dan tilt
+#     tidak bergeser -> window acuan juga sepi: pakai ulang prediksinya
+#   - stasioner: energi per pita (GATE_BANDS pita per sumbu) berubah kurang dari
+#     GATE_CHANGE_TOL (L1 relatif) terhadap window acuan dan tilt tetap -> pakai ulang
+#     (0.1 energi ~ 5% amplitudo; antar window sinyal stasioner sendiri berbeda +-0.06)
+#   - sisanya masuk PCA; vektor PCA dikuantisasi (GATE_CACHE_STEP) lalu dicari di cache LRU
+#     milik sesi (GateState, dikosongkan saat versi model berganti) -> RF hanya untuk yang
+#     belum ada di cache. Hit hanya dari window sesi itu sendiri, jadi hasil satu sesi tidak
+#     bergantung pada sesi / device lain yang kebetulan diproses lebih dulu.
+#
+# Window acuan = window pertama sebuah "kondisi" (per sesi, GateState); kondisi berganti
+# begitu satu window gagal salah satu syarat di atas. Window yang dilewati mendapat rata-rata
+# probabilitas semua window yang diprediksi sejak kondisi itu mulai, dan setelah
+# GATE_MAX_REUSE (sepi: GATE_QUIET_MAX_REUSE) window dilewati berturut-turut, satu window
+# tetap diprediksi untuk memperbarui rata-rata itu. Setiap window tetap mendapat skor, jadi
+# EMA tetap diupdate per window seperti sebelumnya.
+#
+# Biaya PCA + RF per panggilan hampir tetap untuk batch kecil, jadi penghematan nyata
+# terjadi saat SEMUA window satu batch dilewati (karena itu GATE_MAX_REUSE > jumlah window
+# per batch). Dengan ambang default, selisih EMA rata-rata < 2 poin, tetapi saat amplitudo
+# naik pelan melewati batas kelas RF selisih sesaat bisa +-10 poin
+# (benchmarks/bench_inference_gate.py). Karena itu gerbang opt-in: nyalakan dengan
+# GATE_ENABLED=1 kalau selisih itu bisa diterima.
+#
+# GATE_VERIFY=1: semua window juga diprediksi penuh, lalu jejak EMA dengan & tanpa gerbang
+# dibandingkan (selisih maksimum, label beda) di /status. Untuk kalibrasi ambang saja,
+# CPU malah bertambah selama mode ini nyala.
+
+GATE_ENABLED = os.getenv("GATE_ENABLED", "0") == "1"
+GATE_RMS_FLOOR = float(os.getenv("GATE_RMS_FLOOR", 0.05))
+GATE_CHANGE_TOL = float(os.getenv("GATE_CHANGE_TOL", 0.1))
+GATE_TILT_TOL = float(os.getenv("GATE_TILT_TOL", 0.2))
+GATE_BANDS = int(os.getenv("GATE_BANDS", 8))
+GATE_MAX_REUSE = int(os.getenv("GATE_MAX_REUSE", 7))          # stasioner: 1 dari 8 window tetap diprediksi
+GATE_QUIET_MAX_REUSE = int(os.getenv("GATE_QUIET_MAX_REUSE", 25))  # sepi: +-2 detik pada 1600 Hz, hop 128
+GATE_CACHE_SIZE = int(os.getenv("GATE_CACHE_SIZE", 256))  # per sesi (ikut di-pickle), 0 = tanpa cache
+GATE_CACHE_STEP = float(os.getenv("GATE_CACHE_STEP", 0.05))
+GATE_VERIFY = os.getenv("GATE_VERIFY", "0") == "1"
+
+# Estimasi CPU yang dihemat: PCA + RF penuh diukur sekali per (versi model, ukuran batch)
+# pada batch nyata; run pertama (dingin) dibuang, median sisanya dipakai. Batch lebih besar
+# dari COST_CALIBRATION_MAX_WINDOWS (diagnosa batch) tidak dikalibrasi (tidak dihitung hemat)
+COST_CALIBRATION_RUNS = 4
+COST_CALIBRATION_MAX_WINDOWS = 64
+RESULTS = ('inferred', 'cached', 'quiet', 'stationary')
+
+
+class GateState:
+    # Per sesi (ikut di-pickle di store sqlite): ringkasan window acuan terakhir
+    def __init__(self):
+        self.version = None
+        self.tilt = None
+        self.quiet = False
+        self.bands = None
+        self.prob_sum = None  # jumlah probabilitas window yang diprediksi sejak kondisi ini mulai
+        self.prob_n = 0
+        self.reused = 0       # window berturut-turut yang dilewati sejak prediksi terakhir
+        self.cache = OrderedDict()  # vektor PCA terkuantisasi (bytes) -> probabilitas RF
+        self.ema_gated = 0.0  # mode verifikasi
+        self.ema_full = 0.0
+
+
+class InferenceGate:
+    def __init__(self, channels, window, n_bins, rms_floor=GATE_RMS_FLOOR, change_tol=GATE_CHANGE_TOL,
+                 tilt_tol=GATE_TILT_TOL, bands=GATE_BANDS, max_reuse=GATE_MAX_REUSE,
+                 quiet_max_reuse=GATE_QUIET_MAX_REUSE,
+                 cache_size=GATE_CACHE_SIZE, cache_step=GATE_CACHE_STEP, verify=GATE_VERIFY,
+                 ema_alpha=0.15, stage_timer=None, windows=None, saved=None):
+        self.channels = channels
+        self.window = window
+        self.rms_floor = rms_floor
+        self.change_tol = change_tol
+        self.tilt_tol = tilt_tol
+        self.max_reuse = max_reuse
+        self.quiet_max_reuse = quiet_max_reuse
+        self.cache_size = cache_size
+        self.cache_step = cache_step
+        self.verify = verify
+        self.ema_alpha = ema_alpha
+        self.stage_timer = stage_timer  # StageTimer: tahap 'pca' & 'rf'
+        self.windows = windows          # Counter{result}: inferred / cached / quiet / stationary
+        self.saved = saved              # Counter: detik CPU PCA + RF yang tidak perlu dijalankan
+        self._edges = np.linspace(0, n_bins, min(bands, n_bins) + 1).astype(int)[:-1]
+        self._lock = threading.Lock()
+        self._cost = {}  # jumlah window -> detik PCA + RF penuh per panggilan (versi _cost_version)
+        self._cost_version = None
+        self.counts = dict.fromkeys(RESULTS, 0)
+        self.saved_seconds = 0.0
+        self.verify_stats = {'windows': 0, 'max_ema_diff': 0.0, 'sum_ema_diff': 0.0, 'label_mismatch': 0}
+
+    def new_state(self):
+        return GateState()
+
+    # --- keputusan per window ---
+
+    def _describe(self, features):
+        k, c = len(features), self.channels
+        power = np.square(features[:, c:].reshape(k, c, -1))
+        # Parseval satu sisi: RMS komponen getaran di rentang bin fitur, per sumbu
+        rms = np.sqrt(2.0 * power.sum(axis=2)) / self.window
+        bands = np.add.reduceat(power, self._edges, axis=2).reshape(k, -1)
+        return features[:, :c], rms.max(axis=1) < self.rms_floor, bands
+
+    def _plan(self, state, features, version):
+        # -> (infer, fresh): infer[i] = window i lewat PCA (+RF), fresh[i] = window i memulai
+        # kondisi baru (acuan baru, rata-rata probabilitas kondisi lama dibuang)
+        if state.version != version:
+            state.version, state.prob_sum, state.prob_n = version, None, 0
+            state.cache.clear()
+        tilt, quiet, bands = self._describe(features)
+        k = len(features)
+        infer = np.ones(k, dtype=bool)
+        fresh = np.zeros(k, dtype=bool)
+        counts = {'quiet': 0, 'stationary': 0}
+        have_ref = state.prob_n > 0
+        ref_tilt, ref_quiet, ref_bands, reused = state.tilt, state.quiet, state.bands, state.reused
+        changed = False
+        for i in range(k):
+            reason = None
+            if have_ref and np.abs(tilt[i] - ref_tilt).max() <= self.tilt_tol:
+                if quiet[i] and ref_quiet:
+                    reason = 'quiet'
+                elif not quiet[i] and not ref_quiet and \
+                        np.abs(bands[i] - ref_bands).sum() <= self.change_tol * ref_bands.sum():
+                    reason = 'stationary'
+            if reason is None:
+                fresh[i], have_ref, changed, reused = True, True, True, 0
+                ref_tilt, ref_quiet, ref_bands = tilt[i], quiet[i], bands[i]
+            elif reused < (self.quiet_max_reuse if reason == 'quiet' else self.max_reuse):
+                infer[i] = False
+                reused += 1
+                counts[reason] += 1
+            else:
+                reused = 0  # kondisi sama, tetapi sudah waktunya diprediksi ulang
+        if changed:
+            # tilt bisa berupa view buffer fitur (dipakai ulang di batch berikutnya)
+            state.tilt, state.quiet, state.bands = ref_tilt.copy(), bool(ref_quiet), ref_bands.copy()
+        state.reused = reused
+        return infer, fresh, counts
+
+    # --- cache LRU hasil RF per vektor PCA terkuantisasi (per sesi, di bawah lock device) ---
+
+    @staticmethod
+    def _cache_get(state, keys):
+        found = []
+        for key in keys:
+            probs = state.cache.get(key)
+            if probs is not None:
+                state.cache.move_to_end(key)
+            found.append(probs)
+        return found
+
+    def _cache_put(self, state, keys, probs):
+        for key, row in zip(keys, probs):
+            state.cache[key] = row
+        while len(state.cache) > self.cache_size:
+            state.cache.popitem(last=False)
+
+    # --- API ---
+
+    def predict_proba(self, state, features, model):
+        # -> (probabilitas K x kelas, indeks window yang lewat PCA)
+        t_start = time.perf_counter()
+        k = len(features)
+        self._calibrate(features, model)
+        infer, fresh, counts = self._plan(state, features, model.version)
+        run = np.flatnonzero(infer)
+        probs = np.empty((k, len(model.classes_)))
+        t_pca = t_rf = 0.0
+        n_rf = 0
+        if len(run):
+            t0 = time.perf_counter()
+            features_pca = model.reduce(features[run])
+            t_pca = time.perf_counter() - t0
+            miss = np.arange(len(run))
+            if self.cache_size > 0:
+                keys = [row.tobytes() for row in np.round(features_pca / self.cache_step).astype(np.int32)]
+                found = self._cache_get(state, keys)
+                miss = np.array([j for j, p in enumerate(found) if p is None], dtype=int)
+                for j, p in enumerate(found):
+                    if p is not None:
+                        probs[run[j]] = p
+            if len(miss):
+                t0 = time.perf_counter()
+                out = model.proba(features_pca[miss])
+                t_rf = time.perf_counter() - t0
+                probs[run[miss]] = out
+                n_rf = len(miss)
+                if self.cache_size > 0:
+                    self._cache_put(state, [keys[j] for j in miss], out)
+
+        # Window yang dilewati memakai rata-rata probabilitas semua window yang diprediksi
+        # sejak kondisi ini mulai (bukan satu window acuan saja: noise satu window tidak
+        # diulang-ulang ke EMA)
+        prob_sum, prob_n = state.prob_sum, state.prob_n
+        for i in range(k):
+            if fresh[i]:
+                prob_sum, prob_n = np.zeros(probs.shape[1]), 0
+            if infer[i]:
+                prob_sum = prob_sum + probs[i]
+                prob_n += 1
+            else:
+                probs[i] = prob_sum / prob_n
+        state.prob_sum, state.prob_n = prob_sum, prob_n
+
+        if self.stage_timer is not None:
+            if len(run):
+                self.stage_timer.observe('pca', t_pca)
+            if n_rf:
+                self.stage_timer.observe('rf', t_rf)
+        counts['inferred'] = n_rf
+        counts['cached'] = len(run) - n_rf
+        self._account(counts, k, time.perf_counter() - t_start)
+        return probs, run
+
+    # --- estimasi CPU yang dihemat ---
+
+    def _calibrate(self, features, model):
+        # Biaya PCA + RF tanpa gerbang untuk batch ini, diukur langsung (hangat) kalau belum
+        # ada ukuran terkalibrasi yang sama atau lebih besar. Dengan gerbang, batch penuh
+        # hampir tidak pernah lewat PCA + RF, jadi biaya tidak bisa diambil dari panggilan biasa
+        k = len(features)
+        with self._lock:
+            if self._cost_version != model.version:
+                self._cost, self._cost_version = {}, model.version
+            if k > COST_CALIBRATION_MAX_WINDOWS or any(m >= k for m in self._cost):
+                return
+        runs = []
+        for _ in range(COST_CALIBRATION_RUNS):
+            t0 = time.perf_counter()
+            model.proba(model.reduce(features))
+            runs.append(time.perf_counter() - t0)
+        with self._lock:
+            if self._cost_version == model.version:
+                self._cost[k] = float(np.median(runs[1:]))
+
+    def _estimate(self, k):
+        # Ukuran sama -> hasil kalibrasi. Ukuran lebih kecil diskalakan turun dari ukuran
+        # terkalibrasi terkecil di atasnya: biaya tetap per panggilan ikut terbagi, jadi
+        # estimasinya kurang (bukan lebih) dari biaya sebenarnya
+        if k in self._cost:
+            return self._cost[k]
+        larger = [m for m in self._cost if m > k]
+        if not larger:
+            return 0.0
+        m = min(larger)
+        return self._cost[m] * k / m
+
+    def _account(self, counts, k, spent):
+        # CPU dihemat = estimasi PCA + RF tanpa gerbang untuk K window - seluruh waktu gerbang
+        # (kalibrasi, keputusan, PCA, cache, RF)
+        with self._lock:
+            saved = max(self._estimate(k) - spent, 0.0)
+            self.saved_seconds += saved
+            for result, n in counts.items():
+                self.counts[result] += n
+        if self.windows is not None:
+            for result, n in counts.items():
+                if n:
+                    self.windows.labels(result).inc(n)
+        if self.saved is not None and saved:
+            self.saved.inc(saved)
+
+    def record_verify(self, state, gated_scores, full_scores, gated_labels, full_labels):
+        # Jejak EMA (skor 0-1, alpha sama dengan sesi) dengan vs tanpa gerbang
+        a = self.ema_alpha
+        worst, total = 0.0, 0.0
+        for gated, full in zip(gated_scores, full_scores):
+            state.ema_gated = gated * a + state.ema_gated * (1.0 - a)
+            state.ema_full = full * a + state.ema_full * (1.0 - a)
+            diff = abs(state.ema_gated - state.ema_full)
+            worst, total = max(worst, diff), total + diff
+        mismatch = int(np.count_nonzero(np.asarray(gated_labels) != np.asarray(full_labels)))
+        with self._lock:
+            stats = self.verify_stats
+            stats['windows'] += len(gated_scores)
+            stats['max_ema_diff'] = max(stats['max_ema_diff'], worst)
+            stats['sum_ema_diff'] += total
+            stats['label_mismatch'] += mismatch
+
+    def info(self):
+        with self._lock:
+            counts = dict(self.counts)
+            total = sum(counts.values())
+            out = {
+                'windows': counts,
+                'skipped_ratio': round(1 - counts['inferred'] / total, 4) if total else 0.0,
+                'cpu_saved_s': round(self.saved_seconds, 3),
+            }
+            if self.verify:
+                stats = self.verify_stats
+                out['verify'] = {
+                    'windows': stats['windows'],
+                    'max_ema_diff_pct': round(stats['max_ema_diff'] * 100, 3),
+                    'mean_ema_diff_pct': round(stats['sum_ema_diff'] * 100 / stats['windows'], 4)
+                                         if stats['windows'] else 0.0,
+                    'label_mismatch': stats['label_mismatch'],
+                }
+        return out
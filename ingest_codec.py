@@ -0,0 +1,206 @@
+import json
+import struct
+import zlib
+import numpy as np
+
+
+# ================================= FORMAT BINER /raw_data ===========================================
+#
+# Satu frame = header 24 byte (little-endian) + sampel XYZ yang di-pack berurutan:
+#
+#   offset  tipe     isi
+#   0       4s       magic b'VIB1'
+#   4       uint8    format sampel (0 = float32, 1 = int16 berskala)
+#   5       uint8    flags (cadangan, isi 0)
+#   6       uint16   sample rate (Hz)
+#   8       uint32   device id
+#   12      uint32   nomor urut batch (sequence number)
+#   16      uint32   jumlah sampel N (jumlah baris XYZ)
+#   20      float32  skala int16 -> m/s^2 (diabaikan untuk float32)
+#
+# Body berisi N x 3 nilai (x0, y0, z0, x1, y1, z1, ...). Beberapa frame boleh
+# disambung dalam satu body, karena panjang tiap frame bisa dihitung dari N.
+
+MAGIC = b'VIB1'
+HEADER = struct.Struct('<4sBBHIIIf')
+
+FMT_FLOAT32 = 0
+FMT_INT16 = 1
+
+SAMPLE_DTYPES = {
+    FMT_FLOAT32: np.dtype('<f4'),
+    FMT_INT16: np.dtype('<i2'),
+}
+FORMAT_NAMES = {FMT_FLOAT32: 'float32', FMT_INT16: 'int16'}
+
+# Resolusi default int16 = 0.01 m/s^2 (sama dengan 2 desimal di JSON ESP32)
+DEFAULT_INT16_SCALE = 0.01
+DEFAULT_SAMPLE_RATE = 1600
+
+CONTENT_TYPES_BINARY = ('application/x-vib-frame', 'application/octet-stream')
+
+# Batas body setelah dekompresi (pengaman gzip bomb)
+MAX_DECODED_BODY = 8 << 20
+# Batas body satu frame (N x 3 x itemsize dari header). Dicek sebelum body dibaca, jadi
+# header /stream yang mengaku gigabyte ditolak tanpa ditunggu / di-buffer
+MAX_FRAME_BODY = MAX_DECODED_BODY
+
+
+def is_binary_content_type(content_type):
+    if not content_type:
+        return False
+    mime = content_type.split(';', 1)[0].strip().lower()
+    return mime in CONTENT_TYPES_BINARY
+
+
+def encode_frame(data, device_id=0, seq=0, sample_rate=DEFAULT_SAMPLE_RATE,
+                 fmt=FMT_FLOAT32, scale=DEFAULT_INT16_SCALE):
+    data = np.asarray(data, dtype=np.float32).reshape(-1, 3)
+    if fmt == FMT_INT16:
+        body = np.clip(np.rint(data / scale), -32768, 32767).astype('<i2')
+    elif fmt == FMT_FLOAT32:
+        body = data.astype('<f4', copy=False)
+        scale = 1.0
+    else:
+        raise ValueError(f"Format sampel tidak dikenal: {fmt}")
+    header = HEADER.pack(MAGIC, fmt, 0, sample_rate, device_id, seq, len(data), scale)
+    return header + body.tobytes()
+
+
+def frame_size(buf, offset=0, max_body=MAX_FRAME_BODY):
+    # Panjang total satu frame (header + body), None kalau header belum lengkap.
+    # ValueError kalau body yang diklaim header melebihi max_body
+    if len(buf) - offset < HEADER.size:
+        return None
+    magic, fmt, _flags, _rate, _dev, _seq, n, _scale = HEADER.unpack_from(buf, offset)
+    if magic != MAGIC:
+        raise ValueError("Magic frame salah (bukan VIB1)")
+    if fmt not in SAMPLE_DTYPES:
+        raise ValueError(f"Format sampel tidak dikenal: {fmt}")
+    body = n * 3 * SAMPLE_DTYPES[fmt].itemsize
+    if body > max_body:
+        raise ValueError(f"Frame terlalu besar: {n} sampel ({body} byte > {max_body})")
+    return HEADER.size + body
+
+
+def decode_frame(buf, offset=0):
+    # Return (meta, data, offset_berikutnya). Untuk float32, data adalah view
+    # read-only langsung ke buffer request (tanpa copy).
+    size = frame_size(buf, offset)
+    if size is None or len(buf) - offset < size:
+        raise ValueError("Frame terpotong")
+
+    magic, fmt, flags, rate, device_id, seq, n, scale = HEADER.unpack_from(buf, offset)
+    dtype = SAMPLE_DTYPES[fmt]
+    data = np.frombuffer(buf, dtype=dtype, count=n * 3, offset=offset + HEADER.size).reshape(n, 3)
+    if fmt == FMT_INT16:
+        data = data.astype(np.float32)
+        data *= np.float32(scale)
+
+    meta = {
+        'format': FORMAT_NAMES[fmt],
+        'flags': flags,
+        'sample_rate': rate,
+        'device_id': device_id,
+        'seq': seq,
+        'n_samples': n,
+    }
+    return meta, data, offset + size
+
+
+def decode_frames(buf):
+    # Decode semua frame dalam satu body. Kalau hanya ada satu frame (kasus
+    # normal ESP32), hasilnya tetap zero-copy.
+    metas = []
+    chunks = []
+    offset = 0
+    while offset < len(buf):
+        meta, data, offset = decode_frame(buf, offset)
+        metas.append(meta)
+        chunks.append(data)
+
+    if not chunks:
+        raise ValueError("Body kosong")
+    if len(chunks) == 1:
+        return metas[0], chunks[0]
+
+    meta = dict(metas[0])
+    meta['n_samples'] = sum(m['n_samples'] for m in metas)
+    meta['frames'] = len(metas)
+    return meta, np.concatenate(chunks).astype(np.float32, copy=False)
+
+
+def read_frame(stream):
+    # Baca tepat satu frame dari stream (body chunked /stream). Return (meta, data),
+    # atau None kalau stream selesai tepat di batas frame.
+    header = _read_exact(stream, HEADER.size)
+    if not header:
+        return None
+    if len(header) < HEADER.size:
+        raise ValueError("Header frame terpotong")
+    size = frame_size(header)
+    body = _read_exact(stream, size - HEADER.size)
+    if len(body) < size - HEADER.size:
+        raise ValueError("Frame terpotong")
+    meta, data, _ = decode_frame(header + body)
+    return meta, data
+
+
+def _read_exact(stream, n):
+    parts = []
+    while n > 0:
+        part = stream.read(n)
+        if not part:
+            break
+        parts.append(part)
+        n -= len(part)
+    return b''.join(parts)
+
+
+def decode_content_encoding(body, encoding, max_size=MAX_DECODED_BODY):
+    # Content-Encoding: gzip / deflate (zlib, atau raw deflate dari sebagian klien)
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        return body
+    if encoding in ('gzip', 'x-gzip'):
+        candidates = (16 + zlib.MAX_WBITS,)
+    elif encoding == 'deflate':
+        candidates = (zlib.MAX_WBITS, -zlib.MAX_WBITS)
+    else:
+        raise ValueError(f"Content-Encoding tidak didukung: {encoding}")
+
+    for wbits in candidates:
+        d = zlib.decompressobj(wbits)
+        try:
+            out = d.decompress(body, max_size)
+        except zlib.error:
+            continue
+        if d.unconsumed_tail:
+            raise ValueError(f"Body terlalu besar setelah dekompresi (> {max_size} byte)")
+        if not d.eof:
+            raise ValueError(f"Body {encoding} terpotong")
+        return out
+    raise ValueError(f"Body {encoding} rusak")
+
+
+def decode_json(content):
+    # Fallback format lama: {"data": [[x, y, z], ...]}
+    if isinstance(content, (bytes, bytearray, str)):
+        content = json.loads(content)
+    if not content or 'data' not in content:
+        raise KeyError('data')
+
+    data = np.array(content['data'])
+    if data.size and (data.ndim != 2 or data.shape[1] < 3):
+        raise ValueError(f"Bentuk data tidak valid: {data.shape}")
+    if data.size:
+        data = data[:, :3]
+
+    meta = {
+        'format': 'json',
+        'sample_rate': content.get('sample_rate', DEFAULT_SAMPLE_RATE),
+        'device_id': content.get('device_id', 0),
+        'seq': content.get('seq'),
+        'n_samples': len(data),
+    }
+    return meta, data
@@ -0,0 +1,348 @@
+import os
+import time
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from compiled_model import load_compiled, compile_estimator
+
+
+# ================================= REGISTRY MODEL (VERSI, HOT RELOAD, SHADOW) ===========================================
+# Pengganti global `model_data` yang dimuat sekali saat start:
+#
+#   - Model dicari di `paths`: file yang paling baru dulu, mtime sama -> urutan `paths`
+#     (.npz terkompilasi dulu, lalu .pkl joblib). Jadi .npz yang lebih tua dari .pkl (hasil
+#     kompilasi pickle lama) tidak pernah menang dari .pkl yang baru diganti.
+#     Array besar di-memory-map (.npz: lihat compiled_model._mmap_npz, .pkl: joblib mmap_mode),
+#     jadi load cepat dan di gunicorn halaman model dibagi semua worker lewat page cache.
+#   - Sebelum dipakai, model divalidasi: dimensi fitur harus sama dengan fitur dari
+#     extract_features_live / feature_engine, lalu warm-up satu inferensi dummy
+#     (sekaligus memuat halaman mmap) dan output dicek (bentuk, probabilitas valid).
+#   - Swap atomik: `registry.active` hanya diganti setelah model baru lolos validasi.
+#     Batch yang sedang jalan tetap memakai objek model lama sampai selesai.
+#   - Gagal load / file rusak: model lama tetap aktif; kalau belum ada model sama sekali,
+#     watcher terus mencoba lagi (server tidak perlu restart).
+#   - Hot reload: watcher mengecek mtime/ukuran file tiap `poll_interval` detik.
+#     Ganti file dengan cara atomik (tulis ke file sementara lalu `mv`/os.replace), jangan
+#     menimpa file yang sedang di-mmap.
+#   - Shadow model (opsional): dijalankan di thread terpisah pada batch fitur yang sama,
+#     untuk membandingkan latensi & kecocokan label dengan model aktif. Hasil shadow tidak
+#     pernah dipakai untuk laporan.
+
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", 10.0))  # 0 = tanpa hot reload
+MODEL_SETTLE_S = 2.0       # file baru dianggap selesai ditulis kalau mtime-nya sudah >= 2 detik
+WARMUP_WINDOWS = 4
+SHADOW_MAX_PENDING = 2     # batch shadow yang boleh antri; lebih dari itu dilewati
+HISTORY_SIZE = 10          # riwayat load terakhir di /status
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+def _n_features(model_data):
+    if 'compiled' in model_data:
+        return model_data['compiled'].n_features_in_
+    for key in ('scaler', 'pca'):
+        n = getattr(model_data[key], 'n_features_in_', None)
+        if n is not None:
+            return int(n)
+    return int(np.asarray(model_data['pca'].components_).shape[1])
+
+
+class ModelVersion:
+    # Satu model yang sudah dimuat: antarmuka sama untuk .npz terkompilasi & pickle sklearn
+    def __init__(self, model_data, source, version, load_seconds=0.0):
+        self.model_data = model_data
+        self.source = source
+        self.version = version
+        self.kind = 'compiled' if 'compiled' in model_data else 'pickle'
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self.n_features = _n_features(model_data)
+        if self.kind == 'compiled':
+            self._engine = model_data['compiled']
+            self.classes_ = np.asarray(self._engine.classes_)
+        else:
+            self.classes_ = np.asarray(model_data['model'].classes_)
+            # RF: traversal terkompilasi untuk batch kecil (jalur live), predict_proba
+            # sklearn untuk batch besar (lihat compiled_model.forest_proba)
+            self._forest = compile_estimator(model_data)
+
+    def reduce(self, features):
+        # Scaler + PCA
+        if self.kind == 'compiled':
+            return self._engine.transform(features)
+        return self.model_data['pca'].transform(self.model_data['scaler'].transform(features))
+
+    def proba(self, features_pca):
+        # Probabilitas Random Forest (K x kelas)
+        if self.kind == 'compiled':
+            return self._engine.forest_proba(features_pca)
+        return self._forest.forest_proba(features_pca)
+
+    def predict_proba(self, features):
+        return self.proba(self.reduce(features))
+
+    def info(self):
+        return {
+            'version': self.version,
+            'source': self.source,
+            'kind': self.kind,
+            'n_features': self.n_features,
+            'classes': [str(c) for c in self.classes_],
+            'loaded_at': datetime.fromtimestamp(self.loaded_at).isoformat(timespec='seconds'),
+            'load_seconds': round(self.load_seconds, 3),
+        }
+
+
+class ModelRegistry:
+    def __init__(self, paths, n_features, shadow_path=None, poll_interval=MODEL_POLL_INTERVAL,
+                 shadow_latency=None, shadow_windows=None):
+        self.paths = [p for p in paths if p]
+        self.n_features = n_features
+        self.shadow_path = shadow_path
+        self.poll_interval = poll_interval
+        self.shadow_latency = shadow_latency  # Histogram{model}: latensi prediksi aktif vs shadow
+        self.shadow_windows = shadow_windows  # Counter{result}: agree / disagree / skipped / error
+        self.active = None
+        self.shadow = None
+        self.last_error = None
+        self.history = []
+        self._lock = threading.Lock()          # hanya satu load/swap dalam satu waktu
+        self._stats_lock = threading.Lock()
+        self._seen = {}                        # path -> (mtime, ukuran) saat terakhir dicek
+        self._watcher = None
+        self._watcher_pid = None
+        self._stop = threading.Event()
+        self._shadow_pool = None
+        self._shadow_pool_pid = None
+        self._shadow_pending = threading.BoundedSemaphore(SHADOW_MAX_PENDING)
+        self.shadow_stats = {'windows': 0, 'agree': 0, 'skipped': 0, 'errors': 0}
+
+    # --- load & validasi ---
+
+    def _load_file(self, path):
+        t0 = time.perf_counter()
+        if path.endswith('.npz'):
+            model_data = {'compiled': load_compiled(path, mmap=True)}
+        else:
+            # Import di sini: tanpa model .pkl, joblib & sklearn tidak pernah dimuat
+            import joblib
+            # mmap_mode: array numpy di pickle joblib (tanpa kompresi) tidak disalin ke RAM
+            model_data = joblib.load(path, mmap_mode='r')
+        stat = os.stat(path)
+        version = f"{os.path.basename(path)}@{_file_digest(path)}"
+        model = ModelVersion(model_data, path, version, time.perf_counter() - t0)
+        model.mtime = stat.st_mtime
+        return model
+
+    def validate(self, model):
+        # Dimensi fitur + warm-up dengan input dummy; raise ValueError kalau tidak cocok
+        if model.n_features != self.n_features:
+            raise ValueError(f"Model {model.version} butuh {model.n_features} fitur, "
+                             f"ekstraksi fitur menghasilkan {self.n_features}")
+        dummy = np.random.default_rng(0).normal(0.0, 1.0, (WARMUP_WINDOWS, self.n_features))
+        t0 = time.perf_counter()
+        probs = np.asarray(model.predict_proba(dummy))
+        model.warmup_seconds = time.perf_counter() - t0
+        if probs.shape != (WARMUP_WINDOWS, len(model.classes_)):
+            raise ValueError(f"Output model {model.version} berbentuk {probs.shape}")
+        if not np.all(np.isfinite(probs)) or not np.allclose(probs.sum(axis=1), 1.0, atol=1e-6):
+            raise ValueError(f"Probabilitas model {model.version} tidak valid")
+        return model
+
+    def _record(self, event, model=None, error=None):
+        entry = {'time': datetime.now().isoformat(timespec='seconds'), 'event': event}
+        if model is not None:
+            entry['version'] = model.version
+        if error is not None:
+            entry['error'] = str(error)
+        self.history = (self.history + [entry])[-HISTORY_SIZE:]
+
+    def load(self, paths=None):
+        # Muat kandidat pertama (terbaru) yang ada & valid lalu jadikan aktif.
+        # paths: hanya file ini yang dicoba (hot reload). Return ModelVersion / None
+        with self._lock:
+            for path in self.paths:
+                # Dicatat juga kalau gagal / belum ada: watcher baru mencoba lagi setelah file berubah
+                self._seen[path] = self._stat(path)
+            candidates = [p for p in (paths or self.paths) if self._seen.get(p) is not None]
+            candidates.sort(key=lambda p: -self._seen[p][0])  # stabil: mtime sama -> urutan paths
+            for path in candidates:
+                try:
+                    model = self.validate(self._load_file(path))
+                except Exception as e:
+                    self.last_error = f"{path}: {e}"
+                    self._record('load_failed', error=self.last_error)
+                    print(f"[ERROR MODEL] Gagal load {path}: {e}")
+                    continue
+                self._swap(model)
+                return model
+            if self.active is None and self.last_error is None:
+                self.last_error = f"Tidak ada file model: {', '.join(self.paths)}"
+            return None
+
+    def _swap(self, model):
+        old, self.active = self.active, model
+        self.last_error = None
+        self._remember_files()
+        self._record('activated', model)
+        print(f"[INFO] Model aktif: {model.version} ({model.kind}, load {model.load_seconds:.2f} s, "
+              f"warm-up {getattr(model, 'warmup_seconds', 0.0) * 1000:.1f} ms)"
+              + (f", menggantikan {old.version}" if old is not None else ""))
+
+    def activate(self, model_data, source="memory"):
+        # Pasang model yang sudah ada di memori (replay / benchmark: model sintetis)
+        model = self.validate(ModelVersion(model_data, source, f"{source}@{id(model_data):x}"))
+        with self._lock:
+            self._swap(model)
+        return model
+
+    def load_shadow(self, path=None):
+        path = path or self.shadow_path
+        if not path:
+            return None
+        self._seen[path] = self._stat(path)
+        try:
+            model = self.validate(self._load_file(path))
+        except Exception as e:
+            self._record('shadow_failed', error=f"{path}: {e}")
+            print(f"[ERROR MODEL] Gagal load shadow {path}: {e}")
+            return None
+        with self._lock:
+            self.shadow = model
+            self.shadow_path = path
+            self.shadow_stats = {'windows': 0, 'agree': 0, 'skipped': 0, 'errors': 0}
+            self._remember_files()
+            self._record('shadow_activated', model)
+        print(f"[INFO] Shadow model: {model.version}")
+        return model
+
+    # --- hot reload ---
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+            return st.st_mtime, st.st_size
+        except OSError:
+            return None
+
+    def _remember_files(self):
+        for path in self.paths + ([self.shadow_path] if self.shadow_path else []):
+            self._seen[path] = self._stat(path)
+
+    def check_reload(self):
+        # Satu putaran watcher: muat ulang kalau ada file model yang muncul / berubah.
+        # Return True kalau model aktif diganti.
+        changed = []
+        for path in self.paths + ([self.shadow_path] if self.shadow_path else []):
+            stat = self._stat(path)
+            if stat is not None and stat != self._seen.get(path) and time.time() - stat[0] >= MODEL_SETTLE_S:
+                changed.append(path)
+        if self.shadow_path in changed:
+            self.load_shadow()
+        # Hanya file yang berubah yang dicoba: file lain (mis. .npz lama saat .pkl diganti)
+        # tidak boleh aktif lagi, juga kalau file baru gagal validasi
+        changed = [p for p in changed if p in self.paths]
+        if changed:
+            before = self.active
+            return self.load(changed) is not None and self.active is not before
+        return False
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check_reload()
+            except Exception as e:
+                print(f"[ERROR MODEL] Watcher: {e}")
+
+    def start_watcher(self):
+        # Thread tidak ikut ter-fork: dipanggil lagi di tiap worker gunicorn (post_fork)
+        if self.poll_interval <= 0 or (self._watcher is not None and self._watcher_pid == os.getpid()):
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, name="model-watcher", daemon=True)
+        self._watcher_pid = os.getpid()
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def shutdown(self):
+        # Hentikan watcher & tunggu batch shadow yang masih jalan
+        self.stop_watcher()
+        if self._shadow_pool is not None:
+            self._shadow_pool.shutdown(wait=True)
+            self._shadow_pool = None
+
+    # --- shadow ---
+
+    def submit_shadow(self, features, labels, active_seconds):
+        # Dipanggil setelah prediksi aktif; tidak menambah latensi jalur utama
+        shadow = self.shadow
+        if shadow is None:
+            return
+        if not self._shadow_pending.acquire(blocking=False):
+            self._count_shadow('skipped', len(labels))
+            return
+        if self._shadow_pool is None or self._shadow_pool_pid != os.getpid():
+            self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-shadow")
+            self._shadow_pool_pid = os.getpid()
+        if self.shadow_latency is not None:
+            self.shadow_latency.labels('active').observe(active_seconds)
+        self._shadow_pool.submit(self._run_shadow, shadow, np.array(features), np.asarray(labels))
+
+    def _run_shadow(self, shadow, features, labels):
+        try:
+            t0 = time.perf_counter()
+            probs = shadow.predict_proba(features)
+            if self.shadow_latency is not None:
+                self.shadow_latency.labels('shadow').observe(time.perf_counter() - t0)
+            agree = int(np.sum(shadow.classes_[np.argmax(probs, axis=1)] == labels))
+            self._count_shadow('agree', agree)
+            self._count_shadow('disagree', len(labels) - agree)
+        except Exception as e:
+            self._count_shadow('error', len(labels))
+            print(f"[ERROR MODEL] Shadow {shadow.version}: {e}")
+        finally:
+            self._shadow_pending.release()
+
+    def _count_shadow(self, result, n):
+        if not n:
+            return
+        with self._stats_lock:
+            if result in ('agree', 'disagree'):
+                self.shadow_stats['windows'] += n
+            if result == 'agree':
+                self.shadow_stats['agree'] += n
+            elif result == 'skipped':
+                self.shadow_stats['skipped'] += n
+            elif result == 'error':
+                self.shadow_stats['errors'] += n
+        if self.shadow_windows is not None:
+            self.shadow_windows.labels(result).inc(n)
+
+    # --- status ---
+
+    def info(self):
+        active, shadow = self.active, self.shadow
+        result = {
+            'active': active.info() if active is not None else None,
+            'last_error': self.last_error,
+            'hot_reload_s': self.poll_interval,
+            'history': list(self.history),
+        }
+        if shadow is not None:
+            with self._stats_lock:
+                stats = dict(self.shadow_stats)
+            stats['agreement'] = round(stats['agree'] / stats['windows'], 4) if stats['windows'] else None
+            result['shadow'] = {**shadow.info(), **stats}
+        return result
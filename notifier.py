@@ -0,0 +1,257 @@
+import os
+import time
+import threading
+from concurrent.futures import Future
+
+from work_queue import KeyedWorkQueue, QueueFull
+
+
+# ================================= PENGIRIM NOTIFIKASI TELEGRAM (ANTRIAN) ===========================================
+# Peringatan bahaya & laporan akhir tidak lagi dikirim dengan requests.post langsung di
+# jalur pipeline (koneksi baru tiap kali, error ditelan). Pemanggil hanya memasukkan
+# pesan ke antrian lalu lanjut; thread pengirim yang:
+#
+#   - memakai koneksi keep-alive (requests.Session per thread) ke Bot API
+#   - menjaga urutan per chat (foto laporan -> dokumen) lewat KeyedWorkQueue
+#   - mematuhi batas Telegram: jeda minimal per chat + batas global pesan/detik
+#   - retry: 429 -> tunggu `retry_after` dari Telegram, 5xx / jaringan -> backoff eksponensial
+#   - menggabung peringatan berulang (coalesce): peringatan dengan key sama yang masih
+#     antri tidak dikirim dua kali, dan dalam `coalesce_window` detik setelah terkirim
+#     diabaikan
+#   - mencatat latensi kirim (sejak diantrikan sampai diterima Telegram) & hasil per pesan
+#
+# Bot Telegram (python-telegram-bot) jalan di proses/event loop lain (di gunicorn: proses
+# bot tersendiri), jadi di sini dipakai thread + HTTP pool, bukan event loop bot.
+
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", 2))
+NOTIFY_QUEUE = int(os.getenv("NOTIFY_QUEUE", 1000))
+NOTIFY_RETRIES = int(os.getenv("NOTIFY_RETRIES", 4))
+# Telegram: +-1 pesan/detik per chat, +-30 pesan/detik total per bot
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", 1.0))
+NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", 25.0))
+NOTIFY_COALESCE_WINDOW = float(os.getenv("NOTIFY_COALESCE_WINDOW", 60.0))
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 60  # upload dokumen besar
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class TelegramError(Exception):
+    def __init__(self, status, description, retry_after=None):
+        super().__init__(f"HTTP {status}: {description}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _RateLimiter:
+    # Token bucket global (semua chat) + waktu kirim berikutnya per chat
+    def __init__(self, rate, chat_interval):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self._lock = threading.Lock()
+        self._tokens = rate
+        self._stamp = time.monotonic()
+        self._next_chat = {}
+
+    def wait(self, chat_id):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._next_chat.get(chat_id, 0.0) - now
+                if delay <= 0 and self.rate > 0:
+                    self._tokens = min(self.rate, self._tokens + (now - self._stamp) * self.rate)
+                    self._stamp = now
+                    if self._tokens < 1:
+                        delay = (1 - self._tokens) / self.rate
+                if delay <= 0:
+                    if self.rate > 0:
+                        self._tokens -= 1
+                    self._next_chat[chat_id] = now + self.chat_interval
+                    return
+            time.sleep(delay)
+
+    def pause_chat(self, chat_id, seconds):
+        with self._lock:
+            self._next_chat[chat_id] = max(self._next_chat.get(chat_id, 0.0), time.monotonic() + seconds)
+
+
+class TelegramNotifier:
+    def __init__(self, api_url, token, workers=NOTIFY_WORKERS, maxsize=NOTIFY_QUEUE, retries=NOTIFY_RETRIES,
+                 chat_interval=NOTIFY_CHAT_INTERVAL, global_rate=NOTIFY_GLOBAL_RATE,
+                 coalesce_window=NOTIFY_COALESCE_WINDOW, stage_timer=None, latency=None, results=None):
+        self.api_url = api_url
+        self.token = token
+        self.retries = retries
+        self.coalesce_window = coalesce_window
+        self.stage_timer = stage_timer   # StageTimer: tahap 'notify'
+        self.latency = latency           # Histogram{method}: diantrikan -> terkirim
+        self.results = results           # Counter{status}: sent / failed / retried / coalesced / dropped
+        self._limiter = _RateLimiter(global_rate, chat_interval)
+        self._queue = KeyedWorkQueue(self._deliver, maxsize=maxsize, workers=workers, name="notify")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}   # (chat_id, coalesce) -> pesan yang masih antri
+        self._sent_at = {}   # (chat_id, coalesce) -> waktu terakhir terkirim
+        self.counts = {'sent': 0, 'failed': 0, 'retried': 0, 'coalesced': 0, 'dropped': 0}
+
+    # --- API pemanggil (tidak pernah blocking ke jaringan) ---
+
+    def send_message(self, chat_id, text, parse_mode=None, coalesce=None):
+        # coalesce: key peringatan (mis. 'danger'); pesan sama yang masih antri / baru
+        # terkirim tidak dikirim ulang, hanya dihitung sebagai 'coalesced'
+        data = {'chat_id': chat_id, 'text': text}
+        if parse_mode:
+            data['parse_mode'] = parse_mode
+        return self._submit('sendMessage', chat_id, data, None, coalesce)
+
+    def send_photo(self, chat_id, photo, caption=None, parse_mode=None):
+        # photo: bytes PNG
+        return self._submit('sendPhoto', chat_id, self._caption(chat_id, caption, parse_mode),
+                            {'photo': ('chart.png', photo)}, None)
+
+    def send_document(self, chat_id, path, caption=None, parse_mode=None):
+        # path dibaca saat dikirim (file rekaman bisa besar, tidak ditahan di memori antrian)
+        return self._submit('sendDocument', chat_id, self._caption(chat_id, caption, parse_mode),
+                            {'document': path}, None)
+
+    def join(self, timeout=None):
+        return self._queue.join(timeout)
+
+    def stop(self, timeout=None):
+        self._queue.stop(timeout)
+
+    def stats(self):
+        queue = self._queue.stats()
+        with self._lock:
+            return {'depth': queue['depth'], 'lag_max_s': queue['lag_max_s'], **self.counts}
+
+    # --- internal ---
+
+    @staticmethod
+    def _caption(chat_id, caption, parse_mode):
+        data = {'chat_id': chat_id}
+        if caption:
+            data['caption'] = caption
+        if parse_mode:
+            data['parse_mode'] = parse_mode
+        return data
+
+    def _count(self, status, n=1):
+        with self._lock:
+            self.counts[status] += n
+        if self.results is not None:
+            self.results.labels(status).inc(n)
+
+    def _submit(self, method, chat_id, data, files, coalesce):
+        future = Future()
+        message = {'method': method, 'chat_id': chat_id, 'data': data, 'files': files,
+                   'coalesce': coalesce, 'queued_at': time.monotonic(), 'future': future}
+        if coalesce is not None:
+            key = (chat_id, coalesce)
+            with self._lock:
+                pending = self._pending.get(key)
+                recent = time.monotonic() - self._sent_at.get(key, -self.coalesce_window) < self.coalesce_window
+                if pending is None and not recent:
+                    self._pending[key] = message
+            if pending is not None or recent:
+                self._count('coalesced')
+                return pending['future'] if pending is not None else _done(None)
+        try:
+            self._queue.put(chat_id, message)
+        except QueueFull:
+            if coalesce is not None:
+                with self._lock:
+                    self._pending.pop((chat_id, coalesce), None)
+            self._count('dropped')
+            print(f"[ERROR NOTIFY] Antrian notifikasi penuh, {method} ke {chat_id} dibuang")
+            future.set_exception(QueueFull(self._queue.retry_after()))
+        return future
+
+    def _session(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            import requests
+            http = self._local.http = requests.Session()
+        return http
+
+    def _post(self, message):
+        url = f"{self.api_url}/bot{self.token}/{message['method']}"
+        files, opened = None, []
+        try:
+            if message['files']:
+                files = {}
+                for field, value in message['files'].items():
+                    if isinstance(value, str):
+                        value = open(value, 'rb')
+                        opened.append(value)
+                    files[field] = value
+            resp = self._session().post(url, data=message['data'], files=files,
+                                        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        finally:
+            for f in opened:
+                f.close()
+        try:
+            payload = resp.json()
+        except ValueError:
+            payload = {}
+        if resp.status_code == 200 and payload.get('ok', True):
+            return payload.get('result')
+        retry_after = (payload.get('parameters') or {}).get('retry_after')
+        raise TelegramError(resp.status_code, payload.get('description', resp.reason), retry_after)
+
+    def _deliver(self, chat_id, message):
+        # Dipanggil worker KeyedWorkQueue: satu pesan per chat pada satu waktu, urut.
+        # requests di-import di thread pengirim, bukan saat server start
+        import requests
+        key = (chat_id, message['coalesce'])
+        result, error = None, None
+        for attempt in range(self.retries + 1):
+            self._limiter.wait(chat_id)
+            try:
+                result = self._post(message)
+                error = None
+                break
+            except TelegramError as e:
+                error = e
+                if e.status == 429:
+                    delay = float(e.retry_after or BACKOFF_BASE)
+                    self._limiter.pause_chat(chat_id, delay)
+                elif e.status >= 500:
+                    delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX)
+                else:
+                    break  # 400/403 dll: tidak akan berhasil kalau diulang
+            except (requests.RequestException, OSError) as e:
+                error = e
+                delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX)
+            if attempt < self.retries:
+                self._count('retried')
+                time.sleep(delay)
+
+        elapsed = time.monotonic() - message['queued_at']
+        with self._lock:
+            if message['coalesce'] is not None:
+                self._pending.pop(key, None)
+                if error is None:
+                    now = time.monotonic()
+                    self._sent_at[key] = now
+                    # Key lewat coalesce_window tidak menahan apa pun lagi (key per sesi terus bertambah)
+                    for old in [k for k, t in self._sent_at.items() if now - t >= self.coalesce_window]:
+                        del self._sent_at[old]
+        if error is None:
+            self._count('sent')
+            if self.latency is not None:
+                self.latency.labels(message['method']).observe(elapsed)
+            if self.stage_timer is not None:
+                self.stage_timer.observe('notify', elapsed)
+            message['future'].set_result(result)
+        else:
+            self._count('failed')
+            print(f"[ERROR NOTIFY] {message['method']} ke {chat_id} gagal: {error}")
+            message['future'].set_exception(error)
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
@@ -0,0 +1,256 @@
+import io
+import os
+import csv
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+
+# ================================= PEREKAM DATA MENTAH (BINER + CSV LAZY) ===========================================
+# Data mentah disimpan sebagai frame biner kolumnar (.vibrec), bukan CSV per sampel:
+#
+#   frame = header 24 byte + N x 3 float32 (x, y, z little-endian)
+#   header: magic b'VRF1', seq uint32, t0 float64 (epoch detik sampel pertama),
+#           sample rate float32, N uint32
+#
+# Timestamp tiap sampel = t0 + i / sample_rate, jadi tidak ada lagi satu timestamp
+# untuk seluruh batch. Semua penulisan lewat satu thread background dengan file
+# yang tetap terbuka (buffered) + fsync berkala (banyak proses: buffer per proses yang
+# di-commit di bawah lock device, lihat RecordingWriter). CSV ';' format lama baru dibuat
+# saat dibutuhkan (laporan akhir / diminta user) lewat export_csv().
+
+FRAME_MAGIC = b'VRF1'
+FRAME_HEADER = struct.Struct('<4sIdfI')
+RAW_EXTENSION = '.vibrec'
+
+CSV_HEADER_RAW = ['timestamp', 'x', 'y', 'z']
+
+FSYNC_INTERVAL = float(os.getenv("RECORDER_FSYNC_INTERVAL", 5.0))
+WRITE_BUFFER = 1 << 20
+
+
+def pack_frame(seq, t0, sample_rate, data):
+    data = np.ascontiguousarray(data, dtype='<f4').reshape(-1, 3)
+    return FRAME_HEADER.pack(FRAME_MAGIC, seq & 0xFFFFFFFF, t0, sample_rate, len(data)) + data.tobytes()
+
+
+def iter_frames(path):
+    # Yield (seq, t0, sample_rate, data[N,3]) dari file .vibrec
+    with open(path, 'rb') as f:
+        buf = f.read()
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(buf):
+        magic, seq, t0, rate, n = FRAME_HEADER.unpack_from(buf, offset)
+        if magic != FRAME_MAGIC:
+            raise ValueError(f"File rekaman rusak di offset {offset}")
+        start = offset + FRAME_HEADER.size
+        end = start + n * 12
+        if end > len(buf):
+            break  # frame terakhir belum selesai ditulis
+        yield seq, t0, rate, np.frombuffer(buf, dtype='<f4', count=n * 3, offset=start).reshape(n, 3)
+        offset = end
+
+
+def read_recording(path):
+    # Semua sampel + timestamp epoch per sampel sebagai array
+    times, chunks = [], []
+    for _seq, t0, rate, data in iter_frames(path):
+        times.append(t0 + np.arange(len(data)) / rate)
+        chunks.append(data)
+    if not chunks:
+        return np.empty(0), np.empty((0, 3), dtype=np.float32)
+    return np.concatenate(times), np.concatenate(chunks)
+
+
+def format_timestamps(t0, n, sample_rate):
+    # Sama dengan format lama: 'YYYY-mm-dd HH:MM:SS.mmm' (jam lokal)
+    base = np.datetime64(datetime.fromtimestamp(t0), 'us')
+    offsets = np.round(np.arange(n) * (1e6 / sample_rate)).astype('timedelta64[us]')
+    stamps = np.datetime_as_string(base + offsets, unit='ms')
+    return np.char.replace(stamps, 'T', ' ')
+
+
+def export_csv(raw_path, csv_path):
+    # Konversi .vibrec -> CSV ';' (timestamp;x;y;z dengan 4 desimal)
+    rows = 0
+    with open(csv_path, 'w', newline='') as f:
+        csv.writer(f, delimiter=';').writerow(CSV_HEADER_RAW)
+        if not os.path.exists(raw_path):
+            return rows
+        for _seq, t0, rate, data in iter_frames(raw_path):
+            stamps = format_timestamps(t0, len(data), rate)
+            f.write(''.join(
+                f"{ts};{x:.4f};{y:.4f};{z:.4f}\r\n" for ts, (x, y, z) in zip(stamps, data.tolist())
+            ))
+            rows += len(data)
+    return rows
+
+
+class RecordingWriter:
+    # Satu thread penulis untuk semua sesi. File dibiarkan terbuka sampai close().
+    #
+    # shared=True (server dengan banyak worker): beberapa proses menambah ke file yang sama,
+    # jadi data tidak boleh tertahan di buffer satu proses saat device pindah ke proses lain.
+    # Frame / baris dikumpulkan di buffer per proses, lalu commit() (dipanggil selagi lock
+    # device masih dipegang) menulisnya dengan satu write() O_APPEND per file. fsync berkala
+    # tetap di thread penulis, sama seperti mode satu proses.
+    def __init__(self, fsync_interval=FSYNC_INTERVAL, shared=False):
+        self.fsync_interval = fsync_interval
+        self.shared = shared
+        self._queue = queue.Queue()
+        self._files = {}
+        self._dirty = set()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._pending = {}   # shared: path -> bytearray yang belum di-commit
+        self._fds = {}       # shared: path -> fd O_APPEND (dipakai thread pemegang lock device)
+        self._pending_lock = threading.Lock()
+        self.bytes_written = 0
+        self.fsyncs = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="recording-writer", daemon=True)
+                self._thread.start()
+
+    # --- API (non-blocking kecuali commit/flush/close) ---
+
+    def append_frame(self, path, seq, t0, sample_rate, data):
+        if self.shared:
+            return self._buffer(path, pack_frame(seq, t0, sample_rate, data))
+        self.start()
+        self._queue.put(('bin', path, pack_frame(seq, t0, sample_rate, data)))
+
+    def append_rows(self, path, rows):
+        # Baris CSV ';' (laporan user), tetap ditulis lewat thread yang sama
+        if self.shared:
+            buf = io.StringIO()
+            csv.writer(buf, delimiter=';').writerows(rows)
+            return self._buffer(path, buf.getvalue().encode())
+        self.start()
+        self._queue.put(('csv', path, [list(r) for r in rows]))
+
+    def _buffer(self, path, payload):
+        with self._pending_lock:
+            pending = self._pending.setdefault(path, bytearray())
+            pending += payload
+            full = len(pending) >= WRITE_BUFFER
+        if full:
+            self.commit(path)
+
+    def commit(self, *paths):
+        # shared: tulis buffer file-file ini ke disk (page cache). Panggil sebelum lock
+        # device dilepas, supaya proses berikutnya menambah SETELAH data proses ini
+        for path in paths:
+            with self._pending_lock:
+                payload = self._pending.pop(path, None)
+                fd = self._fds.get(path)
+            if not payload:
+                continue
+            if fd is None:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                with self._pending_lock:
+                    self._fds[path] = fd
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            self.bytes_written += len(payload)
+            self.start()
+            self._queue.put(('dirty', path, None))
+
+    def flush(self, path=None, timeout=None):
+        # Tunggu semua data yang sudah diantrikan tertulis + fsync
+        if self.shared:
+            with self._pending_lock:
+                pending = [path] if path else list(self._pending)
+            self.commit(*pending)
+        self.start()
+        done = threading.Event()
+        self._queue.put(('flush', path, done))
+        return done.wait(timeout)
+
+    def close(self, path, timeout=None):
+        if self.shared:
+            self.commit(path)
+            with self._pending_lock:
+                fd = self._fds.pop(path, None)
+            if fd is not None:
+                os.close(fd)
+        self.start()
+        done = threading.Event()
+        self._queue.put(('close', path, done))
+        return done.wait(timeout)
+
+    # --- thread penulis ---
+
+    def _file(self, path, mode):
+        f = self._files.get(path)
+        if f is None:
+            f = open(path, mode, buffering=WRITE_BUFFER, newline='' if 'b' not in mode else None)
+            self._files[path] = f
+        return f
+
+    def _sync(self, path):
+        f = self._files.get(path)
+        if f is not None:
+            f.flush()
+            os.fsync(f.fileno())
+            self.fsyncs += 1
+        elif self.shared and path and os.path.exists(path):
+            # Ditulis lewat commit() (proses mana pun): fsync lewat fd sementara, thread ini
+            # tidak menahan file yang bisa ditutup proses lain
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.fsyncs += 1
+        self._dirty.discard(path)
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while True:
+            try:
+                kind, path, payload = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                kind = None
+
+            try:
+                if kind == 'bin':
+                    self._file(path, 'ab').write(payload)
+                    self.bytes_written += len(payload)
+                    self._dirty.add(path)
+                elif kind == 'csv':
+                    csv.writer(self._file(path, 'a'), delimiter=';').writerows(payload)
+                    self._dirty.add(path)
+                elif kind == 'dirty':
+                    # shared: sudah ditulis commit(), di sini hanya dijadwalkan untuk fsync
+                    self._dirty.add(path)
+                elif kind == 'flush':
+                    for p in ([path] if path else list(self._dirty)):
+                        self._sync(p)
+                    payload.set()
+                elif kind == 'close':
+                    self._sync(path)
+                    f = self._files.pop(path, None)
+                    if f is not None:
+                        f.close()
+                    payload.set()
+            except Exception as e:
+                print(f"[ERROR RECORDER] {path}: {e}")
+                if kind in ('flush', 'close'):
+                    payload.set()
+
+            # fsync berkala supaya data tidak hilang kalau container restart
+            if self._dirty and time.monotonic() - last_sync >= self.fsync_interval:
+                for p in list(self._dirty):
+                    try:
+                        self._sync(p)
+                    except Exception as e:
+                        print(f"[ERROR RECORDER] fsync {p}: {e}")
+                        self._dirty.discard(p)
+                last_sync = time.monotonic()
@@ -0,0 +1,208 @@
+import io
+import os
+import sys
+import types
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+
+# ================================= RENDER GRAFIK (DI LUAR REQUEST) ===========================================
+# Semua grafik dibuat lewat API objek matplotlib (Figure + FigureCanvasAgg), bukan
+# state global pyplot, dan dikerjakan di process pool terpisah. Jalur ingest dan
+# event loop bot hanya menerima Future berisi bytes PNG.
+#
+# - Deret panjang (EMA 60 menit Mode Bebas = puluhan ribu titik) diperkecil dengan
+#   LTTB ke jumlah titik sebanding lebar gambar (pixel), jadi waktu render tetap.
+# - Bagian statis (zona threshold, sumbu, label, legend) dibuat sekali per proses
+#   lalu dipakai ulang; tiap render hanya mengganti data garis & judul.
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 1))  # 0 = satu thread di proses ini
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", 30.0))
+
+TREND_SIZE = (10, 6)
+WAVEFORM_SIZE = (8, 4)
+DPI = 100
+# Maksimal titik per garis = lebar gambar dalam pixel
+TREND_MAX_POINTS = TREND_SIZE[0] * DPI
+WAVEFORM_MAX_POINTS = WAVEFORM_SIZE[0] * DPI
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: pilih n_out titik yang paling menjaga bentuk garis
+    # (puncak & lembah tetap terlihat, beda dengan ambil tiap ke-N titik)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # Titik pertama & terakhir selalu dipakai; sisanya dibagi jadi n_out-2 bucket
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = np.empty(n_out, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        # Luas segitiga (titik terpilih sebelumnya, kandidat, rata-rata bucket berikut)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return x[picked], y[picked]
+
+
+# --- template figure per proses (dibuat sekali, dipakai ulang) ---
+
+_local = threading.local()
+
+
+def _new_figure(figsize):
+    # Import di sini: proses utama server tidak perlu memuat matplotlib sama sekali
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize, dpi=DPI)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _trend_template():
+    tpl = getattr(_local, 'trend', None)
+    if tpl is None:
+        fig = _new_figure(TREND_SIZE)
+        ax = fig.add_subplot()
+        line, = ax.plot([], [], color='blue', linewidth=2, label='Kondisi Motor')
+
+        # Zona Warna Threshold
+        ax.axhspan(0, 30, facecolor='green', alpha=0.1, label='Zona Aman')
+        ax.axhspan(30, 60, facecolor='yellow', alpha=0.1, label='Zona Gejala')
+        ax.axhspan(60, 100, facecolor='red', alpha=0.1, label='Zona Bahaya')
+
+        ax.set_title("Grafik Kesehatan Motor")
+        ax.set_xlabel("Waktu (Menit)")
+        ax.set_ylabel("Tingkat Kerusakan (%)")
+        ax.set_ylim(0, 100)
+        ax.grid(True, linestyle='--', alpha=0.5)
+        ax.legend(loc='upper left')
+        fig.tight_layout()
+        tpl = _local.trend = (fig, ax, line)
+    return tpl
+
+
+def _waveform_template():
+    tpl = getattr(_local, 'waveform', None)
+    if tpl is None:
+        fig = _new_figure(WAVEFORM_SIZE)
+        ax = fig.add_subplot()
+        lines = [ax.plot([], [], label=axis, color=color, alpha=0.7)[0]
+                 for axis, color in (('X', 'r'), ('Y', 'g'), ('Z', 'b'))]
+        ax.set_title("Live Sensor Monitor (Raw Data)")
+        ax.set_ylim(-15, 15)
+        ax.legend()
+        ax.grid(True, linestyle='--', linewidth=0.5)
+        tpl = _local.waveform = (fig, ax, lines)
+    return tpl
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+# --- fungsi yang jalan di proses render ---
+
+def render_trend(times, scores, duration_min):
+    fig, ax, line = _trend_template()
+    x, y = lttb(times, scores, TREND_MAX_POINTS)
+    line.set_data(x, y)
+    if len(x) > 1 and x[0] != x[-1]:
+        ax.set_xlim(x[0], x[-1])
+    else:
+        ax.set_xlim(x[0] - 0.5, x[0] + 0.5)
+    ax.set_title(f"Grafik Kesehatan Motor (Durasi: {duration_min:.1f} m)")
+    return _png(fig)
+
+
+def render_waveform(data_chunk):
+    fig, ax, lines = _waveform_template()
+    data_chunk = np.asarray(data_chunk, dtype=float)
+    index = np.arange(len(data_chunk))
+    for axis, line in enumerate(lines):
+        line.set_data(*lttb(index, data_chunk[:, axis], WAVEFORM_MAX_POINTS))
+    ax.set_xlim(0, max(len(data_chunk) - 1, 1))
+    return _png(fig)
+
+
+def _warm_up():
+    _trend_template()
+    _waveform_template()
+    return os.getpid()
+
+
+class _RenderPool(ProcessPoolExecutor):
+    # Proses render dibuat tanpa path __main__: tanpa ini tiap proses anak forkserver
+    # menjalankan ulang skrip utama (server.py -> session store, katalog, Flask) sebelum
+    # bisa unpickle tugas. Fungsi render ada di modul ini, jadi __main__ tidak dibutuhkan.
+    def _spawn_process(self):
+        main = sys.modules['__main__']
+        sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            super()._spawn_process()
+        finally:
+            sys.modules['__main__'] = main
+
+
+class ChartRenderer:
+    # Pemanggil dapat concurrent.futures.Future -> bytes PNG.
+    # Di event loop asyncio: `await asyncio.wrap_future(renderer.waveform(data))`.
+    def __init__(self, workers=RENDER_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _make_executor(self):
+        if self.workers > 0 and 'forkserver' in multiprocessing.get_all_start_methods():
+            # forkserver: proses render tidak mewarisi thread Flask/bot/worker.
+            # Yang di-preload hanya modul render + matplotlib, bukan __main__ (server.py).
+            ctx = multiprocessing.get_context('forkserver')
+            ctx.set_forkserver_preload(['rendering', 'matplotlib.figure', 'matplotlib.backends.backend_agg'])
+            return _RenderPool(max_workers=self.workers, mp_context=ctx)
+        # Fallback (Windows / RENDER_WORKERS=0): satu thread khusus render
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-render")
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._make_executor()
+            executor = self._executor
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # Proses render mati (OOM dll): buat pool baru lalu coba sekali lagi
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._make_executor()
+                executor = self._executor
+            return executor.submit(fn, *args)
+
+    def start(self):
+        # Opsional: siapkan proses + template lebih awal supaya render pertama tidak lambat
+        return self._submit(_warm_up)
+
+    def trend(self, times, scores, duration_min):
+        return self._submit(render_trend, np.asarray(times, dtype=float),
+                            np.asarray(scores, dtype=float), duration_min)
+
+    def waveform(self, data_chunk):
+        return self._submit(render_waveform, np.asarray(data_chunk, dtype=float))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,307 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import argparse
+import resource
+import tempfile
+import contextlib
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+from ingest_codec import encode_frame, decode_frames, decode_json, FMT_FLOAT32, FMT_INT16, DEFAULT_SAMPLE_RATE
+from recorder import read_recording, RAW_EXTENSION
+from catalog import RecordingCatalog
+from stage_timer import summarize
+from fake_telegram import FakeTelegramServer
+
+
+# ================================= REPLAY & BENCHMARK THROUGHPUT ===========================================
+# Memutar ulang rekaman lapangan (field_test_*.csv / *.vibrec) atau sinyal sintetis
+# ADXL345 1600 Hz ke pipeline, pada kecepatan 1x (real-time), Nx, atau secepatnya (--speed 0).
+#
+#   direct : langsung ke fungsi pemrosesan server (decode -> worker), stopwatch per tahap
+#            ikut terekam: decode, fitur, PCA, RF, I/O, notifikasi, laporan.
+#   http   : POST sungguhan ke /raw_data server yang sedang jalan (latensi sisi klien).
+#
+# Telegram selalu diarahkan ke stub lokal (fake_telegram.py). Hasil ditulis ke JSON
+# supaya bisa dibandingkan antar run (--compare hasil_lama.json).
+#
+# Contoh:
+#   python replay.py --synthetic 120 --speed 0 --synthetic-model --out run_a.json
+#   python replay.py recordings_field/field_test_*.csv --speed 4 --compare run_a.json
+#   python replay.py --synthetic 60 --mode http --url http://127.0.0.1:5000/raw_data
+
+FORMATS = {'int16': FMT_INT16, 'float32': FMT_FLOAT32, 'json': None}
+
+
+# --- sumber data ---
+
+def load_source(path):
+    if path.endswith(RAW_EXTENSION):
+        _, data = read_recording(path)
+        return data
+    # CSV lama: timestamp;x;y;z
+    return np.loadtxt(path, delimiter=';', skiprows=1, usecols=(1, 2, 3), dtype=np.float32, ndmin=2)
+
+
+def iter_batches(data, batch_size):
+    for start in range(0, len(data), batch_size):
+        yield data[start:start + batch_size]
+
+
+def build_sources(args):
+    sources = []
+    paths = list(args.files)
+    if not paths and not args.synthetic:
+        recording_dir = os.getenv("RECORDING_DIR", "recordings_field")
+        paths = sorted(glob.glob(os.path.join(recording_dir, "field_test_*.csv")))
+        paths += sorted(glob.glob(os.path.join(recording_dir, "field_test_*" + RAW_EXTENSION)))
+    for path in paths:
+        data = load_source(path)
+        sources.append((os.path.basename(path), len(data), iter_batches(data, args.batch)))
+    if args.synthetic:
+        from synthetic import synthetic_stream
+
+        n = int(args.synthetic * args.rate)
+        sources.append((f"synthetic_{args.synthetic:g}s", n,
+                        synthetic_stream(args.synthetic, args.batch, args.rate, seed=args.seed)))
+    return sources
+
+
+def encode_batch(batch, fmt, device_id, seq, rate):
+    if fmt == 'json':
+        body = json.dumps({'device_id': device_id, 'seq': seq, 'sample_rate': rate,
+                           'data': np.round(batch, 2).tolist()}).encode()
+        return body, 'application/json'
+    return encode_frame(batch, device_id=device_id, seq=seq, sample_rate=rate, fmt=FORMATS[fmt]), \
+        'application/x-vib-frame'
+
+
+class Pacer:
+    # Menjaga laju kirim = speed x real-time (speed <= 0 berarti secepatnya)
+    def __init__(self, speed, rate):
+        self.speed = speed
+        self.rate = rate
+        self.start = time.perf_counter()
+        self.sent = 0
+
+    def wait(self, n_samples):
+        if self.speed > 0:
+            due = self.start + (self.sent / self.rate) / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.sent += n_samples
+
+
+def percentiles_ms(values):
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    return {'count': len(ms), 'p50_ms': round(float(np.percentile(ms, 50)), 3),
+            'p99_ms': round(float(np.percentile(ms, 99)), 3), 'max_ms': round(float(ms.max()), 3)}
+
+
+# --- mode direct ---
+
+def load_replay_model(server, args):
+    if args.model:
+        if args.model.endswith('.npz'):
+            server.MODEL_COMPILED_PATH = args.model
+        else:
+            server.MODEL_COMPILED_PATH = ""
+            server.MODEL_PATH = args.model
+    server.load_model()
+    if server.model_registry.active is None and args.synthetic_model:
+        from synthetic import make_synthetic_model
+
+        server.model_registry.activate(make_synthetic_model(), "synthetic")
+    return server.model_registry.active is not None
+
+
+def run_direct(args, sources, stub, out_dir):
+    import server
+
+    server.RECORDING_DIR = out_dir
+    server.recording_catalog = RecordingCatalog(os.path.join(out_dir, "catalog"))
+    server.TOKEN = "replay"
+    server.TELEGRAM_API_URL = stub.url
+    server.notifier.token = server.TOKEN
+    server.notifier.api_url = stub.url
+
+    log = io.StringIO() if not args.verbose else sys.stdout
+    with contextlib.redirect_stdout(log):
+        model_ok = load_replay_model(server, args)
+    if not model_ok:
+        print("[WARNING] Model tidak ada: tahap fitur/PCA/RF tidak terukur (pakai --model atau --synthetic-model).")
+    # Sama seperti server.py saat start: proses render disiapkan dulu
+    server.chart_renderer.start().result()
+
+    batch_latency, windows = [], 0
+    t_start = time.perf_counter()
+    server.stage_timer.start_recording()
+    with contextlib.redirect_stdout(log):
+        for idx, (name, _n, batches) in enumerate(sources):
+            device_id = f"replay{idx}"
+            chat_id = 900000 + idx
+            session = server.create_session(chat_id, 10 ** 6, device_id)
+            pacer = Pacer(args.speed, args.rate)
+            for seq, batch in enumerate(batches):
+                pacer.wait(len(batch))
+                body, content_type = encode_batch(batch, args.format, idx, seq, args.rate)
+
+                t0 = time.perf_counter()
+                if args.format == 'json':
+                    meta, chunk = decode_json(body)
+                else:
+                    meta, chunk = decode_frames(body)
+                server.stage_timer.observe('decode', time.perf_counter() - t0)
+                job = {'chunk': chunk, 'meta': meta, 'received_at': time.time()}
+                server.process_device_chunk(device_id, job)
+                batch_latency.append(time.perf_counter() - t0)
+
+            windows += session['history'].count
+            # Akhiri sesi -> laporan akhir + kirim ke stub Telegram
+            server.session_store.update(chat_id, is_stopped=True)
+            server.process_device_chunk(device_id, {'chunk': None, 'meta': {}, 'received_at': time.time()})
+        server.recording_writer.flush()
+        # Laporan akhir dikirim lewat antrian notifikasi: tunggu sampai semua terkirim
+        server.notifier.join()
+    stages = summarize(server.stage_timer.stop_recording())
+    wall = time.perf_counter() - t_start
+    return {'batch_pipeline': percentiles_ms(batch_latency)}, stages, windows, wall
+
+
+# --- mode http ---
+
+def run_http(args, sources):
+    import requests
+
+    http = requests.Session()
+    latencies, rejected, errors = [], 0, 0
+    t_start = time.perf_counter()
+    for idx, (name, _n, batches) in enumerate(sources):
+        device_id = args.device_id if args.device_id is not None else idx
+        pacer = Pacer(args.speed, args.rate)
+        for seq, batch in enumerate(batches):
+            pacer.wait(len(batch))
+            body, content_type = encode_batch(batch, args.format, device_id, seq, args.rate)
+            while True:
+                t0 = time.perf_counter()
+                resp = http.post(args.url, data=body, headers={'Content-Type': content_type})
+                latencies.append(time.perf_counter() - t0)
+                if resp.status_code == 429:
+                    rejected += 1
+                    time.sleep(float(resp.headers.get('Retry-After', 1)))
+                    continue
+                if resp.status_code != 200:
+                    errors += 1
+                break
+    ingest = {'http_post': percentiles_ms(latencies), 'rejected_429': rejected, 'errors': errors}
+    return ingest, {}, None, time.perf_counter() - t_start
+
+
+# --- laporan ---
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        prev = json.load(f)
+    print(f"\nPerbandingan dengan {previous_path}:")
+    a, b = prev.get('samples_per_sec', 0), current['samples_per_sec']
+    print(f"  sampel/s : {a:,.0f} -> {b:,.0f} ({(b / a - 1) * 100 if a else 0:+.1f}%)")
+    for stage, cur in current['stages'].items():
+        old = prev.get('stages', {}).get(stage)
+        if old:
+            print(f"  {stage:<10} p50 {old['p50_ms']:.3f} -> {cur['p50_ms']:.3f} ms | "
+                  f"p99 {old['p99_ms']:.3f} -> {cur['p99_ms']:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay rekaman / sinyal sintetis ke pipeline getaran")
+    parser.add_argument('files', nargs='*', help="field_test_*.csv atau *.vibrec (default: semua di RECORDING_DIR)")
+    parser.add_argument('--synthetic', type=float, default=0, help="tambah sinyal sintetis N detik")
+    parser.add_argument('--mode', choices=('direct', 'http'), default='direct')
+    parser.add_argument('--url', default="http://127.0.0.1:5000/raw_data")
+    parser.add_argument('--speed', type=float, default=1.0, help="1 = real-time, 0 = secepatnya")
+    parser.add_argument('--rate', type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument('--batch', type=int, default=512)
+    parser.add_argument('--format', choices=tuple(FORMATS), default='int16')
+    parser.add_argument('--device-id', type=int, default=None, help="mode http: device id di frame")
+    parser.add_argument('--model', default=None, help="mode direct: path .pkl / .npz")
+    parser.add_argument('--synthetic-model', action='store_true', help="mode direct: model sintetis kalau tidak ada model")
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help="jeda stub Telegram (detik)")
+    parser.add_argument('--tracemalloc', action='store_true', help="ukur puncak alokasi Python (lebih lambat)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help="file JSON hasil")
+    parser.add_argument('--compare', default=None, help="JSON run sebelumnya untuk dibandingkan")
+    parser.add_argument('--verbose', action='store_true', help="tampilkan log server")
+    args = parser.parse_args()
+
+    sources = build_sources(args)
+    if not sources:
+        print("[ERROR] Tidak ada rekaman. Beri path file atau --synthetic DETIK.")
+        sys.exit(1)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with FakeTelegramServer(latency=args.telegram_latency) as stub, tempfile.TemporaryDirectory() as out_dir:
+        # Waktu dihitung di dalam runner (tidak termasuk load / training model)
+        if args.mode == 'direct':
+            ingest, stages, windows, wall = run_direct(args, sources, stub, out_dir)
+        else:
+            ingest, stages, windows, wall = run_http(args, sources)
+        telegram_calls = {m: stub.count(m) for m in sorted({c['method'] for c in stub.calls})}
+
+    total = sum(n for _name, n, _ in sources)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    memory = {'peak_rss_mb': round(rss_after / 1024, 1),
+              'rss_growth_mb': round((rss_after - rss_before) / 1024, 1)}
+    if args.tracemalloc:
+        memory['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+
+    result = {
+        'tool': 'replay',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {k: v for k, v in vars(args).items() if k not in ('compare', 'out', 'verbose')},
+        'sources': [{'name': name, 'samples': n} for name, n, _ in sources],
+        'samples': total,
+        'windows': windows,
+        'wall_s': round(wall, 3),
+        'samples_per_sec': round(total / wall, 1) if wall else 0.0,
+        'realtime_factor': round(total / args.rate / wall, 2) if wall else 0.0,
+        'ingest': ingest,
+        'stages': stages,
+        'memory': memory,
+        'telegram_calls': telegram_calls,
+    }
+
+    print(f"Sampel: {total:,} dari {len(sources)} sumber | waktu: {wall:.2f} s | "
+          f"{result['samples_per_sec']:,.0f} sampel/s ({result['realtime_factor']}x real-time)")
+    if stages:
+        print(f"{'tahap':<10}{'n':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for stage, st in stages.items():
+            print(f"{stage:<10}{st['count']:>8}{st['p50_ms']:>10.3f}{st['p90_ms']:>10.3f}"
+                  f"{st['p99_ms']:>10.3f}{st['max_ms']:>10.3f}")
+    for name, st in ingest.items():
+        if isinstance(st, dict) and st:
+            print(f"{name}: p50 {st['p50_ms']} ms | p99 {st['p99_ms']} ms | max {st['max_ms']} ms")
+    print(f"Memori: puncak RSS {memory['peak_rss_mb']} MB | Telegram (stub): {telegram_calls}")
+
+    out = args.out or f"replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"[INFO] Hasil disimpan ke {out}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == '__main__':
+    main()
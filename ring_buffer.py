@@ -0,0 +1,141 @@
+import numpy as np
+
+
+# ================================= RING BUFFER SESI ===========================================
+# Pengganti list `raw_buffer`: array float32 berkapasitas tetap (capacity x channels).
+# - push()  : menyalin chunk ke buffer, biaya O(len(chunk)) tidak tergantung backlog.
+#             Kalau penuh, sampel paling lama ditimpa (dihitung di `dropped`).
+# - window  : dibaca sebagai view tanpa copy, kecuali posisinya melewati ujung
+#             array (wrap) sehingga perlu satu kali copy kontigu.
+# View yang dikembalikan hanya valid sampai push() berikutnya.
+
+DEFAULT_CAPACITY = 4096
+DEFAULT_WINDOW = 256
+DEFAULT_HOP = 128
+
+
+class RingBuffer:
+    def __init__(self, capacity=DEFAULT_CAPACITY, channels=3, window=DEFAULT_WINDOW,
+                 hop=DEFAULT_HOP, dtype=np.float32):
+        if window > capacity:
+            raise ValueError("window tidak boleh lebih besar dari capacity")
+        if not 0 < hop <= window:
+            raise ValueError("hop harus di antara 1 dan window")
+
+        self.capacity = capacity
+        self.channels = channels
+        self.window = window
+        self.hop = hop
+        self._buf = np.zeros((capacity, channels), dtype=dtype)
+        self._start = 0   # index sampel paling lama
+        self._count = 0   # jumlah sampel yang belum dibuang
+        self.total_written = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._buf.nbytes
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+
+    def push(self, chunk):
+        chunk = np.asarray(chunk)
+        if chunk.ndim != 2 or chunk.shape[1] < self.channels:
+            raise ValueError(f"Bentuk chunk tidak valid: {chunk.shape}")
+        n = len(chunk)
+        if n == 0:
+            return
+        self.total_written += n
+
+        # Chunk lebih besar dari kapasitas: cukup simpan ekor terakhirnya
+        if n >= self.capacity:
+            self.dropped += self._count + (n - self.capacity)
+            self._buf[:] = chunk[-self.capacity:, :self.channels]
+            self._start = 0
+            self._count = self.capacity
+            return
+
+        overflow = self._count + n - self.capacity
+        if overflow > 0:
+            self._start = (self._start + overflow) % self.capacity
+            self._count -= overflow
+            self.dropped += overflow
+
+        end = (self._start + self._count) % self.capacity
+        first = min(n, self.capacity - end)
+        self._buf[end:end + first] = chunk[:first, :self.channels]
+        if first < n:
+            self._buf[:n - first] = chunk[first:, :self.channels]
+        self._count += n
+
+    def read(self, offset, n):
+        # Baca n sampel mulai dari `offset` (dihitung dari sampel paling lama)
+        if offset < 0 or n < 0 or offset + n > self._count:
+            raise IndexError("Range di luar isi buffer")
+        i = (self._start + offset) % self.capacity
+        if i + n <= self.capacity:
+            return self._buf[i:i + n]
+        return np.concatenate((self._buf[i:], self._buf[:n - (self.capacity - i)]))
+
+    def discard(self, n):
+        n = min(n, self._count)
+        self._start = (self._start + n) % self.capacity
+        self._count -= n
+
+    def has_window(self):
+        return self._count >= self.window
+
+    def peek_window(self):
+        return self.read(0, self.window)
+
+    def pop_window(self):
+        # Ambil satu window lalu geser sebesar hop (overlap window - hop sampel)
+        win = self.peek_window()
+        self.discard(self.hop)
+        return win
+
+    def pending_windows(self):
+        if self._count < self.window:
+            return 0
+        return 1 + (self._count - self.window) // self.hop
+
+    def pop_windows(self):
+        # Ambil SEMUA window lengkap sekaligus sebagai array (K, window, channels).
+        # Dibentuk dengan stride (window ke-k mulai di k*hop), jadi tidak ada copy
+        # per window; hanya satu copy kontigu kalau range-nya wrap.
+        k = self.pending_windows()
+        if k == 0:
+            return np.empty((0, self.window, self.channels), dtype=self._buf.dtype)
+        span = (k - 1) * self.hop + self.window
+        seg = self.read(0, span)
+        s0, s1 = seg.strides
+        windows = np.lib.stride_tricks.as_strided(
+            seg, shape=(k, self.window, self.channels), strides=(self.hop * s0, s0, s1),
+            writeable=False)
+        self.discard(k * self.hop)
+        return windows
+
+    def __getstate__(self):
+        # Untuk session store bersama (pickle): yang disimpan hanya sampel yang belum
+        # dibuang (< window setelah pop_windows), bukan seluruh array capacity
+        state = self.__dict__.copy()
+        state['_buf'] = self.read(0, self._count).copy()
+        state['_start'] = 0
+        return state
+
+    def __setstate__(self, state):
+        pending = state.pop('_buf')
+        self.__dict__.update(state)
+        self._buf = np.zeros((self.capacity, self.channels), dtype=pending.dtype)
+        self._buf[:len(pending)] = pending
+
+    def tail(self, n, copy=False):
+        # Snapshot n sampel terakhir (atau semua isi kalau kurang dari n)
+        n = min(n, self._count)
+        out = self.read(self._count - n, n)
+        return out.copy() if copy else out
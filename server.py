@@ -1,28 +1,99 @@
+from __future__ import annotations
+
 import os
+import math
 import time
 import threading
+import asyncio
 import numpy as np
-import pandas as pd
-import joblib
 import json
-import matplotlib
-matplotlib.use('Agg') # Backend non-GUI untuk server
-import matplotlib.pyplot as plt
 import io
 import csv
+import itertools
 from datetime import datetime
+from typing import TYPE_CHECKING
 from flask import Flask, request, jsonify
-from scipy.fft import fft
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from ingest_codec import is_binary_content_type, decode_frames, decode_json, decode_content_encoding, read_frame
+from ring_buffer import RingBuffer
+from feature_engine import SpectralFeatureExtractor, SpectralAverager
+from model_registry import ModelRegistry
+from inference_gate import InferenceGate, GATE_ENABLED
+from work_queue import KeyedWorkQueue, QueueFull
+from device_registry import DeviceRegistry, normalize_device_id
+from session_store import open_session_store
+from session_history import SessionHistory
+from ingest_codec import DEFAULT_SAMPLE_RATE
+from recorder import RecordingWriter, export_csv, RAW_EXTENSION
+from catalog import RecordingCatalog, parse_time, DAY_SECONDS
+from stage_timer import StageTimer
+from rendering import ChartRenderer, RENDER_TIMEOUT
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from notifier import TelegramNotifier
+from startup import StartupTracker
+
+if TYPE_CHECKING:
+    # python-telegram-bot baru di-import saat bot jalan (run_telegram), lihat startup.py
+    from telegram import Update
+    from telegram.ext import ContextTypes
 
 
 # =================================== KONFIGURASI ==========================================
 
 TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Bisa diarahkan ke stub lokal (fake_telegram.py) untuk replay / benchmark
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
 AUTHORIZED_USER_ID = os.getenv("AUTHORIZED_USER_ID") 
 MODEL_PATH = "MODEL_SIAP_DEPLOY.pkl"
+# Artefak hasil `python compiled_model.py` (Scaler+PCA affine + RF datar). Dipakai kalau ada.
+MODEL_COMPILED_PATH = os.getenv("MODEL_COMPILED_PATH", "MODEL_SIAP_DEPLOY.npz")
+# Model kedua (opsional, .npz / .pkl) yang ikut memprediksi batch yang sama hanya untuk
+# dibandingkan (latensi & kecocokan label di /status dan /metrics), tidak masuk laporan
+MODEL_SHADOW_PATH = os.getenv("MODEL_SHADOW_PATH")
 RECORDING_DIR = "recordings_field"
+# Katalog sesi yang sudah selesai (indeks SQLite + kolom skor per sesi), lihat catalog.py
+CATALOG_DIR = os.getenv("CATALOG_DIR", os.path.join(RECORDING_DIR, "catalog"))
+
+# Ukuran window AI & buffer per sesi (memori per sesi tetap: RING_CAPACITY x 3 x float32)
+WINDOW_SIZE = int(os.getenv("WINDOW_SIZE", 256))
+HOP_SIZE = int(os.getenv("HOP_SIZE", 128))
+RING_CAPACITY = int(os.getenv("RING_CAPACITY", 4096))
+
+# Fitur spektrum (harus sama dengan saat training model: clip 5.0, bin 2..N/2)
+FEATURE_CLIP = float(os.getenv("FEATURE_CLIP", 5.0))
+FEATURE_START_BIN = int(os.getenv("FEATURE_START_BIN", 2))
+FEATURE_END_BIN = int(os.getenv("FEATURE_END_BIN", 0)) or None  # 0 = N/2
+# >1 = fitur dirata-rata (Welch) atas N window terakhir per sesi. Default 1 (mati) karena
+# model yang sekarang dilatih dengan fitur per window.
+SPECTRAL_AVERAGE = int(os.getenv("SPECTRAL_AVERAGE", 1))
+
+# Antrian ingest -> worker (batch maksimal yang boleh menunggu & jumlah thread worker)
+QUEUE_MAXSIZE = int(os.getenv("QUEUE_MAXSIZE", 64))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 2))
+# /stream: lama maksimal menahan frame saat antrian penuh sebelum frame dibuang
+STREAM_MAX_WAIT = float(os.getenv("STREAM_MAX_WAIT", 5.0))
+
+# Penyimpanan sesi: "memory" (satu proses, `python server.py`) atau "sqlite" (file bersama
+# untuk banyak worker gunicorn + proses bot, lihat gunicorn.conf.py)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB = os.getenv("SESSION_DB", "sessions.db")
+
+# Bobot EMA skor kerusakan per window (makin kecil makin halus)
+EMA_ALPHA = 0.15
+
+# Batas query /catalog/* (bucket terkecil dalam detik, jumlah sesi & titik deret per respons)
+CATALOG_MIN_BUCKET = 60
+CATALOG_MAX_SESSIONS = 500
+CATALOG_MAX_POINTS = 10000
+# /riwayat: jumlah hari terakhir yang ditampilkan per baris, rentang maksimal (hari)
+HISTORY_DAYS_SHOWN = 14
+HISTORY_MAX_DAYS = 3650
+
+# Worker yang perlu memprediksi saat model masih dimuat (startup) menunggu maksimal N detik
+MODEL_WAIT_TIMEOUT = float(os.getenv("MODEL_WAIT_TIMEOUT", 120))
+
+# Log detail per batch ([1]..[6]) hanya dicetak untuk 1 dari N batch (0 = mati).
+# Angka agregat ada di /metrics; WARNING & ERROR tetap selalu dicetak.
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 100))
 
 if not os.path.exists(RECORDING_DIR):
     os.makedirs(RECORDING_DIR)
@@ -34,28 +105,167 @@ app = Flask(__name__)
 def index(): return "Server Running!", 200
 
 @app.route('/status', methods=['GET'])
-def health_check(): return jsonify({"status": "healthy"}), 200
+def health_check():
+    # Selalu 200 begitu HTTP jalan (ingest sudah bisa menerima data). ?ready=1 -> 503 selama
+    # model belum aktif, untuk healthcheck yang harus menunggu inferensi siap.
+    ready = model_registry.active is not None
+    return jsonify({
+        "status": "healthy",
+        "ready": ready,
+        "startup": startup.info(),
+        "active_sessions": len(session_store),
+        "session_store": SESSION_STORE,
+        "pid": os.getpid(),
+        "devices": session_store.devices(),
+        "queue": pipeline_queue.stats(),
+        "queue_shared": session_store.pending_chunks() if session_store.shared else None,
+        "notify": notifier.stats(),
+        "model": model_registry.info(),
+        "gate": inference_gate.info() if GATE_ENABLED else None,
+    }), 503 if request.args.get('ready') and not ready else 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Format teks Prometheus (histogram latensi per tahap, counter request/window, dll)
+    return metrics_registry.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+# --- RIWAYAT LINTAS SESI (katalog) ---
+def _catalog_query():
+    # ?device=&start=&end= (epoch / 'YYYY-mm-dd[ HH:MM]' jam lokal), atau ?days=N terakhir
+    args = request.args
+    end = parse_time(args.get('end'))
+    start = parse_time(args.get('start'))
+    if start is None and args.get('days'):
+        # Lewat parse_time juga: days NaN / terlalu besar -> ValueError (400)
+        start = parse_time((end or time.time()) - float(args['days']) * DAY_SECONDS)
+    device = args.get('device')
+    return (normalize_device_id(device) if device else None), start, end
+
+@app.route('/catalog/sessions', methods=['GET'])
+def catalog_sessions():
+    try:
+        device_id, start, end = _catalog_query()
+        limit = max(1, min(int(request.args.get('limit', CATALOG_MAX_SESSIONS)), CATALOG_MAX_SESSIONS))
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+    return jsonify({
+        "summary": recording_catalog.summary(device_id, start, end),
+        "sessions": recording_catalog.sessions(device_id, start, end, limit),
+    }), 200
+
+@app.route('/catalog/trend', methods=['GET'])
+def catalog_trend():
+    # ?bucket=detik (default 1 hari) -> rata-rata / puncak per bucket; ?points=N -> deret skor (LTTB).
+    # Maksimal CATALOG_MAX_POINTS bucket: rentang panjang -> bucket dilebarkan (lihat bucket_s balasan)
+    try:
+        device_id, start, end = _catalog_query()
+        bucket_s = float(request.args.get('bucket', DAY_SECONDS))
+        if not math.isfinite(bucket_s):
+            raise ValueError(f"bucket tidak valid: {request.args['bucket']}")
+        bucket_s = max(bucket_s, CATALOG_MIN_BUCKET)
+        points = min(int(request.args.get('points', 0)), CATALOG_MAX_POINTS)
+    except ValueError as e:
+        return jsonify({"status": "error", "msg": str(e)}), 400
+    trend = recording_catalog.trend(device_id, start, end, bucket_s, max_buckets=CATALOG_MAX_POINTS)
+    bucket_s = trend.pop('bucket_s')
+    out = {"bucket_s": bucket_s, "trend": {key: values.tolist() for key, values in trend.items()}}
+    if points > 0:
+        times, scores = recording_catalog.series(device_id, start, end, points)
+        out["series"] = {"time": times.tolist(), "score": scores.tolist()}
+    return jsonify(out), 200
 
 # vARIABEL GLOBAL
-model_data = None
-active_sessions = {} 
-data_lock = threading.Lock()
+# Sesi aktif + routing device -> sesi + lock per device (lihat session_store.py)
+session_store = open_session_store(SESSION_STORE, SESSION_DB)
+# Binding chat Telegram -> device
+device_registry = DeviceRegistry()
+# Riwayat lintas sesi (/riwayat, /catalog/*): satu baris per sesi selesai + kolom mmap
+recording_catalog = RecordingCatalog(CATALOG_DIR)
+# Satu thread penulis rekaman (biner buffered + fsync berkala) untuk semua sesi.
+# Store bersama (banyak worker): buffer per proses, di-commit sebelum lock device dilepas.
+recording_writer = RecordingWriter(shared=session_store.shared)
+
+# Metrik untuk /metrics (pengganti print stopwatch per request)
+metrics_registry = Registry()
+STAGE_SECONDS = metrics_registry.histogram(
+    "vib_stage_seconds", "Durasi tiap tahap pipeline (decode, io_raw, features, pca, rf, io_report, notify, report, catalog)", ("stage",))
+INGEST_ACK_SECONDS = metrics_registry.histogram(
+    "vib_ingest_ack_seconds", "Waktu dari request /raw_data masuk sampai dibalas ke ESP32")
+PIPELINE_SECONDS = metrics_registry.histogram(
+    "vib_pipeline_seconds", "Waktu sejak batch diterima sampai selesai diproses worker (antri + proses)")
+REQUESTS = metrics_registry.counter("vib_requests_total", "Request /raw_data per hasil", ("status",))
+SAMPLES_RECEIVED = metrics_registry.counter("vib_samples_received_total", "Sampel (baris x,y,z) yang diterima")
+WINDOWS_PREDICTED = metrics_registry.counter("vib_windows_total", "Window yang sudah diprediksi model")
+STREAM_FRAMES = metrics_registry.counter("vib_stream_frames_total", "Frame yang masuk lewat /stream per hasil", ("status",))
+OPEN_STREAMS = metrics_registry.gauge("vib_open_streams", "Koneksi /stream yang sedang terbuka")
+SAMPLES_DROPPED = metrics_registry.counter(
+    "vib_samples_dropped_total", "Sampel tertimpa di ring buffer sebelum sempat diproses")
+NOTIFY_SECONDS = metrics_registry.histogram(
+    "vib_notify_seconds", "Waktu notifikasi Telegram sejak diantrikan sampai diterima Bot API", ("method",))
+NOTIFICATIONS = metrics_registry.counter(
+    "vib_notifications_total", "Notifikasi Telegram per hasil (sent, failed, retried, coalesced, dropped)", ("status",))
+SHADOW_SECONDS = metrics_registry.histogram(
+    "vib_model_predict_seconds", "Latensi PCA + Random Forest per batch, model aktif vs shadow", ("model",))
+SHADOW_WINDOWS = metrics_registry.counter(
+    "vib_shadow_windows_total", "Window yang ikut diprediksi shadow model per hasil", ("result",))
+GATE_WINDOWS = metrics_registry.counter(
+    "vib_gate_windows_total", "Window per keputusan gerbang inferensi (inferred, cached, quiet, stationary)", ("result",))
+GATE_SAVED_SECONDS = metrics_registry.counter(
+    "vib_gate_saved_seconds_total", "Estimasi detik CPU PCA + RF yang dilewati gerbang inferensi")
+metrics_registry.gauge("vib_active_sessions", "Sesi rekaman yang aktif", fn=lambda: len(session_store))
+metrics_registry.gauge(
+    "vib_buffer_backlog_samples", "Sampel di ring buffer semua sesi yang belum jadi window",
+    fn=lambda: sum(len(s['raw_buffer']) for s in session_store.sessions()))
+metrics_registry.gauge("vib_queue_depth", "Batch yang menunggu di antrian worker", fn=lambda: pipeline_queue.stats()['depth'])
+metrics_registry.gauge("vib_queue_lag_seconds", "Umur batch tertua di antrian worker",
+                       fn=lambda: pipeline_queue.stats()['lag_oldest_s'])
+metrics_registry.gauge("vib_notify_queue_depth", "Notifikasi Telegram yang menunggu dikirim",
+                       fn=lambda: notifier.stats()['depth'])
+
+# Stopwatch per tahap (decode, fitur, PCA, RF, I/O, notifikasi, laporan) -> STAGE_SECONDS
+stage_timer = StageTimer(STAGE_SECONDS)
+# Peringatan & laporan akhir ke Telegram lewat antrian (koneksi keep-alive, retry, rate limit)
+notifier = TelegramNotifier(TELEGRAM_API_URL, TOKEN, stage_timer=stage_timer,
+                            latency=NOTIFY_SECONDS, results=NOTIFICATIONS)
+# Grafik (tren laporan & snapshot) dirender di process pool, bukan pyplot global
+chart_renderer = ChartRenderer()
+# Penghitung batch untuk sampling log debug
+_log_counter = itertools.count()
+# Langkah startup yang berat (model, proses render) dijalankan di background
+startup = StartupTracker()
 
 # ================================= 1. PEMUATAN MODEL ===========================================
 
 def load_model():
-    global model_data
-    try:
-        model_data = joblib.load(MODEL_PATH)
-        print("[INFO] Model Random Forest Loaded!")
-    except Exception as e:
-        print(f"[CRITICAL ERROR] Gagal load model: {e}")
-        model_data = None
+    # File terbaru dulu (.npz terkompilasi kalau tidak lebih tua dari pickle), fallback ke yang lain;
+    # lihat model_registry.py (validasi, warm-up, swap)
+    model_registry.paths = [p for p in (MODEL_COMPILED_PATH, MODEL_PATH) if p]
+    model = model_registry.load()
+    if model is None:
+        print(f"[CRITICAL ERROR] Gagal load model: {model_registry.last_error} "
+              "(dicoba lagi otomatis saat file model berubah)")
+    model_registry.load_shadow(MODEL_SHADOW_PATH)
+    return model
+
+def _init_model():
+    # scipy.fft + rencana FFT lewat satu window dummy, lalu model (mmap, validasi, warm-up)
+    feature_extractor.transform(np.zeros((1, WINDOW_SIZE, feature_extractor.channels)))
+    model = load_model()
+    model_registry.start_watcher()
+    return model is not None
+
+def start_background_init(charts=True):
+    # Sekali per proses yang melayani HTTP (`python server.py` / tiap worker gunicorn).
+    # Flask sudah bisa menjawab /status & /raw_data selama langkah ini berjalan.
+    startup.run('model', _init_model)
+    if charts:
+        startup.run('charts', lambda: chart_renderer.start().result(timeout=RENDER_TIMEOUT), after='model')
 
 # ================================= 2. EKSTRAKSI FITUR DAN PREDIKSI  ===========================================
 
 def extract_features_live(signal_data):
     # CLIPPING (Untuk antisipasi Jalan Rusak/Polisi Tidur)
+    from scipy.fft import fft
     signal_clip = np.clip(signal_data, -5.0, 5.0)
     wx = signal_clip[:, 0]; wy = signal_clip[:, 1]; wz = signal_clip[:, 2]
     
@@ -71,112 +281,155 @@ def extract_features_live(signal_data):
     feat = np.concatenate([[tilt_x, tilt_y, tilt_z], fx, fy, fz])
     return feat.reshape(1, -1)
 
-def predict_chunk(chunk_data):
-    if model_data is None: return "Model Error", 0.0
+# Versi batch/streaming dari extract_features_live (lihat feature_engine.py):
+# satu rfft untuk semua window & sumbu sekaligus, buffer dipakai ulang per thread.
+feature_extractor = SpectralFeatureExtractor(WINDOW_SIZE, FEATURE_START_BIN, FEATURE_END_BIN, FEATURE_CLIP)
+
+# Model aktif (+ shadow). Model baru hanya dipakai kalau dimensi fiturnya sama dengan
+# fitur di atas (= panjang vektor extract_features_live untuk konfigurasi default)
+model_registry = ModelRegistry([MODEL_COMPILED_PATH, MODEL_PATH], feature_extractor.n_features,
+                               shadow_latency=SHADOW_SECONDS, shadow_windows=SHADOW_WINDOWS)
+
+# Gerbang sebelum PCA + RF: window sepi / tidak berubah memakai ulang prediksi acuan,
+# vektor PCA yang sudah pernah diprediksi diambil dari cache (lihat inference_gate.py)
+inference_gate = InferenceGate(feature_extractor.channels, WINDOW_SIZE, feature_extractor.n_bins,
+                               ema_alpha=EMA_ALPHA, stage_timer=stage_timer,
+                               windows=GATE_WINDOWS, saved=GATE_SAVED_SECONDS)
+
+def extract_features_batch(windows):
+    # Array (K, N, 3) -> fitur (K, 3 + 3 x bin), urutan kolom sama dengan versi live
+    return feature_extractor.transform(windows)
+
+# Bobot kelas untuk Skor Kerusakan Fisik (0.0 - 1.0)
+DAMAGE_WEIGHTS = {'rusak_berat': 1.0, 'rusak_ringan': 0.5}
+
+def damage_weights_for(classes):
+    return np.array([DAMAGE_WEIGHTS.get(label, 0.0) for label in classes])
+
+def predict_windows(windows, debug=False, averager=None, gate=None, raise_errors=False):
+    # Prediksi semua window sekaligus: scaler, PCA, dan predict_proba masing-masing
+    # dipanggil SEKALI untuk seluruh tumpukan window. debug=True -> cetak log [2]..[4].
+    # averager: SpectralAverager sesi (mode SPECTRAL_AVERAGE > 1)
+    # gate: GateState sesi -> hanya window yang lolos gerbang inferensi masuk PCA + RF
+    # raise_errors: error dilempar, bukan label "Error" skor 0 (diagnosa batch: rekaman ditandai gagal)
+    k = len(windows)
+    # Referensi lokal: kalau model di-swap (hot reload) di tengah batch, batch ini tetap
+    # selesai dengan model lama
+    model = model_registry.active
+    if model is None and startup.wait('model', MODEL_WAIT_TIMEOUT):
+        # Server baru start: tunggu load model di background selesai
+        model = model_registry.active
+    if model is None:
+        if raise_errors:
+            raise RuntimeError(f"Model tidak tersedia: {model_registry.last_error}")
+        return np.array(["Model Error"] * k), np.zeros(k)
     try:
-        features = extract_features_live(chunk_data)
-        features_scaled = model_data['scaler'].transform(features)
-        features_pca = model_data['pca'].transform(features_scaled)
-        
-        print(f"[2. PRE-PROCESSING] Ekstraksi spektrum FFT berhasil ({features.shape[1]} dimensi fitur).")
-        print(f"[3. REDUKSI PCA] Fitur dipadatkan menjadi {features_pca.shape[1]} Komponen Utama.")
+        with stage_timer.measure('features'):
+            features = feature_extractor.transform(windows, copy=False)
+            if averager is not None:
+                features = averager.update(features)
+        if debug:
+            print(f"[2. PRE-PROCESSING] Ekstraksi spektrum FFT berhasil ({k} window x {features.shape[1]} dimensi fitur).")
 
-        # 1. Ambil Probabilitas
-        probs = model_data['model'].predict_proba(features_pca)[0]
-        classes = model_data['model'].classes_
+        t_model = time.perf_counter()
+        classes = model.classes_
+        if gate is not None:
+            # 1. Ambil Probabilitas (K x kelas); window yang dilewati memakai hasil acuan
+            probs, inferred = inference_gate.predict_proba(gate, features, model)
+            if debug:
+                print(f"[3. GERBANG + PCA] {len(inferred)} dari {k} window lewat PCA, sisanya memakai ulang prediksi acuan.")
+        else:
+            with stage_timer.measure('pca'):
+                # Model terkompilasi: Scaler+PCA = satu perkalian matriks, RF = traversal NumPy
+                features_pca = model.reduce(features)
+            if debug:
+                print(f"[3. REDUKSI PCA] Fitur dipadatkan menjadi {features_pca.shape[1]} Komponen Utama.")
+
+            # 1. Ambil Probabilitas (K x kelas)
+            with stage_timer.measure('rf'):
+                probs = model.proba(features_pca)
+            inferred = slice(None)
+        t_model = time.perf_counter() - t_model
         
-        # 2. Hitung Skor Kerusakan Fisik (0.0 - 1.0)
-        damage_score = 0.0
-        for label, prob in zip(classes, probs):
-            if label == 'rusak_berat':
-                damage_score += (prob * 1.0)
-            elif label == 'rusak_ringan':
-                damage_score += (prob * 0.5)
+        # 2. Hitung Skor Kerusakan Fisik (0.0 - 1.0) per window
+        damage_scores = probs @ damage_weights_for(classes)
         
-        # 3. Ambil Label Utama
-        prediction_label = model_data['model'].predict(features_pca)[0]
-        confidence = max(probs) * 100
+        # 3. Ambil Label Utama (sama dengan model.predict: argmax probabilitas)
+        best = np.argmax(probs, axis=1)
+        prediction_labels = classes[best]
+        confidence = probs[np.arange(k), best] * 100
+        # Shadow model (kalau ada) memprediksi fitur yang sama di thread lain
+        model_registry.submit_shadow(features[inferred], prediction_labels[inferred], t_model)
+
+        if gate is not None and inference_gate.verify:
+            # Mode verifikasi: prediksi penuh tanpa gerbang untuk dibandingkan (tidak masuk laporan)
+            full_probs = model.predict_proba(features)
+            inference_gate.record_verify(gate, damage_scores, full_probs @ damage_weights_for(classes),
+                                         prediction_labels, classes[np.argmax(full_probs, axis=1)])
 
-        # Log Hasil Prediksi 
-        print(f"[4. RANDOM FOREST] Hasil Prediksi : {prediction_label.upper()} (Akurasi: {confidence:.2f}%)")
+        # Log Hasil Prediksi (window terakhir)
+        if debug:
+            print(f"[4. RANDOM FOREST] Hasil Prediksi : {prediction_labels[-1].upper()} (Akurasi: {confidence[-1]:.2f}%) | {k} window")
 
-        return prediction_label, damage_score
+        return prediction_labels, damage_scores
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error Prediction: {e}")
-        return "Error", 0.0
+        return np.array(["Error"] * k), np.zeros(k)
+
+def predict_chunk(chunk_data):
+    labels, scores = predict_windows(np.asarray(chunk_data)[np.newaxis])
+    return labels[0], scores[0]
     
 # ================================= 3. VISUALISASI SINYAL  ===========================================
 
-def generate_waveform_snapshot(data_chunk):
-    plt.figure(figsize=(8, 4))
-    plt.plot(data_chunk[:, 0], label='X', color='r', alpha=0.7)
-    plt.plot(data_chunk[:, 1], label='Y', color='g', alpha=0.7)
-    plt.plot(data_chunk[:, 2], label='Z', color='b', alpha=0.7)
-    plt.title("Live Sensor Monitor (Raw Data)")
-    plt.ylim(-15, 15) 
-    plt.legend()
-    plt.grid(True, linestyle='--', linewidth=0.5)
-    
-    img_io = io.BytesIO()
-    plt.savefig(img_io, format='png')
-    img_io.seek(0)
-    plt.close()
-    
+# Gambar waveform: chart_renderer.waveform(data) (lihat rendering.py)
+
+def waveform_status(data_chunk):
     std_dev = np.std(data_chunk)
     if std_dev < 0.05:
         status_text = "⚠️ **PERINGATAN: SINYAL DATAR / MATI**\nCek kabel sensor!"
     else:
         status_text = "✅ **STATUS: SENSOR AKTIF**\nGrafik getaran terdeteksi."
         
-    return img_io, status_text
+    return status_text
 
 # ================================= 4. TAMPILAN PESAN NOTIFIKASI (GABUNGAN GRAFIK TREN + TEKS SARAN)   ===========================================
 
+def final_status(avg_score):
+    # Status akhir dari rata-rata skor EMA (0-100), juga dipakai batch_diagnosis.py
+    # < 30% = Normal, 30-60% = Rusak Ringan, > 60% = Rusak Berat
+    if avg_score > 65:
+        return 'rusak_berat', "BAHAYA (RUSAK BERAT)"
+    if avg_score > 40:
+        return 'rusak_ringan', "WARNING (RUSAK RINGAN)"
+    return 'normal', "NORMAL (SEHAT)"
+
 def generate_final_report(session_data):
-    scores = session_data['history_scores'] # List skor 0-100
-    times = session_data['history_times']   # List waktu (menit)
+    history = session_data['history']  # SessionHistory: statistik berjalan + tier grafik
     duration_actual = (time.time() - session_data['start_time']) / 60
     
-    if not scores:
+    if not history.count:
         return "⚠️ Tidak ada data yang terkumpul. Cek sensor.", None
 
-    # 1. Hitung Statistik
-    avg_score = np.mean(scores)
-    max_score = np.max(scores)
+    # 1. Hitung Statistik (sudah dihitung berjalan, tidak tergantung durasi sesi)
+    avg_score = history.mean
+    max_score = history.peak
     
     # 2. Ditentukan Status Akhir (Logika Fisika EMA)
-    # < 30% = Normal, 30-60% = Rusak Ringan, > 60% = Rusak Berat
-    majority_key = 'normal'
-    status_label = "NORMAL (SEHAT)"
-    
-    if avg_score > 65: 
-        majority_key = 'rusak_berat'
-        status_label = "BAHAYA (RUSAK BERAT)"
-    elif avg_score > 40: 
-        majority_key = 'rusak_ringan'
-        status_label = "WARNING (RUSAK RINGAN)"
+    majority_key, status_label = final_status(avg_score)
     
     # 3. BIKIN GRAFIK TREN KESEHATAN (Line Chart)
-    plt.figure(figsize=(10, 6)) # Agak tinggi biar jelas
-    plt.plot(times, scores, color='blue', linewidth=2, label='Kondisi Motor')
-    
-    # Zona Warna Threshold
-    plt.axhspan(0, 30, facecolor='green', alpha=0.1, label='Zona Aman')
-    plt.axhspan(30, 60, facecolor='yellow', alpha=0.1, label='Zona Gejala')
-    plt.axhspan(60, 100, facecolor='red', alpha=0.1, label='Zona Bahaya')
-    
-    plt.title(f"Grafik Kesehatan Motor (Durasi: {duration_actual:.1f} m)")
-    plt.xlabel("Waktu (Menit)")
-    plt.ylabel("Tingkat Kerusakan (%)")
-    plt.ylim(0, 100)
-    plt.grid(True, linestyle='--', alpha=0.5)
-    plt.legend(loc='upper left')
-    plt.tight_layout()
-    
-    img_io = io.BytesIO()
-    plt.savefig(img_io, format='png')
-    img_io.seek(0)
-    plt.close()
+    # Dirender di process pool (deret panjang diperkecil LTTB); laporan teks tetap
+    # terkirim walau grafik gagal / terlalu lama
+    try:
+        times, scores = history.series()  # rata-rata per detik / per menit, skor 0-100
+        png = chart_renderer.trend(times, scores, duration_actual).result(timeout=RENDER_TIMEOUT)
+        img_io = io.BytesIO(png)
+    except Exception as e:
+        print(f"[ERROR RENDER] Grafik tren gagal: {e}")
+        img_io = None
 
     # 4. TEKS SARAN LENGKAP 
     tips_map = {
@@ -223,12 +476,59 @@ def generate_final_report(session_data):
 
 # ================================= 5. MEKANISME TELEGRAM BOT  ===========================================
 
+def create_session(chat_id, duration, device_id):
+    # Return None kalau device sedang dipakai sesi chat lain
+    owner = session_store.chat_for_device(device_id)
+    if owner is not None and owner != chat_id:
+        return None
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    # 1. FILE RAW (Data Teknis - Field Test)
+    # Direkam sebagai frame biner .vibrec, CSV dengan nama yang sama baru dibuat saat export
+    filename_raw = f"field_test_{stamp}_dev{device_id}"
+    filepath_raw = os.path.join(RECORDING_DIR, filename_raw + ".csv")
+    recpath_raw = os.path.join(RECORDING_DIR, filename_raw + RAW_EXTENSION)
+
+    # 2. FILE LAPORAN USER (Readable)
+    filename_report = f"Laporan_Kondisi_{stamp}_dev{device_id}.csv"
+    filepath_report = os.path.join(RECORDING_DIR, filename_report)
+    recording_writer.append_rows(filepath_report, [['Jam', 'Persentase_Kerusakan', 'Status_Diagnosa']])
+    recording_writer.commit(filepath_report)
+
+    session = {
+        'chat_id': chat_id,
+        'device_id': device_id,
+        'session_id': f"{stamp}_dev{device_id}",  # sama dengan akhiran nama file rekaman
+        'start_time': time.time(),
+        'duration': duration,
+        'raw_buffer': RingBuffer(RING_CAPACITY, window=WINDOW_SIZE, hop=HOP_SIZE),
+        'spectral_avg': SpectralAverager(feature_extractor.channels, feature_extractor.n_features, SPECTRAL_AVERAGE)
+                        if SPECTRAL_AVERAGE > 1 else None,
+        'gate': inference_gate.new_state() if GATE_ENABLED else None,
+        'rec_path_raw': recpath_raw,
+        'rec_frames': 0,
+        'rec_samples': 0,
+        'rec_next_t': None,
+        'rec_last_seq': None,
+        'csv_path_raw': filepath_raw,      
+        'csv_path_report': filepath_report, 
+        'history': SessionHistory(),
+        'is_stopped': False,
+        'ema_condition': 0.0,
+        'warning_sent': False
+    }
+    if not session_store.add(chat_id, session):
+        return None
+    return session
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
     if AUTHORIZED_USER_ID and user_id != AUTHORIZED_USER_ID:
         await update.message.reply_text("⛔ AKSES DITOLAK.")
         return
 
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     keyboard = [
         [InlineKeyboardButton("⏱️ 5 Menit", callback_data='5'),
          InlineKeyboardButton("⏱️ 15 Menit", callback_data='15')],
@@ -237,25 +537,90 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("📊 Cek Status", callback_data='status'),
          InlineKeyboardButton("📈 Cek Sinyal", callback_data='snapshot')] 
     ]
+    device_id = device_registry.device_for_chat(update.effective_chat.id)
     await update.message.reply_text(
         "🛠️ *Sistem Diagnosa Roda Gigi (Dr. Motor)*\n"
+        f"📟 Sensor: `{device_id}` (ganti dengan /device <id>)\n"
+        "📚 Riwayat sensor ini: /riwayat <hari>\n"
         "Silakan pilih durasi tes atau cek sinyal.",
         reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown'
     )
 
+async def device_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    if AUTHORIZED_USER_ID and user_id != AUTHORIZED_USER_ID:
+        await update.message.reply_text("⛔ AKSES DITOLAK.")
+        return
+
+    chat_id = update.effective_chat.id
+    if context.args:
+        if chat_id in session_store:
+            await update.message.reply_text("❌ Hentikan pengujian yang berjalan dulu sebelum ganti sensor.")
+            return
+        device_registry.bind(chat_id, context.args[0])
+        await update.message.reply_text(
+            f"✅ Chat ini sekarang terhubung ke sensor `{device_registry.device_for_chat(chat_id)}`.",
+            parse_mode='Markdown'
+        )
+        return
+
+    # Tanpa argumen: tampilkan daftar sensor yang pernah mengirim data
+    lines = [f"📟 Sensor aktif di chat ini: `{device_registry.device_for_chat(chat_id)}`", ""]
+    for device_id, info in sorted(session_store.devices().items()):
+        state = "🔴 merekam" if info['session_chat'] is not None else "⚪ idle"
+        lines.append(f"- `{device_id}` {state}, data terakhir {info['last_seen_s']:.0f} detik lalu")
+    if len(lines) == 2:
+        lines.append("Belum ada sensor yang mengirim data.")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    if AUTHORIZED_USER_ID and user_id != AUTHORIZED_USER_ID:
+        await update.message.reply_text("⛔ AKSES DITOLAK.")
+        return
+
+    # /riwayat [hari]: tren harian sensor chat ini dari katalog (default 30 hari terakhir,
+    # maksimal HISTORY_MAX_DAYS)
+    try:
+        days = float(context.args[0]) if context.args else 30
+        if not math.isfinite(days) or days <= 0:
+            raise ValueError(context.args[0])
+    except ValueError:
+        await update.message.reply_text(f"❌ Format: /riwayat <jumlah hari> (maks {HISTORY_MAX_DAYS})")
+        return
+    days = min(days, HISTORY_MAX_DAYS)
+    device_id = device_registry.device_for_chat(update.effective_chat.id)
+    start = time.time() - days * DAY_SECONDS
+    stats, trend = await asyncio.to_thread(
+        lambda: (recording_catalog.summary(device_id, start), recording_catalog.trend(device_id, start)))
+    if not stats['sessions']:
+        await update.message.reply_text(f"📚 Belum ada rekaman sensor `{device_id}` dalam {days:g} hari terakhir.",
+                                        parse_mode='Markdown')
+        return
+
+    lines = [
+        f"📚 *Riwayat Sensor* `{device_id}` ({days:g} hari terakhir)",
+        f"🗂 {stats['sessions']} sesi, {stats['hours']:.1f} jam rekaman",
+        f"📈 Rata-rata Kerusakan: {stats['score_mean']:.1f}% | 💥 Puncak: {stats['score_peak']:.1f}%",
+        "",
+    ]
+    for t, mean, peak, n in list(zip(trend['time'], trend['mean'], trend['peak'], trend['sessions']))[-HISTORY_DAYS_SHOWN:]:
+        lines.append(f"- {datetime.fromtimestamp(t).strftime('%d-%m-%Y')}: {mean:.1f}% (puncak {peak:.1f}%, {n} sesi)")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
+
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = str(query.from_user.id)
     if AUTHORIZED_USER_ID and user_id != AUTHORIZED_USER_ID: return
 
     await query.answer()
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     chat_id = query.message.chat_id
     data = query.data
     
     # --- STOP ---
     if data == 'stop':
-        if chat_id in active_sessions:
-            active_sessions[chat_id]['is_stopped'] = True 
+        if session_store.update(chat_id, is_stopped=True):
             await query.edit_message_text("🛑 **Menghentikan Pengujian...**\nFinalisasi data...")
         else:
             await query.edit_message_text("❌ Tidak ada pengujian.")
@@ -263,27 +628,55 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- SNAPSHOT ---
     if data == 'snapshot':
-        if chat_id in active_sessions and len(active_sessions[chat_id]['raw_buffer']) > 50:
-            snapshot_data = np.array(active_sessions[chat_id]['raw_buffer'][-200:])
-            img, status_txt = generate_waveform_snapshot(snapshot_data)
-            await context.bot.send_photo(chat_id=chat_id, photo=img, caption=status_txt, parse_mode='Markdown')
+        session = session_store.get(chat_id)
+        if session and len(session['raw_buffer']) > 50:
+            # copy di bawah lock device karena buffer terus ditulis oleh worker
+            with session_store.lock(session['device_id']):
+                snapshot_data = session['raw_buffer'].tail(200, copy=True)
+            # Render di process pool; event loop bot tidak ikut tertahan
+            png = await asyncio.wrap_future(chart_renderer.waveform(snapshot_data))
+            await context.bot.send_photo(chat_id=chat_id, photo=png, caption=waveform_status(snapshot_data),
+                                         parse_mode='Markdown')
         else:
             await query.edit_message_text("❌ Data belum masuk. Coba lagi nanti.")
         return
 
+    # --- EXPORT CSV DATA MENTAH ---
+    if data == 'export':
+        session = session_store.get(chat_id)
+        if session:
+            rows = await asyncio.to_thread(export_session_csv, session)
+            with open(session['csv_path_raw'], 'rb') as f:
+                await context.bot.send_document(chat_id=chat_id, document=f,
+                                                caption=f"💾 Data Mentah sementara ({rows} sampel)")
+        else:
+            await query.edit_message_text("❌ Tidak ada pengujian.")
+        return
+
     # --- STATUS ---
     if data == 'status':
-        if chat_id in active_sessions:
-            elapsed = (time.time() - active_sessions[chat_id]['start_time']) / 60
-            dur = active_sessions[chat_id]['duration']
+        session = session_store.get(chat_id)
+        if session:
+            elapsed = (time.time() - session['start_time']) / 60
+            dur = session['duration']
+            device_id = session['device_id']
+            history = session['history']
+            if history.count:
+                label, share = history.label_shares()[0]
+                condition = (f"📈 Kondisi: {session['ema_condition'] * 100:.1f}% "
+                             f"(rata-rata {history.mean:.1f}%, puncak {history.peak:.1f}%)\n"
+                             f"🔎 Prediksi terbanyak: {label.replace('_', ' ').upper()} ({share:.0f}% dari {history.count} window)\n")
+            else:
+                condition = "📈 Kondisi: belum ada window yang diprediksi\n"
             
             kb_control = [
                 [InlineKeyboardButton("🔄 Refresh", callback_data='status'),
                  InlineKeyboardButton("📈 Cek Sinyal", callback_data='snapshot')],
-                [InlineKeyboardButton("🛑 Hentikan Sekarang", callback_data='stop')]
+                [InlineKeyboardButton("💾 Export CSV", callback_data='export'),
+                 InlineKeyboardButton("🛑 Hentikan Sekarang", callback_data='stop')]
             ]            
             await query.edit_message_text(
-                f"⏳ *Status Rekaman*\n⏱ Waktu: {elapsed:.1f} / {dur} m\n\nKlik 'Cek Sinyal' untuk validasi sensor.",
+                f"⏳ *Status Rekaman*\n📟 Sensor: `{device_id}`\n⏱ Waktu: {elapsed:.1f} / {dur} m\n{condition}\nKlik 'Cek Sinyal' untuk validasi sensor.",
                 parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(kb_control)
             )
         else:
@@ -292,32 +685,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- MULAI RECORDING ---
     duration = int(data)
-    
-    # 1. FILE RAW (Data Teknis - Field Test)
-    filename_raw = f"field_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    filepath_raw = os.path.join(RECORDING_DIR, filename_raw)
-    with open(filepath_raw, 'w', newline='') as f:
-        csv.writer(f, delimiter=';').writerow(['timestamp', 'x', 'y', 'z'])
-
-    # 2. FILE LAPORAN USER (Readable)
-    filename_report = f"Laporan_Kondisi_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    filepath_report = os.path.join(RECORDING_DIR, filename_report)
-    with open(filepath_report, 'w', newline='') as f:
-        csv.writer(f, delimiter=';').writerow(['Jam', 'Persentase_Kerusakan', 'Status_Diagnosa'])
-
-    active_sessions[chat_id] = {
-        'start_time': time.time(),
-        'duration': duration,
-        'predictions': [], 
-        'raw_buffer': [],
-        'csv_path_raw': filepath_raw,      
-        'csv_path_report': filepath_report, 
-        'history_scores': [], 
-        'history_times': [],
-        'is_stopped': False,
-        'ema_condition': 0.0,
-        'warning_sent': False
-    }
+    device_id = device_registry.device_for_chat(chat_id)
+    session = create_session(chat_id, duration, device_id)
+    if session is None:
+        await query.edit_message_text(f"❌ Sensor `{device_id}` sedang dipakai pengujian lain.", parse_mode='Markdown')
+        return
+    filename_raw = os.path.basename(session['rec_path_raw'])
     
     kb_control = [
         [InlineKeyboardButton("📊 Cek Status", callback_data='status'),
@@ -327,6 +700,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await query.edit_message_text(
         f"✅ *Tes {duration} Menit Dimulai!*\n"
+        f"📟 Sensor: `{device_id}`\n"
         f"📝 Mencatat ke: `{filename_raw}`\n\n"
         "Motor sedang direkam. Gunakan tombol di bawah untuk memantau.",
         parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(kb_control)
@@ -334,164 +708,333 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ================================= 6. FLASK ENDPOINT  ===========================================
 
+def process_device_chunk(device_id, job):
+    # Tahap worker: dipanggil KeyedWorkQueue, selalu berurutan untuk satu device.
+    # Hanya lock milik device ini yang dipegang, device lain tetap jalan paralel.
+    with session_store.checkout(device_id) as (chat_id, session):
+        # Store bersama: job lokal hanya penanda, chunk device diambil dari antrian bersama
+        # (urut masuk, di bawah lock device) -> bisa 0 kalau sudah diambil worker lain
+        jobs = session_store.take_chunks(device_id) if session_store.shared else [job]
+        if session is None:
+            return
+
+        try:
+            for job in jobs:
+                elapsed = (time.time() - session['start_time']) / 60
+                is_time_up = elapsed >= session['duration']
+                is_force_stop = session.get('is_stopped', False)
+
+                if is_time_up or is_force_stop:
+                    break
+                process_session_chunk(chat_id, session, job, elapsed)
+            else:
+                return
+        finally:
+            # Store bersama: buffer rekaman proses ini ditulis sebelum lock device dilepas
+            # (chunk berikutnya bisa diproses worker lain yang menambah ke file yang sama)
+            recording_writer.commit(session['rec_path_raw'], session['csv_path_report'])
+
+        session_store.remove(chat_id)
+
+    # Laporan akhir & kirim Telegram di luar lock device
+    finalize_session(chat_id, session)
+
+def process_session_chunk(chat_id, session, job, elapsed):
+    raw_chunk = job['chunk']
+
+    # A. SIMPAN RAW DATA
+    # Frame biner diantrikan ke writer background (tidak ada open/format per sampel di sini).
+    # Timestamp per sampel = t0 + i / sample_rate; t0 disambung dari batch sebelumnya
+    # kalau nomor urutnya berurutan, selain itu diperkirakan dari waktu terima.
+    meta = job['meta']
+    rate = float(meta.get('sample_rate') or DEFAULT_SAMPLE_RATE)
+    seq = meta.get('seq')
+    n = len(raw_chunk)
+    t0 = job['received_at'] - n / rate
+    if session['rec_next_t'] is not None:
+        last_seq = session['rec_last_seq']
+        contiguous = seq is not None and last_seq is not None and seq == last_seq + 1
+        t0 = session['rec_next_t'] if contiguous else max(t0, session['rec_next_t'])
+    with stage_timer.measure('io_raw'):
+        recording_writer.append_frame(session['rec_path_raw'], seq if seq is not None else session['rec_frames'],
+                                      t0, rate, raw_chunk)
+    session['rec_frames'] += 1
+    session['rec_samples'] = session.get('rec_samples', 0) + n
+    session['rec_next_t'] = t0 + n / rate
+    session['rec_last_seq'] = seq
+
+    # B. BUFFER & PREDICT (semua window yang sudah lengkap, sekali jalan)
+    debug = job.get('debug', False)
+    buffer = session['raw_buffer']
+    dropped_before = buffer.dropped
+    buffer.push(raw_chunk)
+    if buffer.dropped != dropped_before:
+        SAMPLES_DROPPED.inc(buffer.dropped - dropped_before)
+    if buffer.has_window():
+        windows = buffer.pop_windows()
+
+        # [2] STOPWATCH AI START 
+        start_ai_inference = time.time()
+
+        res_labels, raw_scores = predict_windows(windows, debug, session['spectral_avg'], session['gate'])
+
+        # [3] STOPWATCH AI STOP (Selesai mikir)
+        end_ai_inference = time.time()   
+        ai_latency = end_ai_inference - start_ai_inference # Perhitungan Latensi AI
+        WINDOWS_PREDICTED.inc(len(windows))
+
+        # C. EMA (diupdate per window, berurutan)
+        ema_values = []
+        current_ema = session['ema_condition']
+        for raw_score in raw_scores:
+            current_ema = (raw_score * EMA_ALPHA) + (current_ema * (1.0 - EMA_ALPHA))
+            ema_values.append(current_ema)
+        session['ema_condition'] = current_ema
+
+        # D. REPORT USER
+        session['history'].append(elapsed, [ema * 100 for ema in ema_values], res_labels)
+
+        with stage_timer.measure('io_report'):
+            jam = datetime.now().strftime('%H:%M:%S')
+            recording_writer.append_rows(session['csv_path_report'], (
+                [jam, f"{ema * 100:.1f}%", label.upper()]
+                for ema, label in zip(ema_values, res_labels)
+            ))
+
+        # E. WARNING
+        if max(ema_values) > 0.75 and not session.get('warning_sent', False):
+            session['warning_sent'] = True 
+
+            # Hanya diantrikan; latensi kirim ke Telegram tercatat di /metrics (vib_notify_seconds)
+            # Key per sesi: notifier ada di tiap proses worker, peringatan sesi lama di proses
+            # mana pun tidak menahan peringatan pertama sesi baru
+            notifier.send_message(chat_id, "⚠️ **BAHAYA DETECTED!**", parse_mode='Markdown',
+                                  coalesce=f"danger:{session.get('session_id', session['start_time'])}")
+
+            # PENCETAKAN LOG KHUSUS SAAT ADA BAHAYA  
+            print(f"\n[LATENCY TEST - DANGER DETECTED]")
+            print(f" > AI Inference Time : {ai_latency:.6f} s")
+            print(f" > Telegram          : diantrikan (antrian {notifier.stats()['depth']})")
+
+        # CETAK LOG (sampel 1 dari LOG_SAMPLE_EVERY batch; agregatnya di /metrics)
+        if debug:
+            print(f"[5. LATENSI AI] Waktu Komputasi Internal: {ai_latency:.4f} detik ({len(windows)} window)")
+
+    # [6] STOPWATCH TOTAL STOP (dihitung sejak request diterima, termasuk antri)
+    total_latency = time.time() - job['received_at']
+    PIPELINE_SECONDS.observe(total_latency)
+    if debug:
+        print(f"[6. LATENSI TOTAL] Total Waktu Eksekusi Server: {total_latency:.4f} detik (antri + proses)")
+
+def export_session_csv(session):
+    # Flush rekaman biner lalu konversi ke CSV ';' format lama
+    recording_writer.flush(session['rec_path_raw'])
+    return export_csv(session['rec_path_raw'], session['csv_path_raw'])
+
+def finalize_session(chat_id, session):
+    try:
+        recording_writer.close(session['csv_path_report'])
+        recording_writer.close(session['rec_path_raw'])
+        export_csv(session['rec_path_raw'], session['csv_path_raw'])
+
+        with stage_timer.measure('report'):
+            report_txt, chart = generate_final_report(session)
+
+        # Kirim-kirim Telegram (diantrikan, urutan per chat tetap: grafik -> laporan -> data mentah)
+        if chart:
+            notifier.send_photo(chat_id, chart.getvalue(), caption=report_txt, parse_mode='Markdown')
+        else:
+            notifier.send_message(chat_id, report_txt, parse_mode='Markdown')
+        notifier.send_document(chat_id, session['csv_path_report'], caption="📄 Laporan User")
+        notifier.send_document(chat_id, session['csv_path_raw'], caption="💾 Data Mentah")
+    except Exception as e:
+        print(f"[ERROR FINALIZE] {e}")
+
+    # Catat ke katalog riwayat (statistik + kolom skor per bucket dari tier grafik)
+    try:
+        with stage_timer.measure('catalog'):
+            recording_catalog.add_session(session)
+    except Exception as e:
+        print(f"[ERROR CATALOG] {e}")
+
+pipeline_queue = KeyedWorkQueue(process_device_chunk, maxsize=QUEUE_MAXSIZE, workers=PIPELINE_WORKERS)
+
+def enqueue_chunk(device_id, meta, raw_chunk, received_at, debug=False):
+    # Routing O(1): device id -> sesi yang sedang merekam device tersebut, lalu masuk
+    # antrian device. Return chat_id (None = tidak ada sesi). Raise QueueFull.
+    session_store.touch_device(device_id, len(raw_chunk))
+    chat_id = session_store.chat_for_device(device_id)
+    if chat_id is None:
+        return None
+    job = {'chunk': raw_chunk, 'meta': meta, 'received_at': received_at, 'debug': debug}
+    if not session_store.shared:
+        pipeline_queue.put(device_id, job)
+        return chat_id
+
+    # Banyak worker: antrian lokal hanya menjamin urutan di dalam satu proses, jadi chunk
+    # masuk antrian bersama (tabel SQLite, urut masuk) dan job lokal cukup membangunkan
+    # worker thread proses ini. Batas antrian berlaku untuk total semua worker.
+    if session_store.pending_chunks() >= QUEUE_MAXSIZE:
+        pipeline_queue.rejected += 1
+        raise QueueFull(pipeline_queue.retry_after())
+    chunk_id = session_store.push_chunk(device_id, job)
+    try:
+        pipeline_queue.put(device_id, None)
+    except QueueFull:
+        # Batalkan, kecuali chunk sudah keburu diambil worker lain (berarti tetap diproses)
+        if session_store.discard_chunk(chunk_id):
+            raise
+    return chat_id
+
 @app.route('/raw_data', methods=['POST'])
 def receive_data():
     # [1] STOPWATCH TOTAL START 
     start_total_pipeline = time.time()  
 
     try:
-        # --- PENGAMAN 1: Pengecekan validitas data JSON ---
-        # silent=True agar program tidak langsung Error 400 kalau datanya rusak, tapi return None
-        content = request.get_json(silent=True) 
-        
-        if not content:
-            # Jika data kosong/rusak, di return 400 tapi print alasan biar jelas
-            print("[WARNING] Terima data kosong/corrupt. Skip.")
-            return jsonify({"status": "error", "msg": "Bad JSON"}), 400
+        # --- Content-Encoding: gzip / deflate (opsional) ---
+        start_decode = time.perf_counter()
+        try:
+            body = decode_content_encoding(request.get_data(cache=False), request.content_encoding)
+        except ValueError as e:
+            print(f"[WARNING] Body terkompresi tidak valid: {e}. Skip.")
+            REQUESTS.labels("bad_request").inc()
+            return jsonify({"status": "error", "msg": "Bad encoding"}), 400
+
+        # --- FORMAT BINER (frame VIB1, lihat ingest_codec.py) ---
+        # Body langsung di-decode jadi array (N,3) pakai np.frombuffer, tanpa parsing JSON
+        if is_binary_content_type(request.content_type):
+            try:
+                meta, raw_chunk = decode_frames(body)
+            except ValueError as e:
+                print(f"[WARNING] Frame biner rusak: {e}. Skip.")
+                REQUESTS.labels("bad_request").inc()
+                return jsonify({"status": "error", "msg": "Bad frame"}), 400
+        else:
+            # --- PENGAMAN 1: Pengecekan validitas data JSON ---
+            # JSON rusak tidak langsung Error 500, tapi jadi None
+            try:
+                content = json.loads(body)
+            except ValueError:
+                content = None
             
-        # --- PENGAMAN 2: Pengecekan kunci data  ---
-        if 'data' not in content:
-            print("[WARNING] JSON valid tapi tidak ada key 'data'.")
-            return jsonify({"status": "error", "msg": "No data key"}), 400
+            if not content:
+                # Jika data kosong/rusak, di return 400 tapi print alasan biar jelas
+                print("[WARNING] Terima data kosong/corrupt. Skip.")
+                REQUESTS.labels("bad_request").inc()
+                return jsonify({"status": "error", "msg": "Bad JSON"}), 400
+                
+            # --- PENGAMAN 2: Pengecekan kunci data  ---
+            if 'data' not in content:
+                print("[WARNING] JSON valid tapi tidak ada key 'data'.")
+                REQUESTS.labels("bad_request").inc()
+                return jsonify({"status": "error", "msg": "No data key"}), 400
 
-        raw_chunk = np.array(content['data']) 
+            try:
+                meta, raw_chunk = decode_json(content)
+            except ValueError as e:
+                print(f"[WARNING] Isi 'data' tidak valid: {e}. Skip.")
+                REQUESTS.labels("bad_request").inc()
+                return jsonify({"status": "error", "msg": "Bad data shape"}), 400
+        stage_timer.observe('decode', time.perf_counter() - start_decode)
         
         # --- PENGAMAN 3: Pengecekan kekosongan isi ---
         if len(raw_chunk) == 0:
+            REQUESTS.labels("empty").inc()
             return jsonify({"status": "ok", "msg": "Empty data skipped"}), 200
 
-        # Log Header ---
-        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] ==========================================")
-        print(f"[1. RECEIVE] Batch Size Diterima: {len(raw_chunk)} baris x 3 kolom (Sumbu X, Y, Z)")
+        SAMPLES_RECEIVED.inc(len(raw_chunk))
+        debug = LOG_SAMPLE_EVERY > 0 and next(_log_counter) % LOG_SAMPLE_EVERY == 0
+
+        # Log Header (sampel) ---
+        if debug:
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] ==========================================")
+            print(f"[1. RECEIVE] Batch Size Diterima: {len(raw_chunk)} baris x 3 kolom (Sumbu X, Y, Z) | format: {meta['format']}")
         # ----------------------------------
 
-        users_done = []
-        
-        # Lock thread biar gak tabrakan saat nulis file 
-        with data_lock:
-            for chat_id, session in active_sessions.items():
-                elapsed = (time.time() - session['start_time']) / 60
-                is_time_up = elapsed >= session['duration']
-                is_force_stop = session.get('is_stopped', False)
-                
-                if is_time_up or is_force_stop:
-                    users_done.append(chat_id)
-                    continue
-                
-                # A. SIMPAN RAW DATA
-                try:
-                    with open(session['csv_path_raw'], 'a', newline='') as f:
-                        writer = csv.writer(f, delimiter=';')
-                        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                        for row in raw_chunk:
-                            # Dipastikan row memiliki 3 elemen (x,y,z)
-                            if len(row) >= 3:
-                                x_str = f"{row[0]:.4f}"; y_str = f"{row[1]:.4f}"; z_str = f"{row[2]:.4f}"
-                                writer.writerow([now_str, x_str, y_str, z_str])
-                except Exception as e:
-                    print(f"[ERROR WRITE CSV] {e}")
-
-                # B. BUFFER & PREDICT
-                session['raw_buffer'].extend(raw_chunk)
-                if len(session['raw_buffer']) >= 256:
-                    window = np.array(session['raw_buffer'][:256])
-                    session['raw_buffer'] = session['raw_buffer'][128:] 
-
-                    # [2] STOPWATCH AI START 
-                    start_ai_inference = time.time()
-                    
-                    res_label, raw_score = predict_chunk(window)
-
-                    # [3] STOPWATCH AI STOP (Selesai mikir)
-                    end_ai_inference = time.time()   
-                    ai_latency = end_ai_inference - start_ai_inference # Perhitungan Latensi AI
-
-                    session['predictions'].append(res_label)
-                    
-                    # C. EMA
-                    ALPHA = 0.15
-                    prev_ema = session['ema_condition']
-                    current_ema = (raw_score * ALPHA) + (prev_ema * (1.0 - ALPHA))
-                    session['ema_condition'] = current_ema
-
-                    # D. REPORT USER
-                    session['history_scores'].append(current_ema * 100)
-                    session['history_times'].append(elapsed)
-
-                    try:
-                        with open(session['csv_path_report'], 'a', newline='') as f:
-                            writer = csv.writer(f, delimiter=';')
-                            jam = datetime.now().strftime('%H:%M:%S')
-                            writer.writerow([jam, f"{current_ema * 100:.1f}%", res_label.upper()])
-                    except Exception as e:
-                        print(f"[ERROR REPORT] {e}")
-                    
-                    # E. WARNING
-                    if current_ema > 0.75 and not session.get('warning_sent', False):
-                        session['warning_sent'] = True 
-                        import requests
-
-                        # [4] STOPWATCH TELEGRAM START
-                        start_tele = time.time()  
-                           
-                        try:
-                            requests.post(
-                                f"https://api.telegram.org/bot{TOKEN}/sendMessage", 
-                                data={'chat_id': chat_id, 'text': "⚠️ **BAHAYA DETECTED!**", 'parse_mode': 'Markdown'},
-                                timeout=5 # Timeout agar server terus aktif 
-                            )
-                        except: pass
-
-                        # [5] STOPWATCH TELEGRAM STOP
-                        end_tele = time.time() 
-                        tele_latency = end_tele - start_tele # <--- PERHITUNGAN LATENSI TELEGRAM
-                        
-                        # PENCETAKAN LOG KHUSUS SAAT ADA BAHAYA  
-                        print(f"\n[LATENCY TEST - DANGER DETECTED]")
-                        print(f" > AI Inference Time : {ai_latency:.6f} s")
-                        print(f" > Telegram API Delay: {tele_latency:.6f} s")
-                        
-                    # CETAK LOG REGULER (Setiap kali prediksi jalan)
-                    # Agar Log Server dipennuhi data valid
-                    print(f"[5. LATENSI AI] Waktu Komputasi Internal: {ai_latency:.4f} detik")
-        
-        # Handle Selesai (Di luar lock agar data masuk tidak ter-block)
-        for chat_id in users_done:
-            session = active_sessions.pop(chat_id)
-            try:
-                report_txt, chart = generate_final_report(session)
-                import requests
-                
-                # Kirim-kirim Telegram
-                if chart:
-                    requests.post(f"https://api.telegram.org/bot{TOKEN}/sendPhoto", 
-                        files={'photo': chart}, data={'chat_id': chat_id, 'caption': report_txt, 'parse_mode': 'Markdown'})
-                
-                with open(session['csv_path_report'], 'rb') as f:
-                    requests.post(f"https://api.telegram.org/bot{TOKEN}/sendDocument", 
-                        data={'chat_id': chat_id, 'caption': "📄 Laporan User"}, files={'document': f})
-
-                with open(session['csv_path_raw'], 'rb') as f:
-                    requests.post(f"https://api.telegram.org/bot{TOKEN}/sendDocument", 
-                        data={'chat_id': chat_id, 'caption': "💾 Data Mentah"}, files={'document': f})
-            except Exception as e:
-                print(f"[ERROR FINALIZE] {e}")
-
-        # [6] STOPWATCH TOTAL STOP (Semua proses selesai)
-        end_total_pipeline = time.time() 
-        total_latency = end_total_pipeline - start_total_pipeline # <--- HITUNG TOTAL
-        
-        print(f"[6. LATENSI TOTAL] Total Waktu Eksekusi Server: {total_latency:.4f} detik")    
-        print("=======================================================================\n")
-        
-        return jsonify({"status": "ok"}), 200
+        # Tahap ingest: cukup masukkan ke antrian device lalu langsung balas ke ESP32.
+        # Penulisan CSV, FFT, AI, EMA, Telegram & laporan dikerjakan worker.
+        device_id = normalize_device_id(request.headers.get('X-Device-Id') or meta.get('device_id'))
+        try:
+            chat_id = enqueue_chunk(device_id, meta, raw_chunk, start_total_pipeline, debug)
+        except QueueFull as e:
+            print(f"[WARNING] Antrian pipeline penuh, tolak batch (Retry-After {e.retry_after}s).")
+            REQUESTS.labels("busy").inc()
+            resp = jsonify({"status": "busy", "msg": "Queue full", "retry_after": e.retry_after})
+            return resp, 429, {'Retry-After': str(e.retry_after)}
+        if chat_id is None:
+            REQUESTS.labels("no_session").inc()
+            return jsonify({"status": "ok", "device_id": device_id, "queued": 0}), 200
+
+        ack_latency = time.time() - start_total_pipeline
+        INGEST_ACK_SECONDS.observe(ack_latency)
+        REQUESTS.labels("ok").inc()
+        if debug:
+            print(f"[1. RECEIVE] Masuk antrian device {device_id} ({ack_latency * 1000:.2f} ms)")
+
+        return jsonify({"status": "ok", "device_id": device_id, "queued": 1}), 200
 
     except Exception as e:
         # Print error lengkap agar dapat diketahui kenapa 500
         import traceback
         traceback.print_exc() 
+        REQUESTS.labels("error").inc()
         return jsonify({"status": "error", "details": str(e)}), 500
 
+@app.route('/stream', methods=['POST'])
+def receive_stream():
+    # Satu koneksi HTTP panjang (Transfer-Encoding: chunked) berisi frame VIB1 berurutan.
+    # Tiap frame langsung masuk pipeline begitu lengkap, jadi ESP32 tidak perlu buka
+    # koneksi/TLS baru per batch. Balasan (ringkasan) baru dikirim saat stream ditutup.
+    # Antrian penuh -> server berhenti membaca sebentar (backpressure TCP ke ESP32).
+    if (request.content_encoding or 'identity').lower() != 'identity':
+        # Frame dibaca tepat per ukuran frame; body terkompresi tidak bisa dibaca begitu
+        return jsonify({"status": "error", "msg": "Content-Encoding tidak didukung di /stream"}), 415
+
+    header_device = request.headers.get('X-Device-Id')
+    stream = request.stream
+    counts = {'frames': 0, 'samples': 0, 'queued': 0, 'no_session': 0, 'dropped': 0}
+    OPEN_STREAMS.inc()
+    try:
+        while True:
+            try:
+                frame = read_frame(stream)
+            except ValueError as e:
+                print(f"[WARNING] Stream frame rusak: {e}. Koneksi ditutup.")
+                STREAM_FRAMES.labels("bad_frame").inc()
+                return jsonify({"status": "error", "msg": "Bad frame", **counts}), 400
+            if frame is None:
+                break
+            received_at = time.time()
+            meta, raw_chunk = frame
+            counts['frames'] += 1
+            if len(raw_chunk) == 0:
+                continue
+            counts['samples'] += len(raw_chunk)
+            SAMPLES_RECEIVED.inc(len(raw_chunk))
+            debug = LOG_SAMPLE_EVERY > 0 and next(_log_counter) % LOG_SAMPLE_EVERY == 0
+
+            device_id = normalize_device_id(header_device or meta.get('device_id'))
+            deadline = time.monotonic() + STREAM_MAX_WAIT
+            while True:
+                try:
+                    chat_id = enqueue_chunk(device_id, meta, raw_chunk, received_at, debug)
+                    status = 'queued' if chat_id is not None else 'no_session'
+                    break
+                except QueueFull as e:
+                    if time.monotonic() >= deadline:
+                        print(f"[WARNING] Antrian penuh > {STREAM_MAX_WAIT}s, frame stream device {device_id} dibuang.")
+                        status = 'dropped'
+                        break
+                    time.sleep(min(e.retry_after, 0.1))
+            counts[status] += 1
+            STREAM_FRAMES.labels(status).inc()
+            if debug:
+                print(f"[1. RECEIVE] Stream device {device_id}: frame {meta['seq']} ({len(raw_chunk)} baris) -> {status}")
+        return jsonify({"status": "ok", **counts}), 200
+    finally:
+        OPEN_STREAMS.dec()
+
 # ================================= MAIN  ===========================================
 
 def run_flask():
@@ -499,17 +1042,24 @@ def run_flask():
     app.run(host='0.0.0.0', port=port)
 
 def run_telegram():
-    app_bot = Application.builder().token(TOKEN).build()
+    from telegram.ext import Application, CommandHandler, CallbackQueryHandler
+    app_bot = Application.builder().token(TOKEN).base_url(f"{TELEGRAM_API_URL}/bot").build()
     app_bot.add_handler(CommandHandler("start", start))
+    app_bot.add_handler(CommandHandler("device", device_command))
+    app_bot.add_handler(CommandHandler("riwayat", history_command))
     app_bot.add_handler(CallbackQueryHandler(button_handler))
     print("Bot Polling...")
     app_bot.run_polling()
 
 if __name__ == '__main__':
-    load_model()
+    # HTTP dulu (ingest & /status langsung siap), model & proses render menyusul di background
     t = threading.Thread(target=run_flask)
     t.start()
+    start_background_init()
     if TOKEN: run_telegram()
-    else: print("TOKEN KOSONG!")
+    else:
+        print("TOKEN KOSONG!")
+        # Thread utama tetap hidup: executor (render) menolak tugas baru setelah thread utama selesai
+        t.join()
 
 
@@ -0,0 +1,213 @@
+import numpy as np
+
+
+# ================================= RIWAYAT SKOR SESI (MEMORI TETAP) ===========================================
+# Pengganti list `history_scores` / `history_times` / `predictions` yang tumbuh terus
+# selama sesi. Per window yang diprediksi hanya disimpan:
+#
+#   - statistik berjalan : jumlah window, total & puncak skor, skor terakhir  -> O(1)
+#   - histogram label    : jumlah window per label prediksi Random Forest      -> O(1)
+#   - tier grafik        : rata-rata skor per bucket waktu, beberapa resolusi
+#
+# Tier default:
+#   per detik : ring 3600 bucket (1 jam terakhir), grafik sesi pendek tetap detail
+#   per menit : 1440 bucket; kalau penuh, tiap 2 bucket digabung (lebar jadi 2x),
+#               jadi selalu mencakup seluruh sesi berapa pun lamanya
+#
+# Laporan akhir & tombol status hanya membaca statistik; grafik memakai tier paling
+# halus yang masih mencakup seluruh sesi. Memori per sesi tetap, tidak bergantung durasi.
+# Di session store bersama (pickle) hanya bucket yang terisi yang ikut disimpan.
+
+# (lebar bucket dalam detik, jumlah bucket, gabung saat penuh)
+HISTORY_TIERS = ((1, 3600, False), (60, 1440, True))
+
+
+class _Tier:
+    def __init__(self, width_s, capacity, compact=False):
+        if compact and capacity % 2:
+            raise ValueError("Kapasitas tier yang digabung harus genap")
+        self.width_s = width_s
+        self.capacity = capacity
+        self.compact = compact
+        self.first = None   # bucket pertama sesi
+        self.newest = -1    # bucket terbaru
+        self.ids = None     # array dibuat saat data pertama masuk
+
+    _ARRAYS = ('ids', 't_sum', 's_sum', 's_max', 'count')
+
+    def __getstate__(self):
+        # Pickle hanya bucket yang masih terisi (urut waktu), bukan seluruh kapasitas:
+        # sesi 5 menit = 300 bucket, sesi panjang maksimal `capacity` bucket
+        state = self.__dict__.copy()
+        if self.first is not None:
+            slots = self._slots()
+            for name in self._ARRAYS:
+                state[name] = getattr(self, name)[slots]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.first is None:
+            return
+        packed = {name: state[name] for name in self._ARRAYS}
+        self._alloc()
+        slots = packed['ids'] % self.capacity
+        for name in self._ARRAYS:
+            getattr(self, name)[slots] = packed[name]
+
+    def _alloc(self):
+        c = self.capacity
+        self.ids = np.full(c, -1, dtype=np.int64)
+        self.t_sum = np.zeros(c)
+        self.s_sum = np.zeros(c)
+        self.s_max = np.zeros(c)
+        self.count = np.zeros(c, dtype=np.int64)
+
+    def _bucket(self, times_min):
+        # Sama persis dengan `t * 60.0 // width_s` di add_chunk
+        return np.floor_divide(np.asarray(times_min, dtype=float) * 60.0, self.width_s).astype(np.int64)
+
+    def _halve(self):
+        # Gabung bucket 2i & 2i+1 -> bucket i (hanya tier compact, yang tidak pernah berputar)
+        half = self.capacity // 2
+        for name, reduce in (('t_sum', np.add), ('s_sum', np.add), ('count', np.add), ('s_max', np.maximum)):
+            arr = getattr(self, name)
+            arr[:half] = reduce.reduce(arr.reshape(half, 2), axis=1)
+            arr[half:] = 0
+        self.ids[:] = -1
+        self.ids[:half][self.count[:half] > 0] = np.flatnonzero(self.count[:half] > 0)
+        self.width_s *= 2
+        self.first //= 2
+        self.newest //= 2
+
+    def _prepare(self, last_t):
+        if self.ids is None:
+            self._alloc()
+        if self.compact:
+            while int(last_t * 60.0 // self.width_s) >= self.capacity:
+                self._halve()
+
+    def _add_bucket(self, b, t_sum, s_sum, s_max, n):
+        if self.first is None:
+            self.first = b
+        slot = b % self.capacity
+        if self.ids[slot] != b:
+            # Slot berisi bucket lama (ring berputar) -> timpa
+            self.ids[slot] = b
+            self.t_sum[slot] = self.s_sum[slot] = 0.0
+            self.s_max[slot] = s_max
+            self.count[slot] = 0
+        self.t_sum[slot] += t_sum
+        self.s_sum[slot] += s_sum
+        self.s_max[slot] = max(self.s_max[slot], s_max)
+        self.count[slot] += n
+        self.newest = max(self.newest, b)
+
+    def add_chunk(self, t, s_sum, s_max, n):
+        # Jalur server: semua window satu chunk punya waktu yang sama
+        self._prepare(t)
+        self._add_bucket(int(t * 60.0 // self.width_s), t * n, s_sum, s_max, n)
+
+    def add(self, times_min, scores):
+        # Banyak titik sekaligus (diagnosa ulang batch); waktu harus urut naik
+        self._prepare(times_min[-1])
+        buckets = self._bucket(times_min)
+        starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+        t_sums = np.add.reduceat(times_min, starts)
+        s_sums = np.add.reduceat(scores, starts)
+        s_maxs = np.maximum.reduceat(scores, starts)
+        counts = np.diff(np.append(starts, len(buckets)))
+        for b, t_sum, s_sum, s_max, n in zip(buckets[starts].tolist(), t_sums, s_sums, s_maxs, counts):
+            self._add_bucket(b, t_sum, s_sum, s_max, n)
+
+    def covers_session(self):
+        return self.first is not None and self.newest - self.first < self.capacity
+
+    def _slots(self):
+        # Slot bucket yang masih terisi, urut waktu
+        ids = np.arange(max(self.first, self.newest - self.capacity + 1), self.newest + 1)
+        slots = ids % self.capacity
+        return slots[(self.ids[slots] == ids) & (self.count[slots] > 0)]
+
+    def series(self, peak=False):
+        # (waktu rata-rata bucket dalam menit, skor rata-rata / puncak bucket), urut waktu
+        if self.first is None:
+            return np.empty(0), np.empty(0)
+        slots = self._slots()
+        n = self.count[slots]
+        return self.t_sum[slots] / n, (self.s_max[slots] if peak else self.s_sum[slots] / n)
+
+    def columns(self):
+        # (waktu rata-rata, skor rata-rata, skor puncak, jumlah window) per bucket, urut waktu
+        if self.first is None:
+            return np.empty(0), np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+        slots = self._slots()
+        n = self.count[slots]
+        return self.t_sum[slots] / n, self.s_sum[slots] / n, self.s_max[slots].copy(), n
+
+
+class SessionHistory:
+    def __init__(self, tiers=HISTORY_TIERS):
+        self.tier_spec = tuple(tiers)
+        self.count = 0
+        self.total = 0.0
+        self.peak = 0.0
+        self.last = 0.0
+        self.label_counts = {}
+        self.tiers = [_Tier(*spec) for spec in self.tier_spec]
+
+    def __len__(self):
+        return self.count
+
+    def append(self, elapsed, scores, labels=None):
+        # Satu panggilan per chunk: semua window chunk ini tercatat di waktu `elapsed`
+        # (menit sejak mulai sesi), skor 0-100
+        n = len(scores)
+        if not n:
+            return
+        elapsed = float(elapsed)
+        chunk_sum = float(sum(scores))
+        chunk_peak = float(max(scores))
+        self.peak = chunk_peak if self.count == 0 else max(self.peak, chunk_peak)
+        self.count += n
+        self.total += chunk_sum
+        self.last = float(scores[-1])
+        if labels is not None:
+            for label in labels:
+                label = str(label)
+                self.label_counts[label] = self.label_counts.get(label, 0) + 1
+        for tier in self.tiers:
+            tier.add_chunk(elapsed, chunk_sum, chunk_peak, n)
+
+    def add_to_tiers(self, times_min, scores):
+        # Hanya tier grafik (statistik diisi pemanggil), dipakai diagnosa ulang batch
+        if not len(scores):
+            return
+        times_min = np.asarray(times_min, dtype=float)
+        scores = np.asarray(scores, dtype=float)
+        for tier in self.tiers:
+            tier.add(times_min, scores)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def label_shares(self):
+        # [(label, persen)] urut dari yang paling sering
+        return [(label, n * 100.0 / self.count)
+                for label, n in sorted(self.label_counts.items(), key=lambda item: -item[1])]
+
+    def series(self, peak=False):
+        # Deret untuk grafik tren: tier paling halus yang mencakup seluruh sesi
+        # (tier terakhir selalu mencakup karena digabung saat penuh)
+        for tier in self.tiers:
+            if tier.covers_session():
+                return tier.series(peak)
+        return self.tiers[-1].series(peak)
+
+    def columns(self):
+        # Sama dengan series(), lengkap dengan puncak & jumlah window per bucket (katalog rekaman)
+        for tier in self.tiers:
+            if tier.covers_session():
+                return tier.columns()
+        return self.tiers[-1].columns()
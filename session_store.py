@@ -0,0 +1,347 @@
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: hanya MemorySessionStore
+    fcntl = None
+
+
+# ================================= PENYIMPANAN SESI (SATU PROSES / BANYAK WORKER) ===========================================
+# Semua akses sesi rekaman (buat, cari per device, proses chunk, stop, hapus) lewat
+# objek store, supaya server bisa jalan sebagai satu proses maupun banyak worker gunicorn.
+#
+#   memory : dict di memori proses (default, `python server.py`). Sesi = dict hidup.
+#   sqlite : satu file SQLite (WAL) yang dipakai bersama semua worker + proses bot.
+#            Sesi disimpan sebagai pickle (ring buffer hanya sisa sampel < window,
+#            lihat RingBuffer.__getstate__; SessionHistory hanya statistik + bucket tier
+#            yang terisi), jadi ukuran state per sesi tetap berapa pun durasinya.
+#
+# Lock per device: threading.Lock (memory) atau Lock + flock file per device (sqlite),
+# jadi chunk satu device tetap diproses berurutan walau masuk ke worker berbeda.
+#
+# sqlite juga menyimpan antrian chunk bersama (tabel chunks, urut rowid): request
+# hanya INSERT lalu membangunkan worker thread di prosesnya; worker yang memegang lock
+# device mengambil SEMUA chunk device itu (take_chunks) dan memprosesnya berurutan.
+
+SEEN_FLUSH_INTERVAL = 1.0  # sqlite: statistik "last seen" device ditulis maksimal 1x/detik per device
+
+
+class MemorySessionStore:
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()  # hanya untuk mengubah isi map
+        self._sessions = {}            # chat_id -> session
+        self._device_chat = {}         # device_id -> chat_id
+        self._device_locks = {}        # device_id -> Lock
+        self._last_seen = {}           # device_id -> (waktu, jumlah sampel total)
+
+    def lock(self, device_id):
+        lock = self._device_locks.get(device_id)
+        if lock is None:
+            with self._lock:
+                lock = self._device_locks.setdefault(device_id, threading.Lock())
+        return lock
+
+    # --- sesi ---
+
+    def add(self, chat_id, session):
+        # False kalau device sedang dipakai sesi chat lain
+        device_id = session['device_id']
+        with self._lock:
+            owner = self._device_chat.get(device_id)
+            if owner is not None and owner != chat_id:
+                return False
+            old = self._sessions.get(chat_id)
+            if old is not None:
+                self._device_chat.pop(old['device_id'], None)
+            self._device_chat[device_id] = chat_id
+        with self.lock(device_id):
+            self._sessions[chat_id] = session
+        return True
+
+    def get(self, chat_id):
+        return self._sessions.get(chat_id)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def sessions(self):
+        return list(self._sessions.values())
+
+    def chat_for_device(self, device_id):
+        # O(1), dipanggil di jalur ingest
+        return self._device_chat.get(device_id)
+
+    @contextmanager
+    def checkout(self, device_id):
+        # Sesi milik device (eksklusif selama blok with). Yield (chat_id, session) / (None, None)
+        with self.lock(device_id):
+            chat_id = self._device_chat.get(device_id)
+            yield chat_id, (self._sessions.get(chat_id) if chat_id is not None else None)
+
+    def remove(self, chat_id):
+        with self._lock:
+            session = self._sessions.pop(chat_id, None)
+            if session is not None and self._device_chat.get(session['device_id']) == chat_id:
+                del self._device_chat[session['device_id']]
+
+    def update(self, chat_id, **fields):
+        session = self._sessions.get(chat_id)
+        if session is None:
+            return False
+        session.update(fields)
+        return True
+
+    # --- statistik device ---
+
+    def touch_device(self, device_id, n_samples=0):
+        _, total = self._last_seen.get(device_id, (0.0, 0))
+        self._last_seen[device_id] = (time.time(), total + n_samples)
+
+    def devices(self):
+        now = time.time()
+        return {
+            device_id: {
+                'last_seen_s': round(now - seen, 1),
+                'samples': total,
+                'session_chat': self._device_chat.get(device_id),
+            }
+            for device_id, (seen, total) in list(self._last_seen.items())
+        }
+
+
+class _DeviceLock:
+    # Lock antar thread (di proses ini) + flock file (antar proses worker)
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._pid != os.getpid():
+                # fd hasil fork berbagi flock dengan proses induk, jadi buka ulang per proses
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    chat_id INTEGER PRIMARY KEY,
+    device_id TEXT NOT NULL UNIQUE,
+    state BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id TEXT NOT NULL,
+    job BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_device ON chunks (device_id, id);
+CREATE TABLE IF NOT EXISTS devices (
+    device_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL,
+    samples INTEGER NOT NULL
+);
+"""
+
+class SqliteSessionStore:
+    shared = True
+
+    def __init__(self, path, lock_dir=None):
+        if fcntl is None:
+            raise RuntimeError("SqliteSessionStore butuh fcntl (Linux/macOS)")
+        self.path = path
+        self.lock_dir = lock_dir or path + ".locks"
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._local = threading.local()  # koneksi per thread per proses
+        self._guard = threading.Lock()
+        self._device_locks = {}
+        self._seen = {}                  # device_id -> [last_seen, sampel belum ditulis, waktu tulis]
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def lock(self, device_id):
+        lock = self._device_locks.get(device_id)
+        if lock is None:
+            with self._guard:
+                lock = self._device_locks.setdefault(
+                    device_id, _DeviceLock(os.path.join(self.lock_dir, f"{device_id}.lock")))
+        return lock
+
+    @staticmethod
+    def _dumps(session):
+        return pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(blob):
+        return pickle.loads(blob)
+
+    def _save(self, chat_id, session):
+        # UPDATE saja: kalau sesi sudah di-remove, tidak ada baris yang ditulis
+        self._conn().execute("UPDATE sessions SET state = ?, updated_at = ? WHERE chat_id = ?",
+                             (self._dumps(session), time.time(), chat_id))
+
+    # --- sesi ---
+
+    def add(self, chat_id, session):
+        device_id = session['device_id']
+        with self.lock(device_id):
+            owner = self.chat_for_device(device_id)
+            if owner is not None and owner != chat_id:
+                return False
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
+                conn.execute("INSERT INTO sessions (chat_id, device_id, state, updated_at) VALUES (?, ?, ?, ?)",
+                             (chat_id, device_id, self._dumps(session), time.time()))
+                conn.execute("COMMIT")
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK")
+                return False
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def get(self, chat_id):
+        # Salinan (read-only) sesi, untuk bot: status, snapshot, export
+        row = self._conn().execute("SELECT state FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+        return self._loads(row[0]) if row else None
+
+    def __contains__(self, chat_id):
+        return self._conn().execute("SELECT 1 FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def sessions(self):
+        return [self._loads(row[0]) for row in self._conn().execute("SELECT state FROM sessions")]
+
+    def chat_for_device(self, device_id):
+        row = self._conn().execute("SELECT chat_id FROM sessions WHERE device_id = ?", (device_id,)).fetchone()
+        return row[0] if row else None
+
+    @contextmanager
+    def checkout(self, device_id):
+        with self.lock(device_id):
+            row = self._conn().execute("SELECT chat_id, state FROM sessions WHERE device_id = ?",
+                                       (device_id,)).fetchone()
+            if row is None:
+                yield None, None
+                return
+            chat_id, session = row[0], self._loads(row[1])
+            try:
+                yield chat_id, session
+            finally:
+                self._save(chat_id, session)
+
+    def remove(self, chat_id):
+        self._conn().execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
+
+    def update(self, chat_id, **fields):
+        device_id = self._conn().execute("SELECT device_id FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+        if device_id is None:
+            return False
+        with self.checkout(device_id[0]) as (owner, session):
+            if owner != chat_id:
+                return False
+            session.update(fields)
+        return True
+
+    # --- antrian chunk bersama (semua worker) ---
+
+    def push_chunk(self, device_id, job):
+        # Return id baris (untuk discard_chunk kalau job lokal gagal diantrikan)
+        blob = pickle.dumps(job, protocol=pickle.HIGHEST_PROTOCOL)
+        return self._conn().execute("INSERT INTO chunks (device_id, job) VALUES (?, ?)",
+                                    (device_id, blob)).lastrowid
+
+    def take_chunks(self, device_id):
+        # Dipanggil sambil memegang lock device: ambil & hapus semua chunk device, urut masuk
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT id, job FROM chunks WHERE device_id = ? ORDER BY id",
+                                (device_id,)).fetchall()
+            if rows:
+                conn.execute("DELETE FROM chunks WHERE device_id = ? AND id <= ?", (device_id, rows[-1][0]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [pickle.loads(blob) for _, blob in rows]
+
+    def discard_chunk(self, chunk_id):
+        # False kalau chunk sudah diambil worker lain
+        return self._conn().execute("DELETE FROM chunks WHERE id = ?", (chunk_id,)).rowcount > 0
+
+    def pending_chunks(self):
+        return self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # --- statistik device ---
+
+    def touch_device(self, device_id, n_samples=0):
+        now = time.time()
+        with self._guard:
+            entry = self._seen.setdefault(device_id, [now, 0, 0.0])
+            entry[0] = now
+            entry[1] += n_samples
+            if now - entry[2] < SEEN_FLUSH_INTERVAL:
+                return
+            pending, entry[1], entry[2] = entry[1], 0, now
+        self._conn().execute(
+            "INSERT INTO devices (device_id, last_seen, samples) VALUES (?, ?, ?) "
+            "ON CONFLICT(device_id) DO UPDATE SET last_seen = excluded.last_seen, "
+            "samples = samples + excluded.samples",
+            (device_id, now, pending))
+
+    def devices(self):
+        now = time.time()
+        owners = dict(self._conn().execute("SELECT device_id, chat_id FROM sessions"))
+        return {
+            device_id: {
+                'last_seen_s': round(now - seen, 1),
+                'samples': total,
+                'session_chat': owners.get(device_id),
+            }
+            for device_id, seen, total in self._conn().execute("SELECT device_id, last_seen, samples FROM devices")
+        }
+
+
+def open_session_store(kind="memory", path="sessions.db"):
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SqliteSessionStore(path)
+    raise ValueError(f"SESSION_STORE tidak dikenal: {kind} (pilih memory / sqlite)")
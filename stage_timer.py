@@ -0,0 +1,67 @@
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+
+# ================================= STOPWATCH PER TAHAP PIPELINE ===========================================
+# Dipasang di tiap tahap (decode, fitur, PCA, RF, I/O, notifikasi, laporan).
+# Tiap durasi masuk ke histogram bucket tetap (metrics.py, untuk /metrics);
+# durasi mentah baru disimpan kalau recording dinyalakan (dipakai replay.py
+# untuk hitung persentil).
+
+STAGES = ('decode', 'io_raw', 'features', 'pca', 'rf', 'io_report', 'notify', 'report')
+
+
+class StageTimer:
+    def __init__(self, histogram=None):
+        # histogram: metrics.Histogram dengan satu label `stage`
+        self.histogram = histogram
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.recording = False
+
+    @contextmanager
+    def measure(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def observe(self, stage, seconds):
+        if self.histogram is not None:
+            self.histogram.labels(stage).observe(seconds)
+        if self.recording:
+            with self._lock:
+                self._samples.setdefault(stage, []).append(seconds)
+
+    def start_recording(self):
+        with self._lock:
+            self._samples = {}
+            self.recording = True
+
+    def stop_recording(self):
+        self.recording = False
+        with self._lock:
+            samples, self._samples = self._samples, {}
+        return samples
+
+
+def summarize(samples):
+    # {stage: [detik, ...]} -> persentil dalam milidetik
+    out = {}
+    for stage, values in samples.items():
+        if not values:
+            continue
+        ms = np.asarray(values) * 1000
+        out[stage] = {
+            'count': len(ms),
+            'mean_ms': round(float(ms.mean()), 4),
+            'p50_ms': round(float(np.percentile(ms, 50)), 4),
+            'p90_ms': round(float(np.percentile(ms, 90)), 4),
+            'p99_ms': round(float(np.percentile(ms, 99)), 4),
+            'max_ms': round(float(ms.max()), 4),
+            'total_s': round(float(ms.sum()) / 1000, 4),
+        }
+    return out
@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+# ================================= STARTUP BERTAHAP (INGEST DULU, SISANYA DI BACKGROUND) ===========================================
+# Import server.py hanya memuat yang dibutuhkan jalur ingest & /status (Flask, NumPy, codec,
+# antrian). Yang berat disiapkan belakangan:
+#
+#   - model   : scipy.fft (rencana FFT) + load/validasi/warm-up model, di thread background
+#   - charts  : proses render matplotlib (rendering.py), di thread background
+#   - telegram: python-telegram-bot baru di-import saat bot dijalankan (run_telegram)
+#   - pandas tidak dipakai lagi; joblib / sklearn baru di-import kalau model .pkl dimuat
+#
+# Selama model belum siap, /raw_data tetap dibalas (chunk masuk antrian); worker yang perlu
+# memprediksi menunggu langkah 'model' selesai (maksimal MODEL_WAIT_TIMEOUT di server.py).
+# /status melaporkan state tiap langkah (pending / loading / ready / failed) + durasinya.
+
+
+class StartupTracker:
+    def __init__(self):
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._steps = {}   # nama -> {'state', 'started_s', 'seconds', 'error'}
+        self._done = {}    # nama -> Event (set saat langkah selesai, berhasil atau gagal)
+
+    def run(self, name, fn, background=True, after=None):
+        # Jalankan satu langkah startup. fn() return False = gagal (tanpa exception).
+        # after: nama langkah lain yang harus selesai dulu (tidak berebut CPU saat start).
+        # Return Thread (background) atau hasil fn()
+        with self._lock:
+            done = self._done.setdefault(name, threading.Event())
+            done.clear()
+            self._steps[name] = {'state': 'pending', 'started_s': None, 'seconds': None, 'error': None}
+
+        def step():
+            if after is not None:
+                self.wait(after)
+            t0 = time.perf_counter()
+            with self._lock:
+                self._steps[name].update(state='loading', started_s=round(t0 - self._t0, 3))
+            state, error, result = 'ready', None, None
+            try:
+                result = fn()
+                if result is False:
+                    state = 'failed'
+            except Exception as e:
+                state, error = 'failed', str(e)
+                print(f"[ERROR STARTUP] {name}: {e}")
+            finally:
+                with self._lock:
+                    self._steps[name].update(state=state, error=error,
+                                             seconds=round(time.perf_counter() - t0, 3))
+                done.set()
+            return result
+
+        if not background:
+            return step()
+        thread = threading.Thread(target=step, name=f"startup-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, name, timeout=None):
+        # True kalau langkah sudah selesai (atau tidak pernah dijalankan di proses ini)
+        done = self._done.get(name)
+        return True if done is None else done.wait(timeout)
+
+    def state(self, name):
+        step = self._steps.get(name)
+        return step['state'] if step is not None else 'pending'
+
+    def info(self):
+        with self._lock:
+            steps = {name: dict(step) for name, step in self._steps.items()}
+        return {'uptime_s': round(time.perf_counter() - self._t0, 3), 'steps': steps}
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+
+
+# ================================= MODEL & SINYAL SINTETIS (BENCHMARK / REPLAY) ===========================================
+# MODEL_SIAP_DEPLOY.pkl tidak ikut di repo. Untuk benchmark & replay, dibuat model dengan struktur
+# yang sama (dict scaler / pca / model) dari sinyal mirip ADXL345 dengan 3 tingkat getaran.
+
+CLASS_AMPLITUDE = {'normal': 0.3, 'rusak_ringan': 1.2, 'rusak_berat': 3.0}
+
+
+def synthetic_signal(n_samples, amplitude=1.0, sample_rate=1600, seed=None):
+    # Gravitasi di Z + harmonik putaran gigi + noise, satuan m/s^2
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / sample_rate
+    signal = rng.normal(0.0, 0.2 * amplitude, size=(n_samples, 3))
+    for freq, gain in ((47.0, 1.0), (94.0, 0.5), (310.0, 0.3)):
+        phase = rng.uniform(0, 2 * np.pi, size=3)
+        signal += amplitude * gain * np.sin(2 * np.pi * freq * t[:, np.newaxis] + phase)
+    signal[:, 2] += 9.81
+    return signal
+
+
+def synthetic_stream(seconds, batch_size=512, sample_rate=1600, amplitude_start=0.3,
+                     amplitude_end=3.0, seed=0):
+    # Generator batch (N,3) untuk replay: amplitudo naik linear dari normal ke rusak berat
+    total = int(seconds * sample_rate)
+    rng = np.random.default_rng(seed)
+    for start in range(0, total, batch_size):
+        n = min(batch_size, total - start)
+        progress = start / max(total - 1, 1)
+        amp = amplitude_start + (amplitude_end - amplitude_start) * progress
+        yield synthetic_signal(n, amp, sample_rate, seed=rng.integers(1 << 31))
+
+
+def make_synthetic_model(n_per_class=200, n_components=20, n_estimators=100, seed=0):
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.decomposition import PCA
+    from sklearn.ensemble import RandomForestClassifier
+    from server import extract_features_batch
+
+    rng = np.random.default_rng(seed)
+    windows, labels = [], []
+    for label, amp in CLASS_AMPLITUDE.items():
+        for _ in range(n_per_class):
+            windows.append(synthetic_signal(256, amp * rng.uniform(0.7, 1.3), seed=rng.integers(1 << 31)))
+            labels.append(label)
+    X = extract_features_batch(np.stack(windows))
+
+    scaler = StandardScaler().fit(X)
+    pca = PCA(n_components=n_components, random_state=seed).fit(scaler.transform(X))
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=seed)
+    model.fit(pca.transform(scaler.transform(X)), labels)
+    return {'scaler': scaler, 'pca': pca, 'model': model}
+
+
+def load_or_make_model(path):
+    import joblib
+
+    if path and os.path.exists(path):
+        print(f"[INFO] Pakai model asli: {path}")
+        return joblib.load(path)
+    print("[INFO] MODEL_SIAP_DEPLOY.pkl tidak ada, pakai model sintetis.")
+    return make_synthetic_model()
@@ -0,0 +1,162 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+# ================================= ANTRIAN KERJA PIPELINE ===========================================
+# Memisahkan HTTP ingest dari inferensi:
+# - put() hanya memasukkan job ke antrian per-key (per sesi) lalu langsung kembali.
+# - Worker thread mengambil job; job dengan key yang sama SELALU diproses berurutan
+#   dan tidak pernah paralel, key berbeda boleh jalan bersamaan.
+# - Total job di antrian dibatasi `maxsize`. Kalau penuh, put() melempar QueueFull
+#   supaya endpoint bisa membalas 429 + Retry-After (backpressure ke ESP32).
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Antrian penuh, coba lagi dalam {retry_after} detik")
+        self.retry_after = retry_after
+
+
+class KeyedWorkQueue:
+    def __init__(self, handler, maxsize=64, workers=2, name="pipeline"):
+        self._handler = handler
+        self.maxsize = maxsize
+        self.workers = workers
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._queues = {}      # key -> deque[(waktu_masuk, item)]
+        self._ready = deque()  # key yang punya job dan tidak sedang diproses
+        self._busy = set()
+        self._depth = 0
+        self._threads = []
+        self._running = False
+
+        # Statistik
+        self.enqueued = 0
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_service = 0.0  # EMA waktu proses per job (detik)
+
+    # --- siklus hidup ---
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"{self.name}-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def join(self, timeout=None):
+        # Tunggu sampai antrian kosong dan tidak ada job yang sedang diproses
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._depth or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # --- ingest ---
+
+    def retry_after(self):
+        # Estimasi kasar waktu antrian kosong, minimal 1 detik
+        backlog = self._depth * max(self.avg_service, 0.01) / max(self.workers, 1)
+        return max(1, math.ceil(backlog))
+
+    def put_many(self, jobs):
+        # Masukkan beberapa job (key, item) sekaligus: semua masuk atau tidak sama sekali
+        if not jobs:
+            return
+        self.start()
+        now = time.monotonic()
+        with self._cond:
+            if self._depth + len(jobs) > self.maxsize:
+                self.rejected += 1
+                raise QueueFull(self.retry_after())
+            for key, item in jobs:
+                q = self._queues.get(key)
+                if q is None:
+                    q = self._queues[key] = deque()
+                if not q and key not in self._busy:
+                    self._ready.append(key)
+                q.append((now, item))
+            self._depth += len(jobs)
+            self.enqueued += len(jobs)
+            self._cond.notify(len(jobs))
+
+    def put(self, key, item):
+        self.put_many([(key, item)])
+
+    # --- worker ---
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                key = self._ready.popleft()
+                enqueued_at, item = self._queues[key].popleft()
+                self._busy.add(key)
+                self._depth -= 1
+
+            start = time.monotonic()
+            lag = start - enqueued_at
+            try:
+                self._handler(key, item)
+            except Exception as e:
+                self.failed += 1
+                print(f"[ERROR WORKER] key={key}: {e}")
+            service = time.monotonic() - start
+
+            with self._cond:
+                self.processed += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self.avg_service = service if self.processed == 1 else 0.9 * self.avg_service + 0.1 * service
+                self._busy.discard(key)
+                if self._queues[key]:
+                    self._ready.append(key)
+                    self._cond.notify()
+                else:
+                    del self._queues[key]
+                self._cond.notify_all()
+
+    # --- monitoring ---
+
+    def stats(self):
+        with self._cond:
+            oldest = min((q[0][0] for q in self._queues.values() if q), default=None)
+            return {
+                'depth': self._depth,
+                'maxsize': self.maxsize,
+                'workers': self.workers,
+                'busy_keys': len(self._busy),
+                'enqueued': self.enqueued,
+                'processed': self.processed,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'lag_last_s': round(self.last_lag, 4),
+                'lag_max_s': round(self.max_lag, 4),
+                'lag_oldest_s': round(time.monotonic() - oldest, 4) if oldest is not None else 0.0,
+                'service_avg_s': round(self.avg_service, 4),
+            }
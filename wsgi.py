@@ -0,0 +1,13 @@
+import server
+
+
+# ================================= ENTRY POINT WSGI (GUNICORN) ===========================================
+# gunicorn -c gunicorn.conf.py wsgi:app
+# Dengan preload_app=True modul ini di-import SEKALI di master sebelum fork, jadi modul &
+# array numpy dibagi copy-on-write ke semua worker. Import server ringan (lihat startup.py):
+# model TIDAK dimuat di sini, tapi di background tiap worker setelah fork (post_fork), jadi
+# worker sudah menjawab /status & /raw_data sebelum model siap. File model di-mmap, jadi
+# halamannya tetap dibagi semua worker lewat page cache.
+# Bot Telegram TIDAK jalan di worker: satu proses terpisah dari gunicorn.conf.py.
+
+app = server.app